@@ -5,6 +5,9 @@ CREATE EXTENSION IF NOT EXISTS timescaledb;
 -- A signal represents a sensor or measurement point, identified by a unique signal_id (UUID).
 -- Each signal has a name (e.g. "temp_room_1") and an optional unit.
 -- In general, `unit` should be non-null only if its associated observations are numeric.
+-- Signals of registered sensor metrics are synced by `sync_signals.py` (see pypackages/mqtt2influx),
+-- with signal_id = uuid5('124b2f74-7171-56c0-8ec1-3082c9c62d01', '<mqtt topic>#<metric name>')
+-- and name = '<sensor name>.<metric name>' (the InfluxDB measurement and field).
 -- -------------------------------------------------------------------------------------------------
 CREATE TABLE IF NOT EXISTS signal(
     signal_id UUID PRIMARY KEY,
@@ -31,3 +34,24 @@ CREATE TABLE IF NOT EXISTS observation(
 );
 SELECT create_hypertable('observation', 'ts', if_not_exists => TRUE);
 CREATE INDEX IF NOT EXISTS idx_observation_ts ON observation(ts DESC);
+
+-- Observation archive manifest
+-- -------------------------------------------------------------------------------------------------
+-- Aged chunks of the observation hypertable are archived to Parquet files (one per chunk) by
+-- `dtp-archive` (see pypackages/datastore).  Each row locates the archived observations of one
+-- signal within one file: its time range, and the Parquet row groups holding its data.
+-- `path` is relative to the archive root.
+-- -------------------------------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS observation_archive(
+    signal_id UUID NOT NULL,
+    ts_min TIMESTAMPTZ NOT NULL,
+    ts_max TIMESTAMPTZ NOT NULL,
+    path TEXT NOT NULL, -- e.g. "observation/2025/01/_hyper_1_1_chunk.parquet"
+    row_groups INT[] NOT NULL,
+    num_rows BIGINT NOT NULL,
+    chunk_name TEXT NOT NULL, -- the archived chunk, e.g. "_hyper_1_1_chunk"
+    PRIMARY KEY(signal_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_observation_archive_range
+    ON observation_archive(signal_id, ts_min, ts_max);
+CREATE INDEX IF NOT EXISTS idx_observation_archive_chunk ON observation_archive(chunk_name);
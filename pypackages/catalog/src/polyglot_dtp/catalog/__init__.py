@@ -0,0 +1 @@
+"""Polyglot DTP: indexed catalog of platform components, services and URLs."""
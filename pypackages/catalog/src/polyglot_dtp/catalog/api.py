@@ -0,0 +1,76 @@
+"""HTTP API for the component catalog.
+
+`make_router()` creates a router that can be included in any FastAPI app, e.g.
+
+    catalog = Catalog(repo_root)
+    app.include_router(make_router(catalog), prefix="/catalog")
+
+See `polyglot_dtp.catalog.app` for a standalone app.
+"""
+
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel
+
+from .index import Catalog
+from .models import Component, Service, Url
+
+
+class ServiceEntry(BaseModel):
+    """A service, together with the name of its component."""
+
+    component: str
+    service: Service
+
+
+def _not_found(kind: str, name: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No such {kind}: {name}")
+
+
+def make_router(catalog: Catalog) -> APIRouter:
+    """Create a router serving lookups against a catalog.
+
+    All lookups are answered from the in-memory index.
+    """
+    router = APIRouter(tags=["catalog"])
+
+    @router.get("/components", summary="List components")
+    async def list_components(category: str | None = None) -> list[Component]:
+        """List all components, or the components in a category, sorted by name."""
+        return list(catalog.components(category))
+
+    @router.get("/components/{name}", summary="Get a component")
+    async def get_component(name: str) -> Component:
+        """Get a component by name."""
+        if (component := catalog.component(name)) is None:
+            raise _not_found("component", name)
+        return component
+
+    @router.get("/categories", summary="List categories")
+    async def list_categories() -> list[str]:
+        """List the names of all component categories."""
+        return list(catalog.categories())
+
+    @router.get("/services/{name}", summary="Get a service")
+    async def get_service(name: str) -> ServiceEntry:
+        """Get a service, and the name of its component, by service name."""
+        if (entry := catalog.service_entry(name)) is None:
+            raise _not_found("service", name)
+        component, service = entry
+        return ServiceEntry(component=component.name, service=service)
+
+    @router.get("/images/{image:path}", summary="Find services by image")
+    async def find_by_image(image: str) -> list[ServiceEntry]:
+        """Find the services using an image, given with or without its tag."""
+        return [
+            ServiceEntry(component=component.name, service=service)
+            for component, service in catalog.by_image(image)
+        ]
+
+    @router.get("/urls/{name}", summary="Get URLs")
+    async def get_urls(name: str) -> list[Url]:
+        """Get the URLs of a service, or of all services of a component, by name."""
+        if catalog.service(name) is None and catalog.component(name) is None:
+            raise _not_found("service or component", name)
+        return catalog.urls(name)
+
+    return router
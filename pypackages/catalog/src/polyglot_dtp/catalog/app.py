@@ -0,0 +1,72 @@
+"""Standalone component catalog app.
+
+Indexes the directory given by the `CATALOG_ROOT` environment variable, and keeps the index up
+to date in a background thread while the app is running:
+
+    CATALOG_ROOT=../.. fastapi run -e polyglot_dtp.catalog.app:app src/
+"""
+
+import pathlib
+from contextlib import asynccontextmanager
+
+import dotenv
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from polyglot_dtp.compression import CompressionMiddleware
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from .api import make_router
+from .index import Catalog
+
+
+class CatalogSettings(BaseSettings):
+    """Settings for the standalone catalog app."""
+
+    root: pathlib.Path = pathlib.Path(".")
+    """The directory to search for `dt.component.yaml` files.  Defaults to the working
+    directory."""
+
+    poll_interval: float = 10.0
+    """The interval (in seconds) between full re-scans of the directory tree.  See
+    `Catalog.watch()`."""
+
+    model_config = SettingsConfigDict(
+        extra="ignore",
+        env_prefix="CATALOG_",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+    )
+
+
+env_path = dotenv.find_dotenv()
+settings = CatalogSettings(**({"_env_file": env_path} if env_path else {}))
+catalog = Catalog(settings.root)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Keep the index up to date while the app is running."""
+    catalog.start(settings.poll_interval)
+    yield
+    catalog.stop()
+
+
+app = FastAPI(
+    title="Polyglot Digital Twin Platform - Component Catalog",
+    description="Lookups of the platform components, services, images and URLs.",
+    lifespan=lifespan,
+)
+app.add_middleware(CompressionMiddleware)
+app.include_router(make_router(catalog))
+
+
+@app.get(
+    "/health",
+    response_class=PlainTextResponse,
+    response_model=str,
+    summary="Health check",
+    responses={200: {"content": {"text/plain": {"example": "OK"}}}},
+)
+async def health():
+    """Health check endpoint."""
+    return PlainTextResponse("OK")
@@ -0,0 +1,312 @@
+"""In-memory index of the `dt.component.yaml` files in a directory tree.
+
+The tree is walked once on startup.  After that, the index is updated incrementally: only files
+whose modification time or size has changed are re-parsed.  `Catalog.start()` keeps the index up
+to date in a background thread, using inotify (via `watchfiles`) if available, or polling
+otherwise.
+
+Lookups are dictionary lookups against an immutable snapshot of the index, which is swapped out
+atomically on each update, so they never touch the filesystem or wait for a lock.
+
+To print all components (replaces `yq eval-all` over `find . -name dt.component.yaml`):
+
+    dtp-catalog --root .
+"""
+
+import logging
+import os
+import pathlib
+import threading
+from typing import Iterator, NamedTuple
+
+import click
+import yaml
+
+from .models import Component, Service, Url
+
+try:
+    import watchfiles
+except ImportError:  # pragma: no cover
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+FILENAME = "dt.component.yaml"
+"""The name of component description files."""
+
+IGNORE_DIRS = frozenset(
+    {".git", ".venv", "venv", "node_modules", "__pycache__", ".pytest_cache", ".ruff_cache"}
+)
+"""Directories that are never searched for component files."""
+
+FileKey = tuple[int, int]
+"""The (modification time, size) of a file, used to detect changes."""
+
+
+class _Snapshot(NamedTuple):
+    """An immutable snapshot of the index.  Replaced, never mutated."""
+
+    components: dict[str, Component]
+    """Components by name, in name order."""
+
+    categories: dict[str, tuple[Component, ...]]
+    """Components by category, in name order."""
+
+    services: dict[str, tuple[Component, Service]]
+    """Services (and their components) by service name."""
+
+    images: dict[str, tuple[tuple[Component, Service], ...]]
+    """Services (and their components) by image, both with and without the tag (e.g.
+    "influxdb:3-core" and "influxdb")."""
+
+
+def _snapshot(components: list[Component]) -> _Snapshot:
+    """Build the lookup tables for a list of components."""
+    by_name: dict[str, Component] = {}
+    for component in sorted(components, key=lambda c: (c.name, c.path)):
+        if component.name in by_name:
+            logger.warning(
+                "Duplicate component name %r in %s (ignored)", component.name, component.path
+            )
+            continue
+        by_name[component.name] = component
+
+    categories: dict[str, list[Component]] = {}
+    services: dict[str, tuple[Component, Service]] = {}
+    images: dict[str, list[tuple[Component, Service]]] = {}
+    for component in by_name.values():
+        categories.setdefault(component.category, []).append(component)
+        for service in component.services:
+            services.setdefault(service.name, (component, service))
+            images.setdefault(service.image, []).append((component, service))
+            if service.repository != service.image:
+                images.setdefault(service.repository, []).append((component, service))
+
+    return _Snapshot(
+        by_name,
+        {k: tuple(v) for k, v in sorted(categories.items())},
+        services,
+        {k: tuple(v) for k, v in images.items()},
+    )
+
+
+class Catalog:
+    """An index of all components, services, images and URLs under a root directory."""
+
+    def __init__(self, root: pathlib.Path):
+        """Index all component files under a root directory.
+
+        Args:
+            root (pathlib.Path): The directory to search recursively, usually the repository
+                root.
+        """
+        self.root = root.resolve()
+        """The directory searched for component files."""
+
+        self._files: dict[pathlib.Path, tuple[FileKey, Component | None]] = {}
+        """The (file key, parsed component) of each known component file.  The component is
+        None if the file is invalid, so that it is not re-parsed until it changes."""
+
+        self._snapshot = _snapshot([])
+        self._lock = threading.Lock()  # Serializes updates; lookups do not need it
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.refresh()
+
+    ### Lookups ###
+
+    def __len__(self) -> int:
+        """The number of components."""
+        return len(self._snapshot.components)
+
+    def __iter__(self) -> Iterator[Component]:
+        """Iterate over the components, in name order."""
+        return iter(self._snapshot.components.values())
+
+    def component(self, name: str) -> Component | None:
+        """Get a component by name."""
+        return self._snapshot.components.get(name)
+
+    def components(self, category: str | None = None) -> tuple[Component, ...]:
+        """Get all components, or all components in a category, in name order."""
+        if category is None:
+            return tuple(self._snapshot.components.values())
+        return self._snapshot.categories.get(category, ())
+
+    def categories(self) -> tuple[str, ...]:
+        """Get the names of all categories, in name order."""
+        return tuple(self._snapshot.categories)
+
+    def service(self, name: str) -> Service | None:
+        """Get a service by name."""
+        entry = self._snapshot.services.get(name)
+        return entry[1] if entry else None
+
+    def component_of(self, service_name: str) -> Component | None:
+        """Get the component a service belongs to."""
+        entry = self._snapshot.services.get(service_name)
+        return entry[0] if entry else None
+
+    def service_entry(self, name: str) -> tuple[Component, Service] | None:
+        """Get a service by name, together with the component it belongs to.
+
+        Both are read from the same snapshot, so they are consistent even if the index is
+        refreshed concurrently (unlike separate `service()` and `component_of()` calls).
+        """
+        return self._snapshot.services.get(name)
+
+    def by_image(self, image: str) -> tuple[tuple[Component, Service], ...]:
+        """Get the services (and their components) using an image, with or without its tag."""
+        return self._snapshot.images.get(image, ())
+
+    def urls(self, name: str) -> list[Url]:
+        """Get the URLs of a service, or of all services of a component, by name.
+
+        Service names take precedence over component names.
+        """
+        snapshot = self._snapshot  # Look up both names in the same snapshot
+        if (entry := snapshot.services.get(name)) is not None:
+            return entry[1].urls
+        if (component := snapshot.components.get(name)) is not None:
+            return [url for service in component.services for url in service.urls]
+        return []
+
+    ### Updates ###
+
+    def _walk(self) -> Iterator[pathlib.Path]:
+        """Find all component files under the root directory."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORE_DIRS]
+            if FILENAME in filenames:
+                yield pathlib.Path(dirpath, FILENAME)
+
+    def _load(self, path: pathlib.Path) -> Component | None:
+        """Parse a component file, or return None (and log a warning) if it is invalid."""
+        try:
+            with open(path, "rb") as f:
+                obj = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+            return Component.model_validate(obj | {"path": str(path.parent.relative_to(self.root))})
+        except (OSError, yaml.YAMLError, TypeError, ValueError) as e:
+            logger.warning("Invalid component file %s: %s", path, e)
+            return None
+
+    def refresh(self, paths: list[pathlib.Path] | None = None) -> bool:
+        """Update the index from the filesystem.
+
+        Args:
+            paths (list[pathlib.Path] | None, optional): Component files known to have been
+                created, modified or deleted.  Defaults to scanning the whole tree.  Either way,
+                only files whose modification time or size has changed are re-parsed.
+
+        Returns:
+            bool: Whether the index changed.
+        """
+        with self._lock:
+            if paths is None:
+                candidates = set(self._walk())
+                candidates.update(self._files)  # Check known files for deletion too
+            else:
+                candidates = {pathlib.Path(p).resolve() for p in paths}
+
+            changed = False
+            for path in candidates:
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    changed |= self._files.pop(path, None) is not None
+                    continue
+                key = (st.st_mtime_ns, st.st_size)
+                if path in self._files and self._files[path][0] == key:
+                    continue
+                self._files[path] = (key, self._load(path))
+                changed = True
+
+            if changed:
+                self._snapshot = _snapshot([c for _, c in self._files.values() if c is not None])
+                logger.info("Indexed %d components", len(self._snapshot.components))
+            return changed
+
+    def _try_refresh(self, paths: list[pathlib.Path] | None = None) -> None:
+        """Call `refresh()`, logging rather than raising any error, so that watching continues."""
+        try:
+            self.refresh(paths)
+        except Exception:
+            logger.exception("Failed to refresh the catalog index; keeping the previous index")
+
+    def watch(self, poll_interval: float = 10.0) -> None:
+        """Keep the index up to date until `stop()` is called.  Blocks.
+
+        With `watchfiles` installed, changed component files are re-indexed as soon as they
+        change, and the whole tree is re-scanned whenever no changes arrive for `poll_interval`
+        seconds (to catch e.g. renamed directories).  Otherwise, the tree is re-scanned every
+        `poll_interval` seconds.  Errors while refreshing (e.g. an unreadable directory) are
+        logged, and the previous index is kept until the next refresh.
+        """
+        if watchfiles is None:
+            while not self._stop.wait(poll_interval):
+                self._try_refresh()
+            return
+
+        default_filter = watchfiles.DefaultFilter()
+        for changes in watchfiles.watch(
+            self.root,
+            watch_filter=lambda change, path: (
+                os.path.basename(path) == FILENAME and default_filter(change, path)
+            ),
+            stop_event=self._stop,
+            rust_timeout=int(poll_interval * 1000),
+            yield_on_timeout=True,
+        ):
+            self._try_refresh([pathlib.Path(path) for _, path in changes] if changes else None)
+
+    def start(self, poll_interval: float = 10.0) -> None:
+        """Keep the index up to date in a background thread.  See `watch()`."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.watch, args=(poll_interval,), name="catalog-watch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread started by `start()`."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--root",
+    "-r",
+    type=click.Path(exists=True, file_okay=False, readable=True, path_type=pathlib.Path),
+    default=".",
+    show_default=True,
+    help="The directory to search for dt.component.yaml files.",
+)
+@click.option(
+    "--files",
+    "-f",
+    is_flag=True,
+    default=False,
+    help="List the component files instead of their contents.",
+)
+def main(root: pathlib.Path, files: bool) -> None:
+    """Print all components, sorted by name."""
+    catalog = Catalog(root)
+    if files:
+        for component in catalog:
+            click.echo(os.path.join(component.path, FILENAME))
+        return
+    click.echo(
+        yaml.safe_dump(
+            [c.model_dump(exclude={"path"}) for c in catalog], sort_keys=False, allow_unicode=True
+        ),
+        nl=False,
+    )
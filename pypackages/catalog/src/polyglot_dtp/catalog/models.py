@@ -0,0 +1,54 @@
+"""Models for `dt.component.yaml` files."""
+
+from pydantic import BaseModel, Field
+
+
+class Url(BaseModel):
+    """A URL exposed by a service."""
+
+    address: str
+    """The URL, e.g. "http://localhost:8181" or "postgresql://dtp@localhost:5432/dtp"."""
+
+    description: str = ""
+    """A short description of the URL."""
+
+
+class Service(BaseModel):
+    """A service (container) belonging to a component."""
+
+    name: str
+    """The name of the service, e.g. "postgres".  Unique across all components."""
+
+    image: str
+    """The container image of the service, e.g. "timescale/timescaledb:latest-pg17"."""
+
+    urls: list[Url] = Field(default_factory=list)
+    """The URLs exposed by the service."""
+
+    @property
+    def repository(self) -> str:
+        """The image name without its tag or digest, e.g. "timescale/timescaledb"."""
+        name = self.image.split("@", 1)[0]
+        head, sep, tag = name.rpartition(":")
+        # A colon followed by a slash belongs to a registry port, not a tag
+        return head if sep and "/" not in tag else name
+
+
+class Component(BaseModel):
+    """A platform component, described by a `dt.component.yaml` file."""
+
+    name: str
+    """The name of the component, e.g. "postgres".  Unique across the platform."""
+
+    description: str = ""
+    """A longer description of the component."""
+
+    category: str
+    """The category of the component, e.g. "data-store", "infra" or "data-source"."""
+
+    services: list[Service] = Field(default_factory=list)
+    """The services belonging to the component."""
+
+    path: str = ""
+    """The directory containing the `dt.component.yaml` file, relative to the catalog root.  Set
+    by the catalog, not read from the file."""
@@ -0,0 +1,319 @@
+"""Polyglot DTP: streaming response compression for ASGI apps.
+
+`CompressionMiddleware` compresses HTTP responses with zstd or gzip, as negotiated with the
+client via its `Accept-Encoding` header:
+
+- Streaming responses (e.g. a `StreamingResponse` of NDJSON) are compressed incrementally, so
+  memory use does not grow with the size of the response.  The compressed stream is flushed (so
+  that the client can decode everything sent so far) once `flush_size` bytes have been produced
+  since the last flush, or when a chunk arrives `flush_interval` seconds or more after it.  A
+  slow stream is therefore flushed chunk by chunk, while a fast one is flushed in larger blocks,
+  which compress better than many small ones.
+- Bodies smaller than `minimum_size` bytes are sent uncompressed, as compressing them saves
+  little.  Streaming responses are buffered only until `minimum_size` bytes have been produced.
+- Responses that already have a `Content-Encoding`, whose media type is not compressible
+  (e.g. images), or that have no body (1xx, 204 and 304 responses, and responses to HEAD
+  requests), are passed through unchanged.
+- Compressed responses get `Vary: Accept-Encoding` (merged into any existing `Vary` header), and
+  a strong `ETag` is made weak, as the compressed body is not byte-for-byte the same as the
+  uncompressed one.
+
+zstd compresses faster and better than gzip, and is preferred when the client accepts both.  It
+requires the `zstandard` package (install the `zstd` extra); otherwise, only gzip is offered.
+
+Example:
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+"""
+
+import zlib
+from time import monotonic
+from typing import Awaitable, Callable
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/xml",
+        "application/javascript",
+        "application/vnd.apache.arrow.stream",
+        "image/svg+xml",
+    }
+)
+"""Compressible media types, in addition to `text/*`, `*+json` and `*+xml`."""
+
+BODILESS_STATUSES = frozenset({204, 304})
+"""Statuses (in addition to 1xx) whose responses have no body, and are passed through."""
+
+Headers = list[tuple[bytes, bytes]]
+"""Raw ASGI headers: (lowercase name, value) pairs."""
+
+
+def negotiate(accept_encoding: str, encodings: tuple[str, ...]) -> str | None:
+    """Choose a content encoding from an `Accept-Encoding` header.
+
+    Args:
+        accept_encoding (str): The header value, e.g. "gzip, deflate, br, zstd" or "gzip;q=0.5".
+        encodings (tuple[str, ...]): The supported encodings, most preferred first.  Used to
+            break ties between encodings with equal quality values.
+
+    Returns:
+        str | None: The chosen encoding, or None if no supported encoding is acceptable.
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _is_compressible(content_type: bytes | None) -> bool:
+    if content_type is None:
+        return False
+    media_type = content_type.decode("latin-1").partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type.endswith(("+json", "+xml"))
+        or media_type in COMPRESSIBLE_TYPES
+    )
+
+
+def _get(headers: Headers, name: bytes) -> bytes | None:
+    return next((value for key, value in headers if key.lower() == name), None)
+
+
+def _without(headers: Headers, name: bytes) -> Headers:
+    return [(key, value) for key, value in headers if key.lower() != name]
+
+
+def _vary(headers: Headers) -> bytes:
+    """The value of the `Vary` header, merged into one, with `Accept-Encoding` added."""
+    values = [
+        value.strip()
+        for key, header in headers
+        if key.lower() == b"vary"
+        for value in header.split(b",")
+        if value.strip()
+    ]
+    if not any(value == b"*" or value.lower() == b"accept-encoding" for value in values):
+        values.append(b"Accept-Encoding")
+    return b", ".join(values)
+
+
+class _Encoder:
+    """Incrementally compresses a response body."""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip format
+            self._sync = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, flush: bool, final: bool) -> bytes:
+        """Compress a chunk.
+
+        Args:
+            data (bytes): The chunk.
+            flush (bool): Whether to flush the compressed stream, so that everything compressed
+                so far can be decompressed on arrival.
+            final (bool): Whether this is the last chunk, which terminates the stream.
+        """
+        out = self._obj.compress(data)
+        if final:
+            return out + self._obj.flush()
+        return out + self._obj.flush(self._sync) if flush else out
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses with zstd or gzip.
+
+    Add it with e.g. `app.add_middleware(CompressionMiddleware, minimum_size=1024)`.
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Awaitable[None]],
+        *,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        flush_size: int = 65536,
+        flush_interval: float = 0.1,
+    ):
+        """Create the middleware.
+
+        Args:
+            app (Callable[..., Awaitable[None]]): The ASGI app to wrap.
+            minimum_size (int, optional): Bodies smaller than this (in bytes) are sent
+                uncompressed.  Defaults to 1024.
+            flush_size (int, optional): A streamed body is flushed once this many bytes (before
+                compression) have been produced since the last flush.  Defaults to 64 KiB.
+            flush_interval (float, optional): A streamed body is flushed when a chunk arrives at
+                least this many seconds after the last flush.  Defaults to 0.1.
+            gzip_level (int, optional): The gzip compression level (1-9).  Defaults to 6.
+            zstd_level (int, optional): The zstd compression level (1-22).  Defaults to 3.
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        """Bodies smaller than this (in bytes) are sent uncompressed."""
+
+        self.levels = {"gzip": gzip_level} | ({"zstd": zstd_level} if zstandard else {})
+        """The compression level of each supported encoding."""
+
+        self.encodings = ("zstd", "gzip") if zstandard else ("gzip",)
+        """The supported encodings, most preferred first."""
+
+        self.flush_size = flush_size
+        """Streamed bodies are flushed once this many bytes have been produced since the last
+        flush."""
+
+        self.flush_interval = flush_interval
+        """Streamed bodies are flushed when a chunk arrives this many seconds after the last
+        flush."""
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Handle an ASGI request, compressing the response if the client accepts it."""
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            return await self.app(scope, receive, send)
+        accept_encoding = _get(scope["headers"], b"accept-encoding")
+        encoding = accept_encoding and negotiate(accept_encoding.decode("latin-1"), self.encodings)
+        if not encoding:
+            return await self.app(scope, receive, send)
+        responder = _Responder(self, send, encoding)
+        return await self.app(scope, receive, responder)
+
+
+class _Responder:
+    """Wraps the ASGI `send` callable of a single request, compressing the response body."""
+
+    def __init__(self, middleware: CompressionMiddleware, send: Callable, encoding: str):
+        self.middleware = middleware
+        self.send = send
+        self.encoding = encoding
+
+        self.start: dict | None = None
+        """The held `http.response.start` message, until the encoding has been decided."""
+
+        self.passthrough = False
+        """Whether the response is sent unchanged."""
+
+        self.buffer = bytearray()
+        """Body chunks held until `minimum_size` bytes have been produced."""
+
+        self.encoder: _Encoder | None = None
+        """The body encoder, once the response is known to be compressed."""
+
+        self.unflushed = 0
+        """The number of bytes compressed since the last flush."""
+
+        self.flushed_at = 0.0
+        """The time of the last flush (or of the start of compression)."""
+
+    async def __call__(self, message: dict) -> None:
+        """Send an ASGI message, compressing the response body as needed."""
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            status = message.get("status", 200)
+            if (
+                status < 200
+                or status in BODILESS_STATUSES
+                or _get(headers, b"content-encoding") is not None
+                or not _is_compressible(_get(headers, b"content-type"))
+            ):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            if self.start is not None:  # e.g. a response sent via an ASGI extension
+                await self.send(self.start)
+                self.start = None
+                self.passthrough = True
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is not None:
+            data = self._compress(body, final=not more_body)
+            if data or not more_body:
+                await self.send(
+                    {"type": "http.response.body", "body": data, "more_body": more_body}
+                )
+            return
+
+        self.buffer += body
+        if len(self.buffer) < self.middleware.minimum_size:
+            if not more_body:  # Too small to be worth compressing
+                await self._start(compressed=False, length=len(self.buffer))
+                await self.send({"type": "http.response.body", "body": bytes(self.buffer)})
+            return
+
+        self.encoder = _Encoder(self.encoding, self.middleware.levels[self.encoding])
+        self.flushed_at = monotonic()
+        data = self._compress(bytes(self.buffer), final=not more_body)
+        self.buffer = bytearray()
+        await self._start(compressed=True, length=None if more_body else len(data))
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk, flushing if the size or time threshold has been reached."""
+        self.unflushed += len(data)
+        now = monotonic()
+        flush = (
+            self.unflushed >= self.middleware.flush_size
+            or now - self.flushed_at >= self.middleware.flush_interval
+        )
+        if flush:
+            self.unflushed, self.flushed_at = 0, now
+        return self.encoder.compress(data, flush=flush, final=final)
+
+    async def _start(self, compressed: bool, length: int | None) -> None:
+        """Send the held `http.response.start` message with updated headers.
+
+        Args:
+            compressed (bool): Whether the body is compressed.
+            length (int | None): The length of the body, or None if it is streamed.
+        """
+        original = self.start.get("headers", [])
+        headers = [
+            (key, value)
+            for key, value in original
+            if key.lower() not in (b"content-length", b"vary", b"etag")
+        ]
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        if (etag := _get(original, b"etag")) is not None:
+            # The compressed body differs from the uncompressed one, so a strong validator no
+            # longer applies (RFC 9110, section 8.8.3)
+            headers.append(
+                (b"etag", etag if not compressed or etag.startswith(b"W/") else b"W/" + etag)
+            )
+        if compressed:
+            headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", _vary(original)))
+        await self.send(self.start | {"headers": headers})
+        self.start = None
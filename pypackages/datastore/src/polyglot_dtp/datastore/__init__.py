@@ -0,0 +1 @@
+"""Polyglot DTP: data access layer for the time-series stores."""
@@ -0,0 +1,393 @@
+"""Cold-storage tiering of observations to compressed Parquet files.
+
+Aged chunks of the `observation` hypertable are exported to one Parquet file per chunk (i.e. per
+time partition), sorted by signal and time, with each signal in its own row group(s).  Timestamps
+are delta-encoded (DELTA_BINARY_PACKED), which, like the Gorilla encodings used by time-series
+databases, reduces regularly sampled timestamps to a few bits each.  Float values are
+dictionary-encoded: sensor readings are rounded to a fixed precision, so a slowly varying signal
+takes few distinct values per row group (Parquet falls back to plain encoding if the dictionary
+grows too large).  BYTE_STREAM_SPLIT is not used for values: it hides the repeated 8-byte values
+of rounded readings from Zstandard, and compressed worse than dictionary encoding on such data.
+The result is then compressed with Zstandard.
+
+Each (signal, file) pair is recorded in the `observation_archive` manifest table, together with
+its time range and row groups.  Reads look up the manifest, memory-map the matching files, and
+decode only the row groups of the requested signal.
+
+Before a chunk is dropped, its row count is compared with the rows recorded in the manifest, and
+the chunk is archived again if they differ (e.g. if late readings were inserted after it was
+archived).  Empty chunks are not archived, since there is nothing to record in the manifest.
+
+To archive chunks older than 30 days:
+
+    dtp-archive --root /path/to/archive --older-than 30
+"""
+
+import logging
+import os
+import pathlib
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, NamedTuple
+from uuid import UUID
+
+import click
+import dotenv
+import psycopg
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from psycopg import sql
+
+from .config import PostgresSettings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("signal_id", pa.string()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("value_double", pa.float64()),
+        ("value_text", pa.string()),
+        ("quality", pa.string()),  # JSON
+        ("source", pa.string()),
+    ]
+)
+"""The schema of archived observations.  Matches the `observation` table."""
+
+ROW_GROUP_SIZE = 1_000_000
+"""The maximum number of rows per row group.  Each row group holds a single signal."""
+
+FETCH_SIZE = 50_000
+"""The number of rows fetched from PostgreSQL at a time."""
+
+PARQUET_OPTIONS = {
+    "compression": "zstd",
+    "use_dictionary": ["signal_id", "value_double", "value_text", "quality", "source"],
+    "column_encoding": {"ts": "DELTA_BINARY_PACKED"},
+    "write_statistics": ["ts"],
+}
+"""Options for `pyarrow.parquet.ParquetWriter`."""
+
+
+class ManifestEntry(NamedTuple):
+    """The location of the archived observations of one signal in one Parquet file."""
+
+    signal_id: UUID
+    ts_min: datetime
+    ts_max: datetime
+    path: str  # relative to the archive root
+    row_groups: list[int]
+    num_rows: int
+
+
+class Chunk(NamedTuple):
+    """A chunk of the `observation` hypertable."""
+
+    schema: str
+    name: str
+    range_start: datetime
+    range_end: datetime
+
+
+def write_partition(root: pathlib.Path, path: str, rows: Iterable[tuple]) -> list[ManifestEntry]:
+    """Write observations to a Parquet file, with one or more row groups per signal.
+
+    The file is written to a temporary path first, then atomically renamed, so a partial file is
+    never visible under the final path.
+
+    Args:
+        root (pathlib.Path): The archive root directory.
+        path (str): The path of the file, relative to `root`.
+        rows (Iterable[tuple]): Observations as (signal_id, ts, value_double, value_text,
+            quality, source) tuples, sorted by signal_id and then ts.
+
+    Returns:
+        list[ManifestEntry]: The manifest entries for the file, one per signal.  If there are no
+            rows, no file is written (any existing file is removed) and the list is empty.
+    """
+    full_path = root / path
+    full_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = full_path.with_name(full_path.name + ".tmp")
+
+    entries = []
+    row_group = 0
+    with pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, **PARQUET_OPTIONS) as writer:
+        for signal_id, signal_rows in groupby(rows, key=itemgetter(0)):
+            columns = list(zip(*signal_rows))
+            table = pa.Table.from_arrays(
+                [
+                    pa.array([str(signal_id)] * len(columns[0]), pa.string()),
+                    *(
+                        pa.array(col, type_)
+                        for col, type_ in zip(columns[1:], ARCHIVE_SCHEMA.types[1:])
+                    ),
+                ],
+                schema=ARCHIVE_SCHEMA,
+            )
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+            n_groups = -(-table.num_rows // ROW_GROUP_SIZE)
+            entries.append(
+                ManifestEntry(
+                    UUID(str(signal_id)),
+                    columns[1][0],
+                    columns[1][-1],
+                    path,
+                    list(range(row_group, row_group + n_groups)),
+                    table.num_rows,
+                )
+            )
+            row_group += n_groups
+    if not entries:
+        tmp_path.unlink()
+        full_path.unlink(missing_ok=True)  # e.g. from an earlier export of the same chunk
+        return entries
+    os.replace(tmp_path, full_path)
+    return entries
+
+
+def read_entries(
+    root: pathlib.Path,
+    entries: Iterable[ManifestEntry],
+    start: datetime,
+    end: datetime,
+    columns: list[str] | None = None,
+) -> pa.Table:
+    """Read the archived observations in `[start, end)` from the given manifest entries.
+
+    Only the row groups listed in the entries are decoded, and files are memory-mapped rather
+    than read into memory.
+
+    Args:
+        root (pathlib.Path): The archive root directory.
+        entries (Iterable[ManifestEntry]): The manifest entries to read, e.g. from `lookup()`.
+        start (datetime): The start of the time range (inclusive, timezone-aware).
+        end (datetime): The end of the time range (exclusive, timezone-aware).
+        columns (list[str] | None, optional): The columns to read.  Must include "ts" if given.
+            Defaults to all columns.
+
+    Returns:
+        pa.Table: The observations, in the order of the entries.
+    """
+    tables = []
+    for entry in entries:
+        pf = pq.ParquetFile(root / entry.path, memory_map=True)
+        table = pf.read_row_groups(entry.row_groups, columns=columns)
+        ts = table["ts"]
+        mask = pc.and_(
+            pc.greater_equal(ts, pa.scalar(start, ts.type)),
+            pc.less(ts, pa.scalar(end, ts.type)),
+        )
+        tables.append(table.filter(mask))
+    if not tables:
+        schema = (
+            ARCHIVE_SCHEMA
+            if columns is None
+            else pa.schema(ARCHIVE_SCHEMA.field(c) for c in columns)
+        )
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def aged_chunks(
+    conn: psycopg.Connection, older_than: timedelta, *, archived: bool = False
+) -> list[Chunk]:
+    """List the unarchived chunks of the `observation` hypertable older than `older_than`.
+
+    A chunk is old enough to archive if its time range ended before `now() - older_than`.
+
+    Args:
+        conn (psycopg.Connection): The database connection.
+        older_than (timedelta): The minimum age of the chunks.
+        archived (bool, optional): If True, list the chunks that have already been archived but
+            not yet dropped instead.  Defaults to False.
+    """
+    cur = conn.execute(
+        sql.SQL(
+            """\
+            SELECT chunk_schema, chunk_name, range_start, range_end
+            FROM timescaledb_information.chunks
+            WHERE hypertable_name = 'observation'
+              AND range_end <= now() - %s
+              AND chunk_name {} (SELECT DISTINCT chunk_name FROM observation_archive)
+            ORDER BY range_start;
+            """
+        ).format(sql.SQL("IN" if archived else "NOT IN")),
+        (older_than,),
+    )
+    return [Chunk(*row) for row in cur.fetchall()]
+
+
+def archive_chunk(conn: psycopg.Connection, root: pathlib.Path, chunk: Chunk) -> int:
+    """Export a chunk to Parquet and record it in the manifest, in a single transaction.
+
+    Any manifest entries of an earlier export of the chunk are replaced.  Empty chunks are not
+    exported, and have no manifest entries.
+
+    Args:
+        conn (psycopg.Connection): The database connection.
+        root (pathlib.Path): The archive root directory.
+        chunk (Chunk): The chunk to archive.
+
+    Returns:
+        int: The number of rows archived.
+    """
+    path = f"observation/{chunk.range_start:%Y/%m}/{chunk.name}.parquet"
+    with conn.transaction():
+        # Server-side cursor, so the chunk is streamed rather than loaded into memory
+        with conn.cursor(name=f"archive_{chunk.name}") as cur:
+            cur.itersize = FETCH_SIZE
+            cur.execute(
+                sql.SQL(
+                    "SELECT signal_id, ts, value_double, value_text, quality::text, source "
+                    "FROM {} ORDER BY signal_id, ts"
+                ).format(sql.Identifier(chunk.schema, chunk.name))
+            )
+            entries = write_partition(root, path, cur)
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM observation_archive WHERE chunk_name = %s;", (chunk.name,))
+            cur.executemany(
+                """\
+                INSERT INTO observation_archive
+                    (signal_id, ts_min, ts_max, path, row_groups, num_rows, chunk_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s);
+                """,
+                [(*entry, chunk.name) for entry in entries],
+            )
+    return sum(entry.num_rows for entry in entries)
+
+
+def archived_rows(conn: psycopg.Connection, chunk: Chunk) -> int:
+    """The number of rows of a chunk recorded in the manifest."""
+    cur = conn.execute(
+        "SELECT coalesce(sum(num_rows), 0) FROM observation_archive WHERE chunk_name = %s;",
+        (chunk.name,),
+    )
+    return cur.fetchone()[0]
+
+
+def drop_chunk(conn: psycopg.Connection, root: pathlib.Path, chunk: Chunk) -> None:
+    """Drop an archived chunk from the `observation` hypertable.
+
+    The chunk is locked against writes, and its row count compared with the manifest.  If they
+    differ, e.g. because rows were inserted into the chunk after it was archived, the chunk is
+    archived again before it is dropped, in the same transaction.
+
+    Uses `drop_chunks()` rather than `DROP TABLE`, so that TimescaleDB's catalog is kept
+    consistent.  As the hypertable is only partitioned by time, the chunk is the only one
+    covering its time range.
+
+    Args:
+        conn (psycopg.Connection): The database connection.
+        root (pathlib.Path): The archive root directory.
+        chunk (Chunk): The chunk to drop.
+    """
+    table = sql.Identifier(chunk.schema, chunk.name)
+    with conn.transaction():
+        conn.execute(sql.SQL("LOCK TABLE {} IN EXCLUSIVE MODE;").format(table))
+        n_rows = conn.execute(sql.SQL("SELECT count(*) FROM {};").format(table)).fetchone()[0]
+        if n_rows != (n_archived := archived_rows(conn, chunk)):
+            logger.warning(
+                "%s has %d rows, but %d were archived; archiving it again.",
+                chunk.name,
+                n_rows,
+                n_archived,
+            )
+            archive_chunk(conn, root, chunk)
+        conn.execute(
+            "SELECT drop_chunks('observation', older_than => %s, newer_than => %s);",
+            (chunk.range_end, chunk.range_start),
+        )
+    logger.info("Dropped %s.", chunk.name)
+
+
+def lookup(
+    conn: psycopg.Connection, signal_id: UUID, start: datetime, end: datetime
+) -> list[ManifestEntry]:
+    """Find the manifest entries of a signal overlapping the time range `[start, end)`."""
+    cur = conn.execute(
+        """\
+        SELECT signal_id, ts_min, ts_max, path, row_groups, num_rows
+        FROM observation_archive
+        WHERE signal_id = %s AND ts_max >= %s AND ts_min < %s
+        ORDER BY ts_min;
+        """,
+        (signal_id, start, end),
+    )
+    return [ManifestEntry(*row) for row in cur.fetchall()]
+
+
+def read_signal(
+    conn: psycopg.Connection,
+    root: pathlib.Path,
+    signal_id: UUID,
+    start: datetime,
+    end: datetime,
+    *,
+    columns: list[str] | None = None,
+) -> pa.Table:
+    """Read the archived observations of a signal in the time range `[start, end)`."""
+    return read_entries(root, lookup(conn, signal_id, start, end), start, end, columns=columns)
+
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--root",
+    "-r",
+    type=click.Path(file_okay=False, writable=True, path_type=pathlib.Path),
+    required=True,
+    help="The archive root directory.",
+)
+@click.option(
+    "--older-than",
+    "-o",
+    type=click.FloatRange(min=0),
+    default=30.0,
+    show_default=True,
+    help="Archive chunks whose time range ended more than this many days ago.",
+)
+@click.option(
+    "--drop",
+    is_flag=True,
+    default=False,
+    help="Drop each chunk from the database after archiving it.",
+)
+def main(root: pathlib.Path, older_than: float, drop: bool) -> None:
+    """Archive aged observation chunks to Parquet."""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    env_path = dotenv.find_dotenv()
+    settings = PostgresSettings(**({"_env_file": env_path} if env_path else {}))
+
+    # Autocommit, so that each chunk is archived (and dropped) in its own transaction, rather
+    # than in savepoints of a single transaction spanning the whole run
+    with psycopg.connect(str(settings.dsn), autocommit=True) as conn:
+        if drop:
+            # Chunks archived by an earlier run which failed, or was run without --drop
+            for chunk in aged_chunks(conn, timedelta(days=older_than), archived=True):
+                drop_chunk(conn, root, chunk)
+
+        chunks = aged_chunks(conn, timedelta(days=older_than))
+        logger.info("Found %d chunks to archive.", len(chunks))
+        for chunk in chunks:
+            started = datetime.now(timezone.utc)
+            n_rows = archive_chunk(conn, root, chunk)
+            if not n_rows:
+                # Nothing to record in the manifest, so the chunk stays unarchived
+                logger.info("Skipped %s: no rows.", chunk.name)
+                if drop:
+                    drop_chunk(conn, root, chunk)
+                continue
+            logger.info(
+                "Archived %s (%s to %s): %d rows in %.1f s",
+                chunk.name,
+                chunk.range_start,
+                chunk.range_end,
+                n_rows,
+                (datetime.now(timezone.utc) - started).total_seconds(),
+            )
+            if drop:
+                drop_chunk(conn, root, chunk)
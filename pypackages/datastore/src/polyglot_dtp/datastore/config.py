@@ -0,0 +1,38 @@
+"""Connection settings for the data stores."""
+
+from pydantic.networks import PostgresDsn
+from pydantic.types import SecretStr
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PostgresSettings(BaseSettings):
+    """Settings for connecting to the PostgreSQL database."""
+
+    host: str = "localhost"
+    port: int = 5432
+    user: str = "dtp"
+    password: SecretStr  # required, no default
+    db: str = "dtp"
+
+    @property
+    def dsn(self) -> PostgresDsn:
+        """Construct the DSN for connecting to the database.
+
+        Since Pydantic's PostgresDsn does not support SecretStr for password,
+        do not print this property.
+        """
+        return PostgresDsn.build(
+            scheme="postgresql",
+            username=self.user,
+            password=self.password.get_secret_value(),
+            host=self.host,
+            port=self.port,
+            path=self.db,
+        )
+
+    model_config = SettingsConfigDict(
+        extra="ignore",
+        env_prefix="POSTGRES_",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+    )
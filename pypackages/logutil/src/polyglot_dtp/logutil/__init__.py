@@ -0,0 +1,281 @@
+"""Polyglot DTP: non-blocking, structured logging.
+
+`setup_logging()` routes log records through a bounded in-memory queue to a background thread,
+which formats them (as JSON, by default) and writes them to stdout.  Logging calls therefore
+never block on I/O: a slow or blocked stdout only fills the queue.
+
+Two mechanisms keep the queue from growing without bound at high message rates:
+
+- Sampling: high-volume loggers can be configured to pass only one in every N records at INFO
+  level or below.  Sampling is applied before a record is queued, so sampled-out records cost
+  almost nothing.
+- Overflow: once the queue is filled beyond its high-water mark, DEBUG and INFO records are
+  dropped, leaving the remaining space for warnings and errors.  If the queue is full, all
+  records are dropped.  The number of dropped records is logged once the queue has drained.
+
+Only one setup is active at a time: calling `setup_logging()` again stops the previous listener
+(flushing its queue) and removes its handler from the loggers it configured.
+
+Example:
+    listener = setup_logging(sampling={"mock_sensor.messages": 10})
+    ...
+    listener.stop()  # Also called automatically at exit
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+"""Attributes of every log record.  Any other attributes were passed via `extra`."""
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class _ActiveSetup:
+    """The state of the active `setup_logging()` call.  Not instantiated."""
+
+    lock = threading.Lock()
+    """Serializes changes to the active setup."""
+
+    listener: QueueListener | None = None
+    """The listener of the active setup, if any."""
+
+    handler: QueueHandler | None = None
+    """The queue handler of the active setup, if any."""
+
+    loggers: list[str] = []
+    """The names of the loggers configured by the active setup."""
+
+    atexit_registered = False
+    """Whether `_stop_at_exit()` has been registered to run at exit."""
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects.
+
+    Each object has the keys "ts" (RFC 3339, UTC), "level", "logger" and "msg", plus "exc" if
+    the record has exception info, and any fields passed via the `extra` argument of the
+    logging call.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a log record as JSON."""
+        obj = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            obj["exc"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in obj:
+                obj[key] = value
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes only one in every N records of selected loggers, at or below a given level.
+
+    The sampling rate of a logger is inherited by its descendants, e.g. a rate set for
+    "uvicorn" also applies to "uvicorn.access", unless overridden.  Records above `max_level`
+    are never sampled out.  Counting is not synchronized between threads, so under contention
+    the sampling rate is approximate.
+    """
+
+    def __init__(self, every: dict[str, int], max_level: int = logging.INFO):
+        """Create a sampling filter.
+
+        Args:
+            every (dict[str, int]): The sampling rate N of each logger, by logger name.  The
+                first record and every Nth record after it are passed.
+            max_level (int, optional): The highest level subject to sampling.  Defaults to
+                INFO.
+        """
+        super().__init__()
+        self.every = every
+        """The sampling rate of each logger, by logger name."""
+
+        self.max_level = max_level
+        """The highest level subject to sampling."""
+
+        self._rates: dict[str, int] = {}
+        """The resolved sampling rate of each logger seen so far."""
+
+        self._counts: dict[str, int] = {}
+        """The number of records seen from each sampled logger."""
+
+    def _rate(self, name: str) -> int:
+        """Resolve the sampling rate of a logger from its own or its nearest ancestor's rate."""
+        rate = self._rates.get(name)
+        if rate is None:
+            parts = name.split(".")
+            rate = next(
+                (
+                    self.every[prefix]
+                    for i in range(len(parts), 0, -1)
+                    if (prefix := ".".join(parts[:i])) in self.every
+                ),
+                1,
+            )
+            self._rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Returns False if the record is sampled out, True otherwise."""
+        if record.levelno > self.max_level:
+            return True
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return True
+        count = self._counts.get(record.name, 0)
+        self._counts[record.name] = count + 1
+        return count % rate == 0
+
+
+class BoundedQueueHandler(QueueHandler):
+    """A queue handler that never blocks, dropping DEBUG and INFO records first on overflow."""
+
+    def __init__(self, capacity: int = 10_000, high_water: float = 0.8):
+        """Create a handler with a bounded queue.
+
+        Args:
+            capacity (int, optional): The maximum number of queued records.  Defaults to 10000.
+            high_water (float, optional): The fraction of `capacity` above which DEBUG and INFO
+                records are dropped.  Defaults to 0.8.
+        """
+        super().__init__(queue.Queue(maxsize=capacity))
+        self.high_water = int(capacity * high_water)
+        """The queue size above which DEBUG and INFO records are dropped."""
+
+        self.dropped = 0
+        """The number of records dropped since the last drop report."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Prepare a record for queueing, so that it no longer refers to mutable objects.
+
+        The arguments of the record are merged into its message, and its exception info (if
+        any) is formatted.  Unlike `QueueHandler.prepare()`, the exception info is kept
+        separate from the message.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue a record, or drop it if the queue is too full."""
+        size = self.queue.qsize()
+        if record.levelno <= logging.INFO and size >= self.high_water:
+            self.dropped += 1
+            return
+        if self.dropped and size < self.high_water // 2:
+            # Report drops once the queue has drained, so the report is not itself dropped
+            dropped, self.dropped = self.dropped, 0
+            self._put(
+                logging.makeLogRecord(
+                    {
+                        "name": __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Dropped {dropped} log records (logging queue full)",
+                        "dropped": dropped,
+                    }
+                )
+            )
+        self._put(record)
+
+    def _put(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stop_active() -> None:
+    """Stop the listener of the active setup, and remove its handler from its loggers.
+
+    Must hold `_ActiveSetup.lock`.
+    """
+    if _ActiveSetup.listener is None:
+        return
+    for name in _ActiveSetup.loggers:
+        logging.getLogger(name).removeHandler(_ActiveSetup.handler)
+    _ActiveSetup.listener.stop()
+    _ActiveSetup.listener, _ActiveSetup.handler, _ActiveSetup.loggers = None, None, []
+
+
+def _stop_at_exit() -> None:
+    """Stop the listener of the active setup at exit, flushing any queued records."""
+    with _ActiveSetup.lock:
+        _stop_active()
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    *,
+    json_format: bool = True,
+    text_format: str = "%(message)s",
+    sampling: dict[str, int] | None = None,
+    capacity: int = 10_000,
+    loggers: list[str] | None = None,
+    stream: TextIO = sys.stdout,
+) -> QueueListener:
+    """Route log records through a bounded queue to a background thread writing to `stream`.
+
+    Args:
+        level (int, optional): The level of the configured loggers.  Defaults to INFO.
+        json_format (bool, optional): Whether to write JSON (see `JsonFormatter`).  Defaults to
+            True.
+        text_format (str, optional): The format string used if `json_format` is False.
+        sampling (dict[str, int] | None, optional): Sampling rates of high-volume loggers (see
+            `SamplingFilter`).  Defaults to no sampling.
+        capacity (int, optional): The maximum number of queued records (see
+            `BoundedQueueHandler`).  Defaults to 10000.
+        loggers (list[str] | None, optional): The names of the loggers to configure.  Their
+            existing handlers are replaced, and they stop propagating to their ancestors.
+            Defaults to the root logger only.
+        stream (TextIO, optional): The output stream.  Defaults to stdout.
+
+    Returns:
+        QueueListener: The started listener.  Stopped automatically at exit, or when
+            `setup_logging()` is called again; stopping it earlier flushes and stops the
+            background thread.
+    """
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if json_format else logging.Formatter(text_format))
+
+    handler = BoundedQueueHandler(capacity)
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+
+    names = loggers or [""]
+    with _ActiveSetup.lock:
+        _stop_active()
+        for name in names:
+            logger = logging.getLogger(name)
+            logger.handlers = [handler]
+            logger.setLevel(level)
+            if name:
+                logger.propagate = False
+
+        listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        listener.start()
+        _ActiveSetup.listener, _ActiveSetup.handler, _ActiveSetup.loggers = listener, handler, names
+        if not _ActiveSetup.atexit_registered:
+            atexit.register(_stop_at_exit)
+            _ActiveSetup.atexit_registered = True
+    return listener
@@ -9,13 +9,10 @@ import pathlib
 
 import click
 import yaml
-from mock_sensor.config import SensorConfig
+from mock_sensor.loader import load_config
 from mock_sensor.sensor import AuthSettings, MockSensor
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-)
+from polyglot_dtp.logutil import setup_logging
+from polyglot_dtp.profiling import Profiler, install_signal_handler
 
 CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
 
@@ -35,8 +32,63 @@ CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
     required=False,
     help="Path to the MQTT config file (dotenv format).",
 )
-def run(config: pathlib.Path, env: pathlib.Path) -> None:
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True, path_type=pathlib.Path),
+    envvar="SENSOR_CONFIG_CACHE",
+    required=False,
+    help="Directory in which to cache the validated sensor config, to speed up restarts.",
+)
+@click.option(
+    "--verbose",
+    "-v",
+    is_flag=True,
+    default=False,
+    help="Print the full sensor config on startup.",
+)
+@click.option(
+    "--log-format",
+    type=click.Choice(["json", "text"]),
+    default="json",
+    show_default=True,
+    help="Format of the log output.",
+)
+@click.option(
+    "--log-sample",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Log only one in every N generated messages.",
+)
+@click.option(
+    "--profile-rate",
+    type=click.FloatRange(min=0, max=1),
+    default=0.1,
+    show_default=True,
+    help="Fraction of ticks to profile while profiling is enabled (toggle with SIGUSR2).",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="File to which the slowest profiled ticks are written when profiling is toggled off.  "
+    "Defaults to not writing them.",
+)
+def run(
+    *,
+    config: pathlib.Path,
+    env: pathlib.Path,
+    cache_dir: pathlib.Path,
+    verbose: bool,
+    log_format: str,
+    log_sample: int,
+    profile_rate: float,
+    profile_output: pathlib.Path | None,
+) -> None:
     """Run the mock sensor."""
+    # Log via a background thread, so that writing to stdout never delays the sensor loop
+    setup_logging(json_format=log_format == "json", sampling={"mock_sensor.messages": log_sample})
+
     # Print the paths we are using
     logging.info(f"Using config file: {config.resolve()}")
     if env:
@@ -52,16 +104,25 @@ def run(config: pathlib.Path, env: pathlib.Path) -> None:
         auth_settings = AuthSettings(_env_file=env.resolve())
 
     # Load the sensor configuration from a YAML file
-    with open(config.resolve(), "r") as f:
-        obj = yaml.safe_load(f)
-        sensor_config = SensorConfig.model_validate(obj)
+    sensor_config = load_config(config.resolve(), cache_dir)
 
-    for line in yaml.dump(sensor_config.model_dump(), sort_keys=False).splitlines():
-        logging.info(f"{line}")
-    logging.info("")
+    if verbose:
+        for line in yaml.dump(sensor_config.model_dump(), sort_keys=False).splitlines():
+            logging.info(f"{line}")
+        logging.info("")
+    else:
+        logging.info(
+            f"Loaded sensor {sensor_config.name} on topic {sensor_config.mqtt_topic} "
+            f"with {len(sensor_config.metrics)} metrics."
+        )
     logging.info("")
 
-    sensor = MockSensor(sensor_config, auth_settings)
+    # `kill -USR2 <pid>` toggles profiling; the slowest ticks are written to `--profile-output`
+    # (if given) when it is toggled off
+    profiler = Profiler(sample_rate=profile_rate)
+    install_signal_handler(profiler, output=profile_output.resolve() if profile_output else None)
+
+    sensor = MockSensor(sensor_config, auth_settings, profiler)
     sensor.run()
 
 
@@ -0,0 +1,130 @@
+"""Run a fleet of mock sensors on all CPU cores.
+
+Loads every sensor config in a directory and runs the sensors in one process per core (see
+`mock_sensor.fleet`).  Fleet-wide throughput and lateness statistics are logged periodically.
+Use Ctrl-C to stop.
+"""
+
+import logging
+import pathlib
+
+import click
+from mock_sensor.fleet import run_fleet
+from mock_sensor.loader import load_configs
+from mock_sensor.sensor import AuthSettings
+from polyglot_dtp.logutil import setup_logging
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--config-dir",
+    "-c",
+    type=click.Path(exists=True, file_okay=False, readable=True, path_type=pathlib.Path),
+    required=True,
+    help="Directory of sensor config files (`*.sensor.yaml` or `sensor.yaml`), searched "
+    "recursively.",
+)
+@click.option(
+    "--env",
+    "-e",
+    type=click.Path(exists=True, dir_okay=False, readable=True, path_type=pathlib.Path),
+    required=False,
+    help="Path to the MQTT config file (dotenv format).",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True, path_type=pathlib.Path),
+    envvar="SENSOR_CONFIG_CACHE",
+    required=False,
+    help="Directory in which to cache the validated sensor configs, to speed up restarts.",
+)
+@click.option(
+    "--shards",
+    "-n",
+    type=click.IntRange(min=1),
+    required=False,
+    help="Number of shards (processes).  [default: one per CPU core]",
+)
+@click.option(
+    "--report-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=10.0,
+    show_default=True,
+    help="Interval (in seconds) between fleet statistics reports.",
+)
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0, min_open=True),
+    required=False,
+    help="Stop after this many seconds.  [default: run until interrupted]",
+)
+@click.option(
+    "--mqtt-disabled",
+    is_flag=True,
+    default=False,
+    help="Generate messages without publishing them (i.e. ignore MQTT_HOSTNAME), e.g. to "
+    "measure throughput.",
+)
+@click.option(
+    "--log-format",
+    type=click.Choice(["json", "text"]),
+    default="json",
+    show_default=True,
+    help="Format of the log output.",
+)
+@click.option(
+    "--log-sample",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Log only one in every N generated messages (per shard).",
+)
+def run(
+    *,
+    config_dir: pathlib.Path,
+    env: pathlib.Path,
+    cache_dir: pathlib.Path,
+    shards: int | None,
+    report_interval: float,
+    duration: float | None,
+    mqtt_disabled: bool,
+    log_format: str,
+    log_sample: int,
+) -> None:
+    """Run a fleet of mock sensors."""
+    logging_options = {
+        "json_format": log_format == "json",
+        "sampling": {"mock_sensor.messages": log_sample},
+    }
+    setup_logging(**logging_options)
+
+    logging.info(f"Using config directory: {config_dir.resolve()}")
+    if env:
+        logging.info(f"Using env file: {env.resolve()}")
+        auth_settings = AuthSettings(_env_file=env.resolve())
+    else:
+        logging.info("No env file specified, using defaults and environment variables only.")
+        auth_settings = AuthSettings()
+    if mqtt_disabled:
+        auth_settings = auth_settings.model_copy(update={"mqtt_hostname": ""})
+
+    paths = sorted({*config_dir.rglob("sensor.yaml"), *config_dir.rglob("*.sensor.yaml")})
+    configs = load_configs(paths, cache_dir)
+    logging.info(f"Loaded {len(configs)} sensor configs.")
+    if not configs:
+        return
+
+    run_fleet(
+        configs,
+        auth_settings,
+        shards=shards,
+        report_interval=report_interval,
+        duration=duration,
+        logging_options=logging_options,
+    )
+
+
+if __name__ == "__main__":
+    run()
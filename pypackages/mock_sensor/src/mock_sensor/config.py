@@ -47,6 +47,96 @@ class MetricType(StrEnum):
     BOOL = "bool"
 
 
+class AggregateFunction(StrEnum):
+    """An aggregate function computed over a time window.
+
+    All functions are computed incrementally, i.e. using O(1) memory per window.
+    """
+
+    MEAN = "mean"
+    MIN = "min"
+    MAX = "max"
+    SUM = "sum"
+    COUNT = "count"
+
+
+class AggregationPolicy(BaseModel):
+    """A windowed aggregation policy for a metric, applied by the ingestion worker.
+
+    If `slide` is not set, the windows are tumbling (non-overlapping, back-to-back).  Otherwise,
+    a new window of length `window` starts every `slide` seconds; `window` must then be an integer
+    multiple of `slide`.
+    """
+
+    window: float = Field(gt=0)
+    """The length of each aggregation window, in seconds."""
+
+    slide: float | None = Field(default=None, gt=0)
+    """The interval between the start of consecutive windows, in seconds.  Defaults to `window`
+    (tumbling windows)."""
+
+    functions: list[AggregateFunction] = Field(default_factory=lambda: list(AggregateFunction))
+    """The aggregate functions to compute.  Defaults to all supported functions."""
+
+    allowed_lateness: float = Field(default=0.0, ge=0)
+    """How far (in seconds) the watermark trails the latest timestamp seen for the metric.
+
+    A window is only emitted once the watermark passes its end, so readings arriving up to this
+    much later than newer readings are still aggregated.  Readings older than the watermark are
+    dropped.
+    """
+
+    measurement: str | None = Field(default=None, min_length=1)
+    """The InfluxDB measurement (table) to write aggregates to.  Defaults to
+    `<sensor name>_<window>s` for tumbling windows, or `<sensor name>_<window>s_<slide>s`."""
+
+    @model_validator(mode="after")
+    def check_windows(self) -> "AggregationPolicy":
+        """Validate the window configuration."""
+        if self.slide is not None:
+            if self.slide > self.window:
+                raise ValueError("slide must not be greater than window")
+            panes = self.window / self.slide
+            if abs(panes - round(panes)) > 1e-9:
+                raise ValueError("window must be an integer multiple of slide")
+        if not self.functions:
+            raise ValueError("functions must not be empty")
+        return self
+
+
+class AlarmConfig(BaseModel):
+    """Alarm rules for a metric, evaluated by the ingestion worker on each incoming reading.
+
+    Each rule raises an alarm when its limit is exceeded, and clears it once the reading is back
+    within the limit by a margin (`hysteresis`), so that noisy readings near a limit do not cause
+    a flood of alarms.
+    """
+
+    thresholds: bool = Field(default=True)
+    """Raise an alarm if the value is outside `[min_value, max_value]` of the metric."""
+
+    max_rate: float | None = Field(default=None, gt=0)
+    """Raise an alarm if the value changes faster than this (in units per second) between
+    consecutive readings.  Defaults to None (disabled)."""
+
+    max_zscore: float | None = Field(default=None, gt=0)
+    """Raise an alarm if the value deviates from its exponentially weighted moving average (EWMA)
+    by more than this many (EWMA) standard deviations.  Defaults to None (disabled)."""
+
+    ewma_alpha: float = Field(default=0.05, gt=0, le=1)
+    """The smoothing factor of the EWMA used for `max_zscore`.  Smaller values adapt slower."""
+
+    warmup: int = Field(default=30, ge=2)
+    """The number of readings required before `max_zscore` is evaluated."""
+
+    hysteresis: float = Field(default=0.05, ge=0, lt=1)
+    """The margin for clearing an alarm, as a fraction of the limit (for `max_rate` and
+    `max_zscore`) or of `max_value - min_value` (for thresholds)."""
+
+    severity: int = Field(default=1, ge=0, le=3)
+    """The severity of raised alarms: 0: info, 1: warning, 2: error, 3: critical."""
+
+
 class MetricConfig(BaseModel):
     """A metric generated by our mock sensor.
 
@@ -91,6 +181,15 @@ class MetricConfig(BaseModel):
     max_value: float
     """The maximum value for the metric."""
 
+    ### Receiver-only fields for the ingestion worker ###
+
+    aggregations: list[AggregationPolicy] = Field(default_factory=list)
+    """Windowed aggregation policies applied to the metric before storage.  Defaults to none (raw
+    data only)."""
+
+    alarms: AlarmConfig | None = Field(default=None)
+    """Alarm rules for the metric.  Defaults to None (no alarms)."""
+
     @model_validator(mode="after")
     def check_values(self) -> "MetricConfig":
         """Validate the metric configuration."""
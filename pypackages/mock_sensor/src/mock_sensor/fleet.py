@@ -0,0 +1,558 @@
+"""Run a large fleet of mock sensors on all CPU cores.
+
+In a single process, JSON encoding and HMAC signing run under the GIL, so a large enough fleet
+saturates one core.  `run_fleet()` instead splits the fleet into shards, one per core, and runs
+each shard in its own process:
+
+- Each sensor is assigned to a shard by a hash of its MQTT topic (see `shard_of()`), so the
+  assignment does not depend on the order in which configs are loaded.  Each sensor connects
+  with its own stable client ID (see `sensor.client_id()`), so that the broker takes over its
+  previous session when the fleet is restarted.
+- Within a shard, one thread schedules the ticks of all sensors (earliest first) and drives the
+  network I/O of all of the shard's MQTT clients through a single selector, instead of running
+  one network thread per client.
+- Each shard reports to the parent process once its sensors are set up and connecting, then
+  waits.  The parent starts all shards ticking together once every shard is ready, so that
+  process startup is not counted in the reported throughput.
+- Every `report_interval` seconds, each shard sends its throughput and lateness statistics to the
+  parent process, which combines them (see `FleetStats`).
+"""
+
+import bisect
+import hashlib
+import heapq
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import selectors
+import signal
+from time import monotonic
+from typing import Any, NamedTuple
+
+import paho.mqtt.client as mqtt
+from polyglot_dtp.logutil import setup_logging
+
+from .config import AuthSettings, SensorConfig
+from .sensor import MockSensor
+
+logger = logging.getLogger(__name__)
+
+LATENESS_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, math.inf)
+"""The upper bounds (in seconds) of the buckets of the tick lateness histogram."""
+
+MAX_BATCH = 0.05
+"""The maximum time (in seconds) a shard spends ticking sensors before servicing network I/O."""
+
+MISC_INTERVAL = 1.0
+"""The interval (in seconds) between keep-alive checks of a shard's MQTT clients."""
+
+RECONNECT_DELAY = 5.0
+"""The delay (in seconds) before reconnecting a disconnected MQTT client."""
+
+FD_HEADROOM = 64
+"""The number of file descriptors a shard process needs besides its MQTT sockets (the selector,
+pipes to the parent process, standard streams, etc.)."""
+
+
+def shard_of(config: SensorConfig, shards: int) -> int:
+    """Get the shard a sensor is assigned to, from a hash of its MQTT topic.
+
+    Unlike `hash()`, the hash is not randomized per process, so the assignment is the same on
+    every run with the same number of shards.
+    """
+    digest = hashlib.blake2b(config.mqtt_topic.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest) % shards
+
+
+def assign_shards(configs: list[SensorConfig], shards: int) -> list[list[SensorConfig]]:
+    """Split sensor configs into shards (see `shard_of()`).
+
+    Raises:
+        ValueError: If two sensor configurations share the same MQTT topic (and would therefore
+            share the same MQTT client ID).
+    """
+    assignment: list[list[SensorConfig]] = [[] for _ in range(shards)]
+    topics = set()
+    for config in configs:
+        if config.mqtt_topic in topics:
+            raise ValueError(f"Duplicate MQTT topic {config.mqtt_topic!r} in sensor {config.name}")
+        topics.add(config.mqtt_topic)
+        assignment[shard_of(config, shards)].append(config)
+    return assignment
+
+
+class ShardReady(NamedTuple):
+    """Sent by a shard to the parent process once its sensors are set up."""
+
+    shard: int
+    """The index of the shard."""
+
+
+class ShardStats(NamedTuple):
+    """The statistics of a shard over one reporting interval, sent to the parent process."""
+
+    shard: int
+    """The index of the shard."""
+
+    sensors: int
+    """The number of sensors in the shard."""
+
+    connected: int
+    """The number of sensors connected to the MQTT broker, at the end of the interval."""
+
+    ticks: int
+    """The number of messages generated."""
+
+    published: int
+    """The number of messages handed to a connected MQTT client."""
+
+    lateness: tuple[int, ...]
+    """The number of ticks in each bucket of `LATENESS_BUCKETS`, by how late they ran."""
+
+    max_lateness: float
+    """The maximum lateness of a tick, in seconds."""
+
+    final: bool = False
+    """Whether this is the last report of the shard."""
+
+
+class FleetStats:
+    """Fleet-wide statistics, combined from the `ShardStats` reports of all shards."""
+
+    def __init__(self):
+        self.ticks = 0
+        """The number of messages generated."""
+
+        self.published = 0
+        """The number of messages handed to a connected MQTT client."""
+
+        self.lateness = [0] * len(LATENESS_BUCKETS)
+        """The number of ticks in each bucket of `LATENESS_BUCKETS`."""
+
+        self.max_lateness = 0.0
+        """The maximum lateness of a tick, in seconds."""
+
+        self.sensors: dict[int, int] = {}
+        """The number of sensors in each shard."""
+
+        self.connected: dict[int, int] = {}
+        """The number of connected sensors in each shard, as last reported."""
+
+    def add(self, stats: ShardStats) -> None:
+        """Add a shard's report."""
+        self.ticks += stats.ticks
+        self.published += stats.published
+        self.lateness = [a + b for a, b in zip(self.lateness, stats.lateness)]
+        self.max_lateness = max(self.max_lateness, stats.max_lateness)
+        self.sensors[stats.shard] = stats.sensors
+        self.connected[stats.shard] = stats.connected
+
+    def quantile(self, q: float) -> float:
+        """Get an upper bound on a quantile of the tick lateness, in seconds.
+
+        Returns the upper bound of the histogram bucket containing the quantile, or 0 if no ticks
+        have been reported.
+        """
+        total = sum(self.lateness)
+        if not total:
+            return 0.0
+        cumulative = 0
+        for bound, count in zip(LATENESS_BUCKETS, self.lateness):
+            cumulative += count
+            if cumulative >= q * total:
+                return bound
+        return math.inf
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        """Summarize the statistics over a period of `elapsed` seconds, e.g. for logging."""
+        return {
+            "shards": len(self.sensors),
+            "sensors": sum(self.sensors.values()),
+            "connected": sum(self.connected.values()),
+            "ticks_per_s": self.ticks / elapsed if elapsed > 0 else 0.0,
+            "published_per_s": self.published / elapsed if elapsed > 0 else 0.0,
+            "lateness_p50_ms": self.quantile(0.5) * 1000,
+            "lateness_p99_ms": self.quantile(0.99) * 1000,
+            "lateness_max_ms": self.max_lateness * 1000,
+        }
+
+
+def _log_summary(message: str, stats: FleetStats, elapsed: float) -> None:
+    summary = stats.summary(elapsed)
+    logger.info(
+        "%s: %d sensors in %d shards (%d connected), %.0f ticks/s, %.0f published/s, "
+        "lateness p50 <= %g ms, p99 <= %g ms, max %.1f ms",
+        message,
+        summary["sensors"],
+        summary["shards"],
+        summary["connected"],
+        summary["ticks_per_s"],
+        summary["published_per_s"],
+        summary["lateness_p50_ms"],
+        summary["lateness_p99_ms"],
+        summary["lateness_max_ms"],
+        extra=summary,
+    )
+
+
+class _Shard:
+    """The sensors of one shard, ticked by a single scheduler sharing one network loop."""
+
+    def __init__(self, index: int, configs: list[SensorConfig], auth_settings: AuthSettings):
+        self.index = index
+        self.auth_settings = auth_settings
+        self.selector = selectors.DefaultSelector()
+        self.connected: set[mqtt.Client] = set()
+        self.pending_writes: set[mqtt.Client] = set()
+        self.reconnect_at: dict[mqtt.Client, float] = {}
+
+        # MockSensor logs its MQTT settings on creation; once per shard is enough
+        logging.disable(logging.INFO)
+        try:
+            self.sensors = [MockSensor(config, auth_settings) for config in configs]
+        finally:
+            logging.disable(logging.NOTSET)
+        self.clients = [s.mqtt_client for s in self.sensors if s.mqtt_client is not None]
+        logger.info(
+            "Shard %d: %d sensors, publishing to %s",
+            index,
+            len(self.sensors),
+            f"{auth_settings.mqtt_hostname}:{auth_settings.mqtt_port}"
+            if self.clients
+            else "stdout only",
+        )
+
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.ticks = 0
+        self.published = 0
+        self.lateness = [0] * len(LATENESS_BUCKETS)
+        self.max_lateness = 0.0
+
+    def report(self, final: bool = False) -> ShardStats:
+        """Get the statistics since the last report, and start a new reporting interval."""
+        stats = ShardStats(
+            self.index,
+            len(self.sensors),
+            len(self.connected),
+            self.ticks,
+            self.published,
+            tuple(self.lateness),
+            self.max_lateness,
+            final,
+        )
+        self._reset_stats()
+        return stats
+
+    ### MQTT network loop ###
+
+    def _on_socket_open(self, client: mqtt.Client, _userdata: Any, sock: Any) -> None:
+        self.selector.register(sock, selectors.EVENT_READ, client)
+
+    def _on_socket_close(self, _client: mqtt.Client, _userdata: Any, sock: Any) -> None:
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _on_connect(
+        self, client: mqtt.Client, _userdata: Any, _flags: Any, reason_code: Any, _props: Any
+    ) -> None:
+        if reason_code.is_failure:
+            logger.warning("Shard %d: connection refused: %s", self.index, reason_code)
+            return
+        self.connected.add(client)
+
+    def _on_disconnect(
+        self, client: mqtt.Client, _userdata: Any, _flags: Any, _reason_code: Any, _props: Any
+    ) -> None:
+        self.connected.discard(client)
+        self.reconnect_at[client] = monotonic() + RECONNECT_DELAY
+
+    def connect(self) -> None:
+        """Connect all MQTT clients.  Clients that fail to connect are retried later."""
+        for sensor in self.sensors:
+            client = sensor.mqtt_client
+            if client is None:
+                continue
+            client.on_socket_open = self._on_socket_open
+            client.on_socket_close = self._on_socket_close
+            client.on_connect = self._on_connect
+            client.on_disconnect = self._on_disconnect
+            # Keep-alive should be several times the sensing interval (see iot.md)
+            keepalive = max(60, math.ceil(3 * sensor.interval))
+            try:
+                client.connect(
+                    self.auth_settings.mqtt_hostname, self.auth_settings.mqtt_port, keepalive
+                )
+            except OSError as exc:
+                logger.warning("Shard %d: failed to connect %s: %s", self.index, sensor.name, exc)
+                self.reconnect_at[client] = monotonic() + RECONNECT_DELAY
+
+    def _service(self, timeout: float) -> None:
+        """Flush pending writes, then wait up to `timeout` seconds for incoming packets."""
+        if self.pending_writes:
+            for client in list(self.pending_writes):
+                client.loop_write()
+                if not client.want_write():
+                    self.pending_writes.discard(client)
+        for key, _ in self.selector.select(timeout):
+            key.data.loop_read()
+
+    def _housekeeping(self, now: float) -> None:
+        """Send keep-alive pings, and reconnect disconnected clients."""
+        for client in self.connected.copy():
+            client.loop_misc()
+        for client, at in list(self.reconnect_at.items()):
+            if at > now:
+                continue
+            del self.reconnect_at[client]
+            try:
+                client.reconnect()
+            except OSError:
+                self.reconnect_at[client] = now + RECONNECT_DELAY
+
+    def disconnect(self) -> None:
+        """Disconnect all MQTT clients."""
+        for client in self.clients:
+            if client.is_connected():
+                client.disconnect()
+        self.selector.close()
+
+    ### Scheduler ###
+
+    def run(self, stats_queue: Any, go: Any, stop: Any, report_interval: float) -> None:
+        """Tick all sensors on schedule until `stop` is set, reporting statistics periodically.
+
+        Reports `ShardReady` once connected, then waits for `go` (servicing network I/O
+        meanwhile) before the first tick.
+        """
+        self.connect()
+        stats_queue.put(ShardReady(self.index))
+        while not go.is_set():
+            if stop.is_set():
+                self.disconnect()
+                stats_queue.put(self.report(final=True))
+                return
+            self._service(0.1)
+
+        # Spread the first ticks over one interval, so that the sensors do not tick in lockstep
+        start = monotonic()
+        schedule = [
+            (start + random.uniform(0, sensor.interval), i) for i, sensor in enumerate(self.sensors)
+        ]
+        heapq.heapify(schedule)
+        next_misc = start + MISC_INTERVAL
+        next_report = start + report_interval
+
+        while not stop.is_set():
+            now = monotonic()
+            batch_end = now + MAX_BATCH
+            while schedule and schedule[0][0] <= now:
+                due, i = schedule[0]
+                lateness = now - due
+                self.lateness[bisect.bisect_left(LATENESS_BUCKETS, lateness)] += 1
+                self.max_lateness = max(self.max_lateness, lateness)
+
+                sensor = self.sensors[i]
+                info = sensor.tick()
+                self.ticks += 1
+                if info is not None and info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self.published += 1
+                    if sensor.mqtt_client.want_write():  # Socket buffer full
+                        self.pending_writes.add(sensor.mqtt_client)
+
+                # Keep to the schedule: if we fall behind, lateness (not the interval) grows
+                heapq.heapreplace(schedule, (due + sensor.interval, i))
+                now = monotonic()
+                if now >= batch_end:
+                    break
+
+            next_tick = schedule[0][0] if schedule else now + 0.1
+            self._service(max(0.0, min(next_tick, next_misc, next_report, now + 0.1) - now))
+
+            now = monotonic()
+            if now >= next_misc:
+                self._housekeeping(now)
+                next_misc = now + MISC_INTERVAL
+            if now >= next_report:
+                stats_queue.put(self.report())
+                next_report += report_interval
+
+        self.disconnect()
+        stats_queue.put(self.report(final=True))
+
+
+def _raise_fd_limit(needed: int) -> int:
+    """Raise the soft limit on open file descriptors to the hard limit.
+
+    Each MQTT client has its own socket, so a shard needs at least one descriptor per sensor,
+    which can exceed the default soft limit (often 1024).
+
+    Args:
+        needed (int): The number of file descriptors needed.
+
+    Returns:
+        int: The new soft limit.
+
+    Raises:
+        RuntimeError: If the hard limit is below `needed`.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard != resource.RLIM_INFINITY and hard < needed:
+        raise RuntimeError(
+            f"The limit on open files ({hard}) is too low for {needed} file descriptors: raise "
+            "the hard limit (e.g. `--ulimit nofile=65536:65536` in Docker), or use more shards"
+        )
+    return hard
+
+
+def _run_shard(
+    index: int,
+    configs: list[SensorConfig],
+    auth_settings: AuthSettings,
+    *,
+    stats_queue: Any,
+    go: Any,
+    stop: Any,
+    report_interval: float,
+    logging_options: dict[str, Any],
+) -> None:
+    """The entry point of a shard process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl-C and sets `stop`
+    setup_logging(**logging_options)
+    if auth_settings.mqtt_hostname:  # One socket per sensor
+        _raise_fd_limit(len(configs) + FD_HEADROOM)
+    _Shard(index, configs, auth_settings).run(stats_queue, go, stop, report_interval)
+
+
+def _stop_shards(processes: dict[int, Any], stats_queue: Any, total: FleetStats) -> None:
+    """Collect the final reports of stopping shards, then join the shard processes.
+
+    The reports are collected before joining, as a process cannot exit with queued data.
+    """
+    remaining = set(processes)
+    while remaining:
+        try:
+            stats = stats_queue.get(timeout=1.0)
+        except queue.Empty:
+            if not any(p.is_alive() for p in processes.values()):
+                break
+            continue
+        if isinstance(stats, ShardReady):
+            continue
+        total.add(stats)
+        if stats.final:
+            remaining.discard(stats.shard)
+    for process in processes.values():
+        process.join(timeout=5.0)
+        if process.is_alive():
+            process.terminate()
+
+
+def run_fleet(
+    configs: list[SensorConfig],
+    auth_settings: AuthSettings,
+    *,
+    shards: int | None = None,
+    report_interval: float = 10.0,
+    duration: float | None = None,
+    logging_options: dict[str, Any] | None = None,
+) -> FleetStats:
+    """Run a fleet of mock sensors, one shard (process) per core.  Blocks.
+
+    Args:
+        configs (list[SensorConfig]): The sensor configurations.  MQTT topics must be unique.
+        auth_settings (AuthSettings): The MQTT settings, shared by all sensors.
+        shards (int | None, optional): The number of shards.  Defaults to one per available CPU
+            core, but never more than the number of sensors.
+        report_interval (float, optional): The interval (in seconds) between statistics reports.
+            Defaults to 10.
+        duration (float | None, optional): Stop after this many seconds, counted from when all
+            shards are ready.  Defaults to running until interrupted (Ctrl-C).
+        logging_options (dict[str, Any] | None, optional): Keyword arguments for `setup_logging()`
+            in each shard process.  Defaults to JSON logs without sampling.
+
+    Returns:
+        FleetStats: The combined statistics of all shards over the whole run, from when all
+            shards were ready.
+
+    Raises:
+        ValueError: If two sensor configurations share the same MQTT topic.
+        RuntimeError: If a shard process exits unexpectedly.
+    """
+    shards = max(1, min(shards or os.process_cpu_count() or 1, len(configs)))
+    assignment = assign_shards(configs, shards)
+
+    # Spawn (rather than fork) shard processes, so that they do not inherit the parent's
+    # threads, e.g. the logging thread
+    ctx = multiprocessing.get_context("spawn")
+    stats_queue = ctx.Queue()
+    go = ctx.Event()
+    stop = ctx.Event()
+    processes = {
+        i: ctx.Process(
+            target=_run_shard,
+            args=(i, shard_configs, auth_settings),
+            kwargs={
+                "stats_queue": stats_queue,
+                "go": go,
+                "stop": stop,
+                "report_interval": report_interval,
+                "logging_options": logging_options or {},
+            },
+            name=f"mock-sensor-shard-{i}",
+            daemon=True,
+        )
+        for i, shard_configs in enumerate(assignment)
+        if shard_configs
+    }
+    logger.info("Starting %d sensors in %d shards", len(configs), len(processes))
+    for process in processes.values():
+        process.start()
+
+    def next_message() -> ShardReady | ShardStats | None:
+        try:
+            return stats_queue.get(timeout=1.0)
+        except queue.Empty:
+            if any(p.exitcode is not None for p in processes.values()):
+                raise RuntimeError("A shard process exited unexpectedly") from None
+            return None
+
+    total = FleetStats()
+    window = FleetStats()
+    started = window_started = monotonic()
+    try:
+        # Start the clock only once every shard has spawned and set up its sensors
+        ready = set()
+        while len(ready) < len(processes):
+            if isinstance(message := next_message(), ShardReady):
+                ready.add(message.shard)
+        logger.info("All shards ready after %.1f s", monotonic() - started)
+        go.set()
+        started = window_started = monotonic()
+
+        while duration is None or monotonic() - started < duration:
+            if (stats := next_message()) is None:
+                continue
+            total.add(stats)
+            window.add(stats)
+            if len(window.sensors) == len(processes):  # All shards have reported
+                now = monotonic()
+                _log_summary("Fleet", window, now - window_started)
+                window, window_started = FleetStats(), now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        _stop_shards(processes, stats_queue, total)
+
+    _log_summary("Fleet total", total, monotonic() - started)
+    return total
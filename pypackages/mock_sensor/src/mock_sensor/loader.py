@@ -0,0 +1,161 @@
+"""Fast loading of sensor configuration files, for large fleets of sensors.
+
+Sensor configs are parsed with the C (libyaml) YAML loader if available, and validated in
+parallel across processes.  Validated configs may be cached in a directory as pickles, keyed by
+a hash of the file contents (and of the `SensorConfig` schema), so that restarts with unchanged
+configs skip parsing and validation entirely.
+
+The cache directory must only be writable by trusted users, since unpickling data from an
+untrusted source can execute arbitrary code.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import pathlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+
+import yaml
+
+from .config import SensorConfig
+
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+"""The C YAML loader if PyYAML was built with libyaml, otherwise the pure-Python loader."""
+
+PARALLEL_THRESHOLD = 64
+"""The minimum number of files to parse and validate before using multiple processes."""
+
+
+@cache
+def _schema_hash() -> bytes:
+    """A hash of the `SensorConfig` JSON schema.
+
+    Included in cache keys, so that cached configs are invalidated when the config classes change.
+    """
+    schema = json.dumps(SensorConfig.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).digest()
+
+
+def content_key(data: bytes) -> str:
+    """Compute the cache key of a config file from its contents."""
+    return hashlib.sha256(_schema_hash() + data).hexdigest()
+
+
+def parse_config(data: bytes, source: str = "<config>") -> SensorConfig:
+    """Parse and validate the contents of a sensor config file.
+
+    Args:
+        data (bytes): The contents of the config file (YAML format).
+        source (str, optional): The name of the config file, for error messages.
+
+    Returns:
+        SensorConfig: The validated sensor configuration.
+
+    Raises:
+        ValueError: If the file is not valid YAML or not a valid sensor configuration.
+    """
+    try:
+        return SensorConfig.model_validate(yaml.load(data, Loader=YamlLoader))
+    except (yaml.YAMLError, ValueError) as e:
+        # Re-raised as a plain ValueError, which (unlike ValidationError) can be pickled back
+        # from a worker process
+        raise ValueError(f"Invalid sensor config {source}:\n{e}") from None
+
+
+def _parse_many(items: list[tuple[bytes, str]]) -> list[SensorConfig]:
+    """Parse and validate a batch of config files.  Runs in a worker process."""
+    return [parse_config(data, source) for data, source in items]
+
+
+class ConfigCache:
+    """A directory of validated sensor configs, keyed by the hash of the file contents."""
+
+    def __init__(self, cache_dir: pathlib.Path):
+        self.cache_dir = cache_dir
+        """The cache directory.  Created if it does not exist."""
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f"{key}.pickle"
+
+    def get(self, key: str) -> SensorConfig | None:
+        """Get a cached config, or None if not cached (or the cache entry is unreadable)."""
+        try:
+            with open(self._path(key), "rb") as f:
+                obj = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        return obj if isinstance(obj, SensorConfig) else None
+
+    def put(self, key: str, config: SensorConfig) -> None:
+        """Cache a validated config.  The entry is written atomically."""
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def load_configs(
+    paths: list[pathlib.Path],
+    cache_dir: pathlib.Path | None = None,
+    processes: int | None = None,
+) -> list[SensorConfig]:
+    """Load and validate sensor config files.
+
+    Args:
+        paths (list[pathlib.Path]): The config files (YAML format).
+        cache_dir (pathlib.Path | None, optional): A directory in which to cache validated
+            configs.  Defaults to no caching.
+        processes (int | None, optional): The maximum number of processes used to parse and
+            validate config files not in the cache.  Defaults to one per available CPU core.
+            Small numbers of files are always loaded in the current process.
+
+    Returns:
+        list[SensorConfig]: The validated configs, in the same order as `paths`.
+
+    Raises:
+        ValueError: If a file is not a valid sensor configuration.
+    """
+    config_cache = ConfigCache(cache_dir) if cache_dir is not None else None
+    configs: list[SensorConfig | None] = [None] * len(paths)
+    misses: list[tuple[int, str, bytes]] = []
+    for i, path in enumerate(paths):
+        data = path.read_bytes()
+        key = content_key(data)
+        if config_cache is not None and (cached := config_cache.get(key)) is not None:
+            configs[i] = cached
+        else:
+            misses.append((i, key, data))
+
+    items = [(data, str(paths[i])) for i, _, data in misses]
+    workers = processes or os.process_cpu_count() or 1
+    if not items:
+        parsed = []
+    elif len(items) < PARALLEL_THRESHOLD or workers == 1:
+        parsed = _parse_many(items)
+    else:
+        # Submit the files in contiguous batches to amortize inter-process overhead
+        size = -(-len(items) // workers)
+        batches = [items[j : j + size] for j in range(0, len(items), size)]
+        # Fork from a clean server process, since this process may already be running threads
+        # (e.g. the logging thread, see `polyglot_dtp.logutil`), which forking would not copy
+        with ProcessPoolExecutor(
+            max_workers=len(batches), mp_context=multiprocessing.get_context("forkserver")
+        ) as pool:
+            parsed = [config for batch in pool.map(_parse_many, batches) for config in batch]
+
+    for (i, key, _), config in zip(misses, parsed):
+        configs[i] = config
+        if config_cache is not None:
+            config_cache.put(key, config)
+    return configs
+
+
+def load_config(path: pathlib.Path, cache_dir: pathlib.Path | None = None) -> SensorConfig:
+    """Load and validate a single sensor config file.  See `load_configs()`."""
+    return load_configs([path], cache_dir, processes=1)[0]
@@ -12,6 +12,7 @@ from time import sleep, time_ns
 from typing import Iterator
 
 import paho.mqtt.client as mqtt
+from polyglot_dtp.profiling import Profiler
 
 from .config import AuthSettings, MetricConfig, SensorConfig
 
@@ -24,10 +25,22 @@ CANONICAL_JSON = {
     "sort_keys": True,
 }
 
+message_logger = logging.getLogger("mock_sensor.messages")
+"""Logs every generated message.  Sample this logger to reduce log volume (see `run.py`)."""
+
 # Ensure we exit cleanly on SIGTERM (e.g. from `docker stop`)
 signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
 
 
+def client_id(config: SensorConfig) -> str:
+    """A stable MQTT client ID for a sensor, derived from its (unique) MQTT topic.
+
+    Reconnecting with the same client ID lets the broker take over the sensor's previous session
+    (see `dev-docs/docs/arch/iot.md`), whichever process the sensor runs in.
+    """
+    return f"mock-sensor/{config.mqtt_topic}"
+
+
 def random_walk(x0: float, max_step: float, min_x: float, max_x: float) -> Iterator[float]:
     """Generate a random walk starting from x0.
 
@@ -77,6 +90,8 @@ class MockSensor:
         self,
         config: SensorConfig,
         auth_settings: AuthSettings,
+        profiler: Profiler | None = None,
+        mqtt_client_id: str | None = None,
     ):
         self.name = config.name
         """A short name for the sensor."""
@@ -96,8 +111,8 @@ class MockSensor:
         self.mqtt_topic = config.mqtt_topic
         """The MQTT topic to publish metrics to.  None if MQTT is disabled."""
 
-        self.hmac_key: bytes | None = None
-        """An HMAC key used to sign MQTT messages.  None if MQTT is disabled."""
+        self.hmac_key = auth_settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+        """An HMAC key used to sign messages.  Messages are signed even if MQTT is disabled."""
 
         self.metrics = [Metric(cfg) for cfg in self.metric_configs]
         """The list of Metric objects generated by the sensor."""
@@ -105,6 +120,9 @@ class MockSensor:
         self.auth_settings = auth_settings
         """The authentication settings for MQTT."""
 
+        self.profiler = profiler or Profiler()
+        """Profiles a fraction of sensor ticks while enabled.  Disabled by default."""
+
         if auth_settings.mqtt_hostname:
             assert auth_settings.mqtt_hmac_key.get_secret_value(), "HMAC key cannot be empty"
             assert self.mqtt_topic, "MQTT topic cannot be empty"
@@ -113,8 +131,6 @@ class MockSensor:
                 "(no double, leading or trailing /)"
             )
 
-            self.hmac_key = auth_settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
-
             logging.info(
                 "Publishing to MQTT broker %s:%d, topic %s",
                 auth_settings.mqtt_hostname,
@@ -123,7 +139,9 @@ class MockSensor:
             )
 
             # Set up MQTT client
-            self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+            self.mqtt_client = mqtt.Client(
+                mqtt.CallbackAPIVersion.VERSION2, client_id=mqtt_client_id or client_id(config)
+            )
             if auth_settings.mqtt_username and auth_settings.mqtt_password:
                 self.mqtt_client.username_pw_set(
                     auth_settings.mqtt_username, auth_settings.mqtt_password
@@ -133,6 +151,41 @@ class MockSensor:
         logging.info("")
         logging.info("")
 
+    def tick(self) -> mqtt.MQTTMessageInfo | None:
+        """Generate, sign and publish a single set of metric values.
+
+        Returns:
+            mqtt.MQTTMessageInfo | None: The result of publishing the message, or None if MQTT is
+                disabled.
+        """
+        ts, ts_ns = divmod(time_ns(), 1_000_000_000)
+
+        payload = {"ts": ts, "ts_ns": ts_ns} | {
+            metric.config.name: round(metric(), metric.config.precision) for metric in self.metrics
+        }
+        # JSON-encode using compact canonical form (no whitespace, sorted keys)
+        # to ensure 1-to-1 mapping between payload and payload_str
+        payload_str = json.dumps(payload, **CANONICAL_JSON)
+
+        digest = b2a_base64(
+            hmac.digest(self.hmac_key, payload_str.encode("utf-8"), "sha256"),
+            newline=False,
+        ).decode("utf-8")
+
+        # Since we used a canonical JSON representation for the payload (1-to-1 mapping),
+        # we can just embed the payload instead of payload_str
+        msg = json.dumps({"payload": payload, "hmac": digest}, **CANONICAL_JSON)
+
+        info = None
+        if self.mqtt_client:
+            # Publish to MQTT
+            info = self.mqtt_client.publish(self.mqtt_topic, msg)
+
+        # Regardless of output method(s), log the generated values.  Logging only queues
+        # the message (see `polyglot_dtp.logutil`), so it never delays the next tick.
+        message_logger.info("%s", msg)
+        return info
+
     def run(self):
         """Run the mock sensor, publishing metrics to MQTT and/or InfluxDB."""
         if self.mqtt_client:
@@ -149,32 +202,11 @@ class MockSensor:
                 sys.exit(1)
         try:
             while True:
-                ts, ts_ns = divmod(time_ns(), 1_000_000_000)
-
-                payload = {"ts": ts, "ts_ns": ts_ns} | {
-                    metric.config.name: round(metric(), metric.config.precision)
-                    for metric in self.metrics
-                }
-                # JSON-encode using compact canonical form (no whitespace, sorted keys)
-                # to ensure 1-to-1 mapping between payload and payload_str
-                payload_str = json.dumps(payload, **CANONICAL_JSON)
-
-                digest = b2a_base64(
-                    hmac.digest(self.hmac_key, payload_str.encode("utf-8"), "sha256"),
-                    newline=False,
-                ).decode("utf-8")
-
-                # Since we used a canonical JSON representation for the payload (1-to-1 mapping),
-                # we can just embed the payload instead of payload_str
-                msg = json.dumps({"payload": payload, "hmac": digest}, **CANONICAL_JSON)
-
-                # Regardless of output method(s), log the generated values
-                logging.info("%s", msg)
-
-                if self.mqtt_client:
-                    # Publish to MQTT
-                    self.mqtt_client.publish(self.mqtt_topic, msg)
-
+                if self.profiler.enabled:
+                    with self.profiler.profile("tick"):
+                        self.tick()
+                else:
+                    self.tick()
                 sleep(self.interval)
         except KeyboardInterrupt:
             pass
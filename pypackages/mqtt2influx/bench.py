@@ -0,0 +1,204 @@
+"""Benchmark ingestion throughput against a local MQTT broker.
+
+Starts N worker processes, each subscribed to its own partition of the sensor topics, publishes
+a fixed number of signed sensor messages as fast as possible, and reports the rate at which the
+workers verify, decode, aggregate and batch them.  Lines that would be written to InfluxDB are
+discarded, so only the broker and the workers are measured.
+
+Requires a local Mosquitto broker configured with `infra/mqtt/mosquitto.conf`, e.g.:
+
+    docker compose up mosquitto -d
+    uv run bench.py --processes 1,2,4,8
+"""
+
+import logging
+import multiprocessing as mp
+from time import monotonic, sleep
+
+import click
+import paho.mqtt.client as mqtt
+from mock_sensor.config import AggregationPolicy, MetricConfig, SensorConfig
+from mqtt2influx.config import WorkerSettings
+from mqtt2influx.influx import BatchWriter
+from mqtt2influx.message import sign
+from mqtt2influx.worker import Worker
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(message)s",
+)
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+COUNT_EVERY = 1000
+"""Workers update the shared message counter once every this many messages."""
+
+
+class _NullClient:
+    """Stands in for the InfluxDB client, discarding all writes."""
+
+    def write(self, **_kwargs) -> None:
+        """Discard the written records."""
+
+
+class _CountingWorker(Worker):
+    """A worker that counts handled messages in a counter shared with the parent process."""
+
+    def __init__(self, *args, counter: mp.Value, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter = counter
+        self._handled = 0
+
+    def handle(self, topic: str, msg: bytes) -> None:
+        """Handle a message, then count it."""
+        super().handle(topic, msg)
+        self._handled += 1
+        if self._handled % COUNT_EVERY == 0:
+            with self._counter.get_lock():
+                self._counter.value += COUNT_EVERY
+
+
+def _registry(sensors: int) -> dict[str, SensorConfig]:
+    """A registry of identical sensors, each with a single aggregated metric."""
+    metric = MetricConfig(
+        name="temperature",
+        description="Benchmark metric",
+        unit="°C",
+        initial_value=20.0,
+        max_step=0.5,
+        min_value=-10.0,
+        max_value=40.0,
+        aggregations=[AggregationPolicy(window=300)],
+    )
+    return {
+        f"sensors/bench/sensor-{i}": SensorConfig(
+            name=f"bench-sensor-{i}",
+            description="Benchmark sensor",
+            mqtt_topic=f"sensors/bench/sensor-{i}",
+            metrics=[metric],
+        )
+        for i in range(sensors)
+    }
+
+
+def _run_worker(settings: WorkerSettings, registry, index: int, counter: mp.Value) -> None:
+    """Entry point of a benchmark worker process."""
+    writer = BatchWriter(_NullClient(), settings.batch_size, settings.flush_interval)
+    _CountingWorker(settings, registry, index=index, writer=writer, counter=counter).run()
+
+
+def _run_publisher(
+    settings: WorkerSettings, topics: list[str], messages: int, ready: mp.Barrier
+) -> None:
+    """Entry point of a publisher process: publish pre-signed messages as fast as possible.
+
+    The messages are signed, and the client connected, before waiting at the `ready` barrier,
+    so that neither is included in the measured time.
+    """
+    key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+    msgs = [
+        sign({"temperature": 20.0 + i % 100 / 10, "ts": 1_760_000_000 + i, "ts_ns": 0}, key)
+        for i in range(messages)
+    ]
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+    client.max_queued_messages_set(0)
+    client.connect(settings.mqtt_hostname, settings.mqtt_port)
+    client.loop_start()
+    ready.wait()
+    for i, msg in enumerate(msgs):
+        client.publish(topics[i % len(topics)], msg)
+    while client.want_write():
+        sleep(0.01)
+    client.loop_stop()
+    client.disconnect()
+
+
+def bench(settings: WorkerSettings, processes: int, messages: int, sensors: int) -> float:
+    """Run a single benchmark and return the throughput in messages per second."""
+    ctx = mp.get_context("spawn")
+    settings = settings.model_copy(update={"partitions": processes, "partition_offset": 0})
+    registry = _registry(sensors)
+    topics = list(registry)
+    counter = ctx.Value("q", 0)
+
+    workers = [
+        ctx.Process(target=_run_worker, args=(settings, registry, i, counter))
+        for i in range(processes)
+    ]
+    for proc in workers:
+        proc.start()
+    sleep(3.0)  # Allow the workers to connect and subscribe
+
+    # Use as many publishers as workers, so publishing is not the bottleneck
+    per_publisher = messages // processes
+    ready = ctx.Barrier(processes + 1)
+    publishers = [
+        ctx.Process(
+            target=_run_publisher, args=(settings, topics[i::processes], per_publisher, ready)
+        )
+        for i in range(processes)
+    ]
+    for proc in publishers:
+        proc.start()
+
+    # Start the clock once all publishers have started, signed their messages and connected
+    ready.wait()
+
+    # QoS 0 messages may be dropped under load, so stop once the count stops increasing
+    start = monotonic()
+    last_count, last_change = 0, start
+    target = per_publisher * processes - COUNT_EVERY * processes
+    while counter.value < target and monotonic() - last_change < 5.0:
+        sleep(0.05)
+        if counter.value != last_count:
+            last_count, last_change = counter.value, monotonic()
+    elapsed = last_change - start
+
+    for proc in publishers + workers:
+        proc.terminate()
+    for proc in publishers + workers:
+        proc.join()
+
+    if last_count < target:
+        logging.warning("Only %d of %d messages were received.", last_count, target)
+    return last_count / elapsed
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--processes",
+    "-p",
+    default="1,2,4",
+    show_default=True,
+    help="Comma-separated list of worker process counts to benchmark.",
+)
+@click.option(
+    "--messages",
+    "-n",
+    type=click.IntRange(min=1),
+    default=400_000,
+    show_default=True,
+    help="Total number of messages to publish per benchmark.",
+)
+@click.option(
+    "--sensors",
+    "-s",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Number of distinct sensors (MQTT topics) to publish to.",
+)
+def run(processes: str, messages: int, sensors: int) -> None:
+    """Benchmark ingestion throughput for different numbers of worker processes."""
+    settings = WorkerSettings()
+    baseline = None
+    click.echo(f"{'processes':>10} {'msg/s':>12} {'speedup':>8}")
+    for n in (int(p) for p in processes.split(",")):
+        rate = bench(settings, n, messages, sensors)
+        baseline = baseline or rate
+        click.echo(f"{n:>10} {rate:>12,.0f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+"""Run the MQTT-to-InfluxDB ingestion worker.
+
+Subscribes to sensor topics on the MQTT broker, verifies each message against the IoT registry
+(a directory of sensor YAML files), and writes raw and aggregated data to InfluxDB.  Use Ctrl-C
+to stop the worker.
+"""
+
+import logging
+import pathlib
+
+import click
+from mqtt2influx.config import WorkerSettings, load_registry
+from mqtt2influx.supervisor import Supervisor
+from mqtt2influx.worker import Worker
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(message)s",
+)
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--registry",
+    "-r",
+    type=click.Path(exists=True, file_okay=False, readable=True, path_type=pathlib.Path),
+    required=True,
+    help="Directory containing the sensor config files (YAML format), searched recursively.",
+)
+@click.option(
+    "--env",
+    "-e",
+    type=click.Path(exists=True, dir_okay=False, readable=True, path_type=pathlib.Path),
+    required=False,
+    help="Path to the worker config file (dotenv format).",
+)
+@click.option(
+    "--processes",
+    "-p",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Number of worker processes (0: one per available CPU core, 1: no supervisor).",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True, path_type=pathlib.Path),
+    envvar="SENSOR_CONFIG_CACHE",
+    required=False,
+    help="Directory in which to cache the validated sensor configs, to speed up restarts.",
+)
+def run(registry: pathlib.Path, env: pathlib.Path, processes: int, cache_dir: pathlib.Path) -> None:
+    """Run the ingestion worker."""
+    logging.info(f"Using registry directory: {registry.resolve()}")
+    if env:
+        logging.info(f"Using env file: {env.resolve()}")
+        settings = WorkerSettings(_env_file=env.resolve())
+    else:
+        logging.info("No env file specified, using defaults and environment variables only.")
+        settings = WorkerSettings()
+
+    sensors = load_registry(registry.resolve(), cache_dir)
+    for topic, sensor in sensors.items():
+        logging.info(f"Registered sensor {sensor.name} on topic {topic}")
+    logging.info("")
+
+    if processes == 1:
+        Worker(settings, sensors).run()
+    else:
+        Supervisor(settings, sensors, processes=processes or None).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1 @@
+"""Worker for ingesting signed sensor messages from MQTT into InfluxDB."""
@@ -0,0 +1,304 @@
+"""Streaming windowed aggregation of sensor readings.
+
+Each (signal, policy) pair is handled by a `WindowAggregator`, which keeps one running partial
+aggregate per *pane* (a `slide`-length slice of time).  A tumbling window consists of exactly one
+pane; a sliding window of `window / slide` panes.  Memory use per signal is therefore bounded by
+the policy alone, regardless of the sampling rate.
+
+Event time is used throughout: windows are aligned to the Unix epoch and closed by a per-signal
+watermark that trails the latest timestamp seen by `allowed_lateness`.  So that the last windows
+of a sensor that stops sending readings are still emitted, `tick()` also advances the watermark
+by the (local) time elapsed since the latest reading was received.
+"""
+
+from collections import Counter
+from math import inf
+from time import monotonic_ns
+from typing import NamedTuple
+
+from mock_sensor.config import AggregationPolicy, SensorConfig
+
+NS_PER_S = 1_000_000_000
+
+
+class Partial:
+    """A running partial aggregate (count, sum, min, max) over a set of values."""
+
+    __slots__ = ("count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = inf
+        self.maximum = -inf
+
+    def add(self, value: float) -> None:
+        """Add a single value to the partial aggregate."""
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "Partial") -> None:
+        """Merge another partial aggregate into this one."""
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+
+class WindowResult(NamedTuple):
+    """The aggregates of a single closed window, covering `[start_ns, end_ns)`."""
+
+    start_ns: int
+    end_ns: int
+    count: int
+    sum: float
+    min: float
+    max: float
+
+    @property
+    def mean(self) -> float:
+        """The mean of the values in the window."""
+        return self.sum / self.count
+
+
+class WindowAggregator:
+    """Incrementally aggregates a single signal according to an `AggregationPolicy`."""
+
+    def __init__(self, policy: AggregationPolicy):
+        self.policy = policy
+        """The aggregation policy."""
+
+        self.window_ns = round(policy.window * NS_PER_S)
+        """The window length, in nanoseconds."""
+
+        self.slide_ns = round((policy.slide or policy.window) * NS_PER_S)
+        """The interval between consecutive window starts (= the pane length), in nanoseconds."""
+
+        self.lateness_ns = round(policy.allowed_lateness * NS_PER_S)
+        """How far the watermark trails the latest timestamp seen, in nanoseconds."""
+
+        self.dropped = 0
+        """The number of readings dropped for arriving after their windows were emitted."""
+
+        self._panes: dict[int, Partial] = {}
+        """Open panes, keyed by pane start time."""
+
+        self._max_ts: int | None = None
+        """The latest timestamp seen so far."""
+
+        self._received_ns = 0
+        """The (monotonic) time at which the reading with the latest timestamp was received."""
+
+        self._next_end: int | None = None
+        """The end time of the next window to emit."""
+
+    @property
+    def watermark(self) -> int | None:
+        """The current watermark, or None if no readings have been seen yet.
+
+        All windows ending at or before the watermark have been emitted.
+        """
+        if self._max_ts is None:
+            return None
+        return self._max_ts - self.lateness_ns
+
+    def add(self, ts_ns: int, value: float, now_ns: int | None = None) -> list[WindowResult]:
+        """Add a reading and return any windows closed by the advancing watermark.
+
+        Args:
+            ts_ns (int): The timestamp of the reading, in nanoseconds since the Unix epoch.
+            value (float): The value of the reading.
+            now_ns (int | None, optional): The time the reading was received, on the clock used
+                by `tick()`.  Defaults to `time.monotonic_ns()`.
+
+        Returns:
+            list[WindowResult]: The newly closed windows, in order.  Usually empty.
+        """
+        pane_start = ts_ns - ts_ns % self.slide_ns
+        if self._next_end is None:
+            # The first window ending after the initial watermark
+            watermark = ts_ns - self.lateness_ns
+            self._next_end = watermark - watermark % self.slide_ns + self.slide_ns
+        elif ts_ns < self._next_end - self.window_ns:
+            # Every window containing this reading has already been emitted
+            self.dropped += 1
+            return []
+
+        pane = self._panes.get(pane_start)
+        if pane is None:
+            pane = self._panes[pane_start] = Partial()
+        pane.add(value)
+
+        if self._max_ts is None or ts_ns > self._max_ts:
+            self._max_ts = ts_ns
+            self._received_ns = monotonic_ns() if now_ns is None else now_ns
+            return self._advance(self._max_ts - self.lateness_ns)
+        return []
+
+    def tick(self, now_ns: int | None = None) -> list[WindowResult]:
+        """Return any windows closed by the time elapsed since the latest reading was received.
+
+        Event time is assumed to advance at the rate of the local clock, so a window is emitted
+        at most `allowed_lateness` after its end, even if no further readings arrive.
+
+        Args:
+            now_ns (int | None, optional): The current time, on the clock used by `add()`.
+                Defaults to `time.monotonic_ns()`.
+
+        Returns:
+            list[WindowResult]: The newly closed windows, in order.  Usually empty.
+        """
+        if not self._panes:
+            return []
+        elapsed = (monotonic_ns() if now_ns is None else now_ns) - self._received_ns
+        return self._advance(self._max_ts + max(elapsed, 0) - self.lateness_ns)
+
+    def flush(self) -> list[WindowResult]:
+        """Emit all remaining windows regardless of the watermark, e.g. on shutdown."""
+        if not self._panes:
+            return []
+        return self._advance(max(self._panes) + self.window_ns)
+
+    def _advance(self, watermark: int) -> list[WindowResult]:
+        """Emit all windows ending at or before `watermark` and evict panes no longer needed."""
+        results = []
+        while self._next_end <= watermark:
+            if not self._panes:
+                # Skip over gaps in the data without iterating over empty windows
+                self._next_end = watermark - watermark % self.slide_ns + self.slide_ns
+                break
+            first = min(self._panes)
+            if self._next_end <= first:
+                # Skip straight to the first window overlapping the oldest open pane
+                self._next_end = first + self.slide_ns
+                continue
+
+            end = self._next_end
+            start = end - self.window_ns
+            acc = Partial()
+            for pane_start in range(start, end, self.slide_ns):
+                pane = self._panes.get(pane_start)
+                if pane is not None:
+                    acc.merge(pane)
+            if acc.count:
+                results.append(
+                    WindowResult(start, end, acc.count, acc.total, acc.minimum, acc.maximum)
+                )
+
+            # The next window starts one slide later, so the oldest pane is no longer needed
+            self._panes.pop(start, None)
+            self._next_end = end + self.slide_ns
+        return results
+
+
+def measurement_name(sensor: SensorConfig, policy: AggregationPolicy) -> str:
+    """The InfluxDB measurement an aggregation policy of a sensor writes to.
+
+    This is `policy.measurement` if set, otherwise `<sensor name>_<window>s` for tumbling windows,
+    or `<sensor name>_<window>s_<slide>s` for sliding windows.
+    """
+    if policy.measurement:
+        return policy.measurement
+    if policy.slide is None or policy.slide == policy.window:
+        return f"{sensor.name}_{policy.window:g}s"
+    return f"{sensor.name}_{policy.window:g}s_{policy.slide:g}s"
+
+
+def check_measurements(sensors: dict[str, SensorConfig]) -> None:
+    """Check that no two aggregation policies write the same metric to the same measurement.
+
+    Aggregate points are tagged with the metric name only, so such policies would overwrite each
+    other's points.
+
+    Args:
+        sensors (dict[str, SensorConfig]): The sensor configurations, keyed by MQTT topic.
+
+    Raises:
+        ValueError: If two policies write the same metric to the same measurement.
+    """
+    counts = Counter(
+        (measurement_name(sensor, policy), metric.name)
+        for sensor in sensors.values()
+        for metric in sensor.metrics
+        for policy in metric.aggregations
+    )
+    for (measurement, metric), count in counts.items():
+        if count > 1:
+            raise ValueError(
+                f"{count} aggregation policies write metric {metric!r} to measurement "
+                f"{measurement!r}; set a distinct `measurement` for each"
+            )
+
+
+class StreamAggregator:
+    """Applies the aggregation policies of a set of sensors to their incoming readings."""
+
+    def __init__(self, sensors: dict[str, SensorConfig]):
+        """Create aggregators for every (topic, metric, policy) combination.
+
+        Args:
+            sensors (dict[str, SensorConfig]): The sensor configurations, keyed by MQTT topic.
+        """
+        self._aggregators: dict[str, list[tuple[str, str, WindowAggregator]]] = {}
+        """For each MQTT topic, a list of (metric name, measurement, aggregator) tuples."""
+
+        for topic, sensor in sensors.items():
+            entries = []
+            for metric in sensor.metrics:
+                for policy in metric.aggregations:
+                    entries.append(
+                        (metric.name, measurement_name(sensor, policy), WindowAggregator(policy))
+                    )
+            if entries:
+                self._aggregators[topic] = entries
+
+    def add(
+        self, topic: str, ts_ns: int, values: dict[str, float]
+    ) -> list[tuple[str, str, AggregationPolicy, WindowResult]]:
+        """Feed a decoded sensor payload to all matching aggregators.
+
+        Args:
+            topic (str): The MQTT topic the payload was received on.
+            ts_ns (int): The timestamp of the payload, in nanoseconds since the Unix epoch.
+            values (dict[str, float]): The metric values, keyed by metric name.
+
+        Returns:
+            list[tuple[str, str, AggregationPolicy, WindowResult]]: The newly closed windows, as
+                (measurement, metric name, policy, result) tuples.
+        """
+        results = []
+        now_ns = monotonic_ns()
+        for metric, measurement, aggregator in self._aggregators.get(topic, ()):
+            value = values.get(metric)
+            if value is None:
+                continue
+            for result in aggregator.add(ts_ns, value, now_ns):
+                results.append((measurement, metric, aggregator.policy, result))
+        return results
+
+    def tick(
+        self, now_ns: int | None = None
+    ) -> list[tuple[str, str, AggregationPolicy, WindowResult]]:
+        """Emit the windows of all aggregators closed by the passage of time.
+
+        See `WindowAggregator.tick()`: this emits the last windows of sensors that have stopped
+        sending readings.
+        """
+        now_ns = monotonic_ns() if now_ns is None else now_ns
+        results = []
+        for entries in self._aggregators.values():
+            for metric, measurement, aggregator in entries:
+                for result in aggregator.tick(now_ns):
+                    results.append((measurement, metric, aggregator.policy, result))
+        return results
+
+    def flush(self) -> list[tuple[str, str, AggregationPolicy, WindowResult]]:
+        """Emit all remaining windows of all aggregators, e.g. on shutdown."""
+        results = []
+        for entries in self._aggregators.values():
+            for metric, measurement, aggregator in entries:
+                for result in aggregator.flush():
+                    results.append((measurement, metric, aggregator.policy, result))
+        return results
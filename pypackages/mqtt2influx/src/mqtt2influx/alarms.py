@@ -0,0 +1,308 @@
+"""Incremental threshold and anomaly alarms on live sensor readings.
+
+Each metric with an `AlarmConfig` is tracked by a `SignalMonitor`, which evaluates all rules in
+O(1) time and memory per reading, without any database queries.  Alarms are only reported on
+state changes (raised/cleared), so repeated readings beyond a limit do not produce duplicates.
+
+The monitors are stateful, so every reading of a signal must reach the same monitor, in order.
+Alarms are evaluated by the ingestion workers, each of which handles every reading of the topics
+in its partition (see `worker.topic_partition()`), so each alarm is evaluated exactly once.
+"""
+
+import json
+import logging
+import queue
+import threading
+from enum import StrEnum
+from math import sqrt
+from typing import NamedTuple
+from uuid import UUID
+
+import psycopg
+from mock_sensor.config import AlarmConfig, MetricConfig, SensorConfig
+
+from .aggregate import NS_PER_S
+
+logger = logging.getLogger(__name__)
+
+
+class AlarmRule(StrEnum):
+    """The rule that raised an alarm."""
+
+    LOW = "low"
+    HIGH = "high"
+    RATE = "rate"
+    ZSCORE = "zscore"
+
+
+class AlarmEvent(NamedTuple):
+    """A change in the state of an alarm."""
+
+    topic: str
+    sensor: str
+    metric: str
+    rule: AlarmRule
+    raised: bool
+    value: float
+    ts_ns: int
+    severity: int
+    detail: str
+
+    def to_payload(self) -> dict:
+        """The alarm as a JSON-serializable payload, in the sensor payload format."""
+        ts, ts_ns = divmod(self.ts_ns, NS_PER_S)
+        return {
+            "ts": ts,
+            "ts_ns": ts_ns,
+            "sensor": self.sensor,
+            "metric": self.metric,
+            "rule": str(self.rule),
+            "state": "raised" if self.raised else "cleared",
+            "value": self.value,
+            "severity": self.severity,
+            "detail": self.detail,
+        }
+
+
+class SignalMonitor:
+    """Evaluates the alarm rules of a single metric incrementally."""
+
+    __slots__ = (
+        "metric",
+        "config",
+        "active",
+        "_last_ts",
+        "_last_value",
+        "_mean",
+        "_var",
+        "_n",
+        "_margin",
+    )
+
+    def __init__(self, metric: MetricConfig, config: AlarmConfig):
+        self.metric = metric
+        """The metric being monitored."""
+
+        self.config = config
+        """The alarm rules."""
+
+        self.active: set[AlarmRule] = set()
+        """The currently raised alarms."""
+
+        self._last_ts: int | None = None
+        self._last_value = 0.0
+        self._mean = 0.0
+        self._var = 0.0
+        self._n = 0
+        self._margin = config.hysteresis * (metric.max_value - metric.min_value)
+
+    def _set(
+        self, rule: AlarmRule, raise_: bool, clear: bool, value: float, detail: str
+    ) -> tuple[AlarmRule, bool, float, str] | None:
+        """Update the state of an alarm, returning the state change, if any."""
+        if rule in self.active:
+            if clear:
+                self.active.discard(rule)
+                return rule, False, value, detail
+        elif raise_:
+            self.active.add(rule)
+            return rule, True, value, detail
+        return None
+
+    def update(self, ts_ns: int, value: float) -> list[tuple[AlarmRule, bool, float, str]]:
+        """Evaluate a reading against all rules.
+
+        Args:
+            ts_ns (int): The timestamp of the reading, in nanoseconds since the Unix epoch.
+            value (float): The value of the reading.
+
+        Returns:
+            list[tuple[AlarmRule, bool, float, str]]: The alarm state changes, as (rule, raised,
+                value, detail) tuples.  Usually empty.
+        """
+        cfg = self.config
+        changes = []
+
+        if cfg.thresholds:
+            lo, hi = self.metric.min_value, self.metric.max_value
+            changes.append(
+                self._set(
+                    AlarmRule.LOW,
+                    value < lo,
+                    value >= lo + self._margin,
+                    value,
+                    f"value {value} below minimum {lo}",
+                )
+            )
+            changes.append(
+                self._set(
+                    AlarmRule.HIGH,
+                    value > hi,
+                    value <= hi - self._margin,
+                    value,
+                    f"value {value} above maximum {hi}",
+                )
+            )
+
+        if cfg.max_rate is not None and self._last_ts is not None and ts_ns > self._last_ts:
+            rate = abs(value - self._last_value) * NS_PER_S / (ts_ns - self._last_ts)
+            changes.append(
+                self._set(
+                    AlarmRule.RATE,
+                    rate > cfg.max_rate,
+                    rate <= cfg.max_rate * (1 - cfg.hysteresis),
+                    value,
+                    f"rate of change {rate:.6g}/s exceeds {cfg.max_rate}/s",
+                )
+            )
+
+        if cfg.max_zscore is not None:
+            # Evaluate against the EWMA statistics before this reading, then update them
+            diff = value - self._mean
+            if self._n >= cfg.warmup and self._var > 0:
+                z = abs(diff) / sqrt(self._var)
+                changes.append(
+                    self._set(
+                        AlarmRule.ZSCORE,
+                        z > cfg.max_zscore,
+                        z <= cfg.max_zscore * (1 - cfg.hysteresis),
+                        value,
+                        f"z-score {z:.3g} exceeds {cfg.max_zscore}",
+                    )
+                )
+            if self._n == 0:
+                self._mean = value
+            else:
+                alpha = cfg.ewma_alpha
+                self._mean += alpha * diff
+                self._var = (1 - alpha) * (self._var + alpha * diff * diff)
+            self._n += 1
+
+        if self._last_ts is None or ts_ns > self._last_ts:
+            self._last_ts, self._last_value = ts_ns, value
+        return [c for c in changes if c is not None]
+
+
+class AlarmEngine:
+    """Evaluates the alarm rules of a set of sensors against their incoming readings."""
+
+    def __init__(self, sensors: dict[str, SensorConfig]):
+        """Create monitors for every metric with alarm rules.
+
+        Args:
+            sensors (dict[str, SensorConfig]): The sensor configurations, keyed by MQTT topic.
+        """
+        self._monitors: dict[str, tuple[str, list[SignalMonitor]]] = {}
+        """For each MQTT topic, the sensor name and the monitors of its metrics."""
+
+        for topic, sensor in sensors.items():
+            monitors = [
+                SignalMonitor(metric, metric.alarms) for metric in sensor.metrics if metric.alarms
+            ]
+            if monitors:
+                self._monitors[topic] = (sensor.name, monitors)
+
+    def __bool__(self) -> bool:
+        """Whether any metric has alarm rules."""
+        return bool(self._monitors)
+
+    def evaluate(self, topic: str, ts_ns: int, values: dict[str, float]) -> list[AlarmEvent]:
+        """Evaluate a decoded sensor payload against the alarm rules of its metrics.
+
+        Args:
+            topic (str): The MQTT topic the payload was received on.
+            ts_ns (int): The timestamp of the payload, in nanoseconds since the Unix epoch.
+            values (dict[str, float]): The metric values, keyed by metric name.
+
+        Returns:
+            list[AlarmEvent]: The alarm state changes.  Usually empty.
+        """
+        entry = self._monitors.get(topic)
+        if entry is None:
+            return []
+        sensor, monitors = entry
+        events = []
+        for monitor in monitors:
+            value = values.get(monitor.metric.name)
+            if value is None:
+                continue
+            for rule, raised, v, detail in monitor.update(ts_ns, value):
+                events.append(
+                    AlarmEvent(
+                        topic,
+                        sensor,
+                        monitor.metric.name,
+                        rule,
+                        raised,
+                        v,
+                        ts_ns,
+                        monitor.config.severity if raised else 0,
+                        detail,
+                    )
+                )
+        return events
+
+
+class EventLogWriter:
+    """Writes alarm state changes to the `event_log` table from a background thread.
+
+    Alarms are published before they are logged, so a slow or unavailable database never delays
+    an alarm.
+    """
+
+    def __init__(self, conninfo: str, source: str):
+        self.conninfo = conninfo
+        """The PostgreSQL connection string."""
+
+        self.source = source
+        """The value of the `source` column, identifying this worker."""
+
+        self._queue: queue.SimpleQueue[tuple[AlarmEvent, UUID | None] | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def put(self, event: AlarmEvent, signal_id: UUID | None) -> None:
+        """Queue an alarm state change for writing.
+
+        Args:
+            event (AlarmEvent): The alarm state change.
+            signal_id (UUID | None): The ID of the signal in the `signal` table, or None if the
+                signal has not been synced (see `Worker.signal_id()`).
+        """
+        self._queue.put((event, signal_id))
+
+    def close(self) -> None:
+        """Write any queued events and stop the background thread."""
+        self._queue.put(None)
+        self._thread.join(timeout=10.0)
+
+    def _run(self) -> None:
+        """Background thread: write queued events, reconnecting as needed."""
+        conn: psycopg.Connection | None = None
+        while (item := self._queue.get()) is not None:
+            event, sid = item
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg.connect(self.conninfo, autocommit=True)
+                conn.execute(
+                    "INSERT INTO event_log (ts, severity, source, body) "
+                    "VALUES (to_timestamp(%s::double precision / 1e9), %s, %s, %s::jsonb)",
+                    (
+                        event.ts_ns,
+                        event.severity,
+                        self.source,
+                        json.dumps(
+                            {
+                                "type": "alarm",
+                                "topic": event.topic,
+                                "signal_id": str(sid) if sid else None,
+                            }
+                            | event.to_payload()
+                        ),
+                    ),
+                )
+            except psycopg.Error as exc:
+                logger.error("Failed to write alarm to event_log: %s", exc)
+                conn = None
+        if conn is not None:
+            conn.close()
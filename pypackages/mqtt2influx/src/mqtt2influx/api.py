@@ -0,0 +1,141 @@
+"""HTTP read API for recent sensor readings, served from the hot cache.
+
+`make_router()` creates a router that can be included in any FastAPI app, e.g.
+
+    cache = HotCache.from_registry(sensors)
+    subscriber = CacheSubscriber(cache, settings)  # start() in the app's lifespan
+    fallback = influx_fallback(influx_client, sensors)
+    app.include_router(make_router(cache, fallback), prefix="/readings")
+
+Latest values and windows covered by the cache are answered from memory; other windows are
+loaded from InfluxDB by `influx_fallback()`.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import influxdb_client_3 as influx
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from fastapi import APIRouter, HTTPException, status
+from mock_sensor.config import SensorConfig
+from polyglot_dtp.datastore.influx import select_range
+from pydantic import BaseModel
+
+from .cache import Fallback, HotCache, SignalKey
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class Reading(BaseModel):
+    """A single reading of a signal."""
+
+    ts_ns: int
+    """The timestamp, in nanoseconds since the Unix epoch."""
+
+    value: float
+    """The value of the reading."""
+
+
+class Readings(BaseModel):
+    """The readings of a signal in a time range, in time order."""
+
+    ts_ns: list[int]
+    """The timestamps, in nanoseconds since the Unix epoch."""
+
+    values: list[float]
+    """The values of the readings."""
+
+    cached: bool
+    """Whether the readings were served from the hot cache (rather than InfluxDB)."""
+
+
+def _to_ns(dt: datetime) -> int:
+    """Convert a timezone-aware datetime to nanoseconds since the Unix epoch."""
+    if dt.tzinfo is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Timestamps must include a timezone",
+        )
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def influx_fallback(client: influx.InfluxDBClient3, sensors: dict[str, SensorConfig]) -> Fallback:
+    """Create a fallback loading raw readings from InfluxDB, for use with `HotCache.query()`.
+
+    Raw readings are stored in the measurement named after the sensor, tagged with the MQTT
+    topic, with one field per metric (see `mqtt2influx.worker.Worker`).
+
+    Args:
+        client (influx.InfluxDBClient3): The InfluxDB client.
+        sensors (dict[str, SensorConfig]): The IoT registry, keyed by MQTT topic.
+
+    Returns:
+        Fallback: The fallback function.
+    """
+
+    def fallback(key: SignalKey, start_ns: int, end_ns: int) -> tuple[np.ndarray, np.ndarray]:
+        topic, metric = key
+        sensor = sensors.get(topic)
+        if sensor is None or end_ns <= start_ns:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Query whole microseconds covering the window, then trim to the exact window
+        table = select_range(
+            client,
+            sensor.name,
+            _EPOCH + timedelta(microseconds=start_ns // 1000),
+            _EPOCH + timedelta(microseconds=-(-end_ns // 1000)),
+            columns=["time", "topic", metric],
+            where=(pc.field("topic") == topic) & pc.field(metric).is_valid(),
+        ).read_all()
+        ts = pc.cast(table.column("time"), pa.timestamp("ns")).cast(pa.int64()).to_numpy()
+        values = pc.cast(table.column(metric), pa.float64()).to_numpy()
+        mask = (ts >= start_ns) & (ts < end_ns)
+        return ts[mask], values[mask]
+
+    return fallback
+
+
+def make_router(cache: HotCache, fallback: Fallback) -> APIRouter:
+    """Create a router serving reads of recent sensor readings.
+
+    Args:
+        cache (HotCache): The hot cache to serve reads from.
+        fallback (Fallback): Loads windows not covered by the cache from storage, e.g.
+            `influx_fallback()`.
+    """
+    router = APIRouter(tags=["readings"])
+
+    def _signal(topic: str, metric: str) -> SignalKey:
+        key = (topic, metric)
+        if key not in cache:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"No such signal: {topic} {metric}"
+            )
+        return key
+
+    @router.get("/latest", summary="Get the latest reading")
+    async def get_latest(topic: str, metric: str) -> Reading:
+        """Get the latest cached reading of a signal, by MQTT topic and metric name."""
+        if (latest := cache.latest(_signal(topic, metric))) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No recent readings of signal: {topic} {metric}",
+            )
+        return Reading(ts_ns=latest[0], value=latest[1])
+
+    @router.get("/window", summary="Get the readings in a time range")
+    def get_window(topic: str, metric: str, start: datetime, end: datetime) -> Readings:
+        """Get the readings of a signal in `[start, end)`, from the cache if possible.
+
+        Ranges not covered by the cache are loaded from storage using the fallback.
+        """
+        key = _signal(topic, metric)
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+        result = cache.window(key, start_ns, end_ns)
+        cached = result is not None
+        ts, values = result if cached else fallback(key, start_ns, end_ns)
+        return Readings(ts_ns=ts.tolist(), values=values.tolist(), cached=cached)
+
+    return router
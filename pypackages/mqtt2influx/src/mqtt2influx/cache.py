@@ -0,0 +1,304 @@
+"""In-memory hot cache of the most recent readings of each signal.
+
+Readings are stored in fixed-size ring buffers, one per signal, backed by two preallocated
+contiguous NumPy arrays (int64 timestamps and float64 values).  Memory use is therefore fixed
+at 16 bytes per point, i.e. `16 * capacity * signals` bytes, plus a small per-signal overhead.
+
+A signal is identified by its (MQTT topic, metric name) pair.
+
+The cache also tracks, per signal, the time from which it holds every reading.  Readings can be
+missed while the MQTT connection is down, and out-of-order readings are not cached, so a window
+is only answered from the cache if it lies entirely within this contiguous range; otherwise it
+is loaded from storage (e.g. with `mqtt2influx.api.influx_fallback()`).
+"""
+
+import logging
+import threading
+from typing import Callable
+
+import numpy as np
+import paho.mqtt.client as mqtt
+from mock_sensor.config import SensorConfig
+
+from .config import WorkerSettings
+from .message import InvalidMessageError, decode, verify
+
+logger = logging.getLogger(__name__)
+
+SignalKey = tuple[str, str]
+"""A signal, identified by its (MQTT topic, metric name) pair."""
+
+Fallback = Callable[[SignalKey, int, int], tuple[np.ndarray, np.ndarray]]
+"""Loads the (timestamps, values) of a signal in `[start_ns, end_ns)` from storage."""
+
+_UNCOVERED = np.iinfo(np.int64).max
+"""Coverage start of a signal whose cached readings are not known to be contiguous."""
+
+
+class HotCache:
+    """Fixed-size ring buffers of the most recent readings of a fixed set of signals.
+
+    All methods are thread-safe, so the cache can be fed from an MQTT client thread while being
+    queried from other threads.  Readings older than the latest cached reading of the same
+    signal (i.e. out-of-order readings) are not cached, and windows that may have contained them
+    are no longer covered.  Call `invalidate()` whenever readings may have been missed, e.g. on
+    disconnection from the broker.
+    """
+
+    def __init__(self, signals: list[SignalKey], capacity: int = 360):
+        """Preallocate ring buffers for a set of signals.
+
+        Args:
+            signals (list[SignalKey]): The signals to cache.
+            capacity (int, optional): The number of readings cached per signal.  Defaults to 360
+                (one hour at a 10-second sampling interval).
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        """The number of readings cached per signal."""
+
+        self._rows: dict[SignalKey, int] = {key: i for i, key in enumerate(signals)}
+        """The ring buffer (row) index of each signal."""
+
+        self._ts = np.zeros((len(self._rows), capacity), dtype=np.int64)
+        """Reading timestamps, in nanoseconds since the Unix epoch; one ring buffer per row."""
+
+        self._values = np.zeros((len(self._rows), capacity), dtype=np.float64)
+        """Reading values; one ring buffer per row."""
+
+        self._head = np.zeros(len(self._rows), dtype=np.int64)
+        """The position in each ring buffer at which the next reading will be written."""
+
+        self._count = np.zeros(len(self._rows), dtype=np.int64)
+        """The number of readings in each ring buffer (at most `capacity`)."""
+
+        self._since = np.full(len(self._rows), _UNCOVERED, dtype=np.int64)
+        """The time from which each ring buffer holds every reading of its signal (until the
+        oldest reading is overwritten), or `_UNCOVERED` until the first reading after startup or
+        `invalidate()`."""
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_registry(cls, sensors: dict[str, SensorConfig], capacity: int = 360) -> "HotCache":
+        """Create a cache for every metric of every sensor in the IoT registry."""
+        signals = [(topic, m.name) for topic, sensor in sensors.items() for m in sensor.metrics]
+        return cls(signals, capacity)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the ring buffers, in bytes."""
+        return (
+            self._ts.nbytes
+            + self._values.nbytes
+            + self._head.nbytes
+            + self._count.nbytes
+            + self._since.nbytes
+        )
+
+    def __contains__(self, key: SignalKey) -> bool:
+        """Whether the signal is cached."""
+        return key in self._rows
+
+    def add(self, key: SignalKey, ts_ns: int, value: float) -> None:
+        """Add a reading to the cache.  Readings of unknown signals are ignored.
+
+        Args:
+            key (SignalKey): The signal.
+            ts_ns (int): The timestamp of the reading, in nanoseconds since the Unix epoch.
+            value (float): The value of the reading.
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return
+        with self._lock:
+            head = self._head[row]
+            count = self._count[row]
+            if count and ts_ns <= self._ts[row, head - 1]:
+                # Out-of-order reading; the storage layer still has it, but the cache is only
+                # complete after it
+                self._since[row] = max(self._since[row], ts_ns + 1)
+                return
+            if self._since[row] == _UNCOVERED:
+                self._since[row] = ts_ns
+            self._ts[row, head] = ts_ns
+            self._values[row, head] = value
+            self._head[row] = (head + 1) % self.capacity
+            if count < self.capacity:
+                self._count[row] = count + 1
+
+    def add_payload(self, topic: str, ts_ns: int, values: dict[str, float]) -> None:
+        """Add all metric values of a decoded sensor payload to the cache."""
+        for metric, value in values.items():
+            self.add((topic, metric), ts_ns, value)
+
+    def invalidate(self) -> None:
+        """Mark all cached readings as possibly incomplete, e.g. after missing readings.
+
+        Cached readings are kept (so `latest()` still answers), but windows are only answered
+        from the cache again if they start at or after the next reading of their signal.
+        """
+        with self._lock:
+            self._since.fill(_UNCOVERED)
+
+    def latest(self, key: SignalKey) -> tuple[int, float] | None:
+        """Get the latest reading of a signal.
+
+        Returns:
+            tuple[int, float] | None: The (timestamp, value) of the latest reading, or None if no
+                readings of the signal are cached.
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            if not self._count[row]:
+                return None
+            pos = self._head[row] - 1
+            return int(self._ts[row, pos]), float(self._values[row, pos])
+
+    def covered_since(self, key: SignalKey) -> int | None:
+        """Get the time from which the cache holds every reading of a signal.
+
+        Returns:
+            int | None: The timestamp, in nanoseconds since the Unix epoch, or None if no
+                readings of the signal are cached since startup or the last `invalidate()`.
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            return self._covered_since(row)
+
+    def _covered_since(self, row: int) -> int | None:
+        """The coverage start of a row.  Must hold the lock."""
+        count = self._count[row]
+        if not count or self._since[row] == _UNCOVERED:
+            return None
+        oldest = int(self._ts[row, self._head[row] if count == self.capacity else 0])
+        return max(oldest, int(self._since[row]))
+
+    def window(
+        self, key: SignalKey, start_ns: int, end_ns: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """Get the cached readings of a signal in `[start_ns, end_ns)`.
+
+        Args:
+            key (SignalKey): The signal.
+            start_ns (int): The start of the window, in nanoseconds since the Unix epoch.
+            end_ns (int | None, optional): The end of the window.  Defaults to no limit.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: The (timestamps, values) of the readings, in
+                time order, or None if the window is not covered by the cache, i.e. it starts
+                before `covered_since()`.
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        with self._lock:
+            since = self._covered_since(row)
+            if since is None or start_ns < since:
+                return None
+
+            # The ring buffer holds (at most) two sorted segments: [head, capacity) and [0, head)
+            head, count = int(self._head[row]), int(self._count[row])
+            segments = (
+                [(head, self.capacity), (0, head)] if count == self.capacity else [(0, count)]
+            )
+            ts_parts, value_parts = [], []
+            for a, b in segments:
+                ts = self._ts[row, a:b]
+                lo = a + int(np.searchsorted(ts, start_ns, side="left"))
+                hi = b if end_ns is None else a + int(np.searchsorted(ts, end_ns, side="left"))
+                if lo < hi:
+                    ts_parts.append(self._ts[row, lo:hi])
+                    value_parts.append(self._values[row, lo:hi])
+            if not ts_parts:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            # Concatenation copies the data, so the result is safe to use outside the lock
+            return np.concatenate(ts_parts), np.concatenate(value_parts)
+
+    def query(
+        self, key: SignalKey, start_ns: int, end_ns: int, fallback: Fallback
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the readings of a signal in `[start_ns, end_ns)`, from the cache if possible.
+
+        Args:
+            key (SignalKey): The signal.
+            start_ns (int): The start of the window, in nanoseconds since the Unix epoch.
+            end_ns (int): The end of the window, in nanoseconds since the Unix epoch.
+            fallback (Fallback): Loads the readings from storage if the window is not covered by
+                the cache.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The (timestamps, values) of the readings.
+        """
+        result = self.window(key, start_ns, end_ns)
+        if result is None:
+            return fallback(key, start_ns, end_ns)
+        return result
+
+
+class CacheSubscriber:
+    """Feeds a `HotCache` from the MQTT broker in a background thread.
+
+    The subscriber uses a direct (non-shared) subscription, so that it receives every reading.
+    The cache is invalidated whenever the connection is lost, since readings published while
+    disconnected are not received.
+    """
+
+    def __init__(self, cache: HotCache, settings: WorkerSettings, client_id: str | None = None):
+        self.cache = cache
+        """The cache to feed."""
+
+        self.settings = settings
+        """Connection settings."""
+
+        self.hmac_key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+        """The HMAC key used to verify MQTT messages."""
+
+        self.mqtt_client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=client_id or "",
+            protocol=mqtt.MQTTv5,
+        )
+        """The MQTT client used to receive sensor messages."""
+
+        if settings.mqtt_username and settings.mqtt_password:
+            self.mqtt_client.username_pw_set(settings.mqtt_username, settings.mqtt_password)
+        self.mqtt_client.on_connect = self._on_connect
+        self.mqtt_client.on_disconnect = self._on_disconnect
+        self.mqtt_client.on_message = self._on_message
+
+    def _on_connect(self, client: mqtt.Client, _userdata, _flags, reason_code, _properties):
+        """(Re-)subscribe whenever a connection is established."""
+        if reason_code.is_failure:
+            logger.error("Failed to connect to MQTT broker: %s", reason_code)
+            return
+        client.subscribe(self.settings.mqtt_topic, qos=0)
+
+    def _on_disconnect(self, _client, _userdata, _flags, reason_code, _properties):
+        """Invalidate the cache, since readings may be missed until reconnected."""
+        logger.warning("Disconnected from MQTT broker (%s); invalidating hot cache", reason_code)
+        self.cache.invalidate()
+
+    def _on_message(self, _client, _userdata, message: mqtt.MQTTMessage):
+        """Verify a single incoming MQTT message and add its readings to the cache."""
+        try:
+            ts_ns, values = decode(verify(message.payload, self.hmac_key))
+        except InvalidMessageError:
+            return
+        self.cache.add_payload(message.topic, ts_ns, values)
+
+    def start(self) -> None:
+        """Connect to the broker and start feeding the cache in a background thread."""
+        self.mqtt_client.connect_async(self.settings.mqtt_hostname, self.settings.mqtt_port)
+        self.mqtt_client.loop_start()
+
+    def stop(self) -> None:
+        """Disconnect from the broker and stop the background thread."""
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
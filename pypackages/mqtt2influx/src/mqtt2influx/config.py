@@ -0,0 +1,142 @@
+"""Configuration for the MQTT-to-InfluxDB ingestion worker."""
+
+import pathlib
+
+import psycopg
+from mock_sensor.config import SensorConfig
+from mock_sensor.loader import load_configs
+from pydantic import Field, SecretStr
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from .aggregate import check_measurements
+
+
+class WorkerSettings(BaseSettings):
+    """Connection and batching settings for the ingestion worker."""
+
+    mqtt_hostname: str = Field(default="localhost")
+    """The hostname of the MQTT broker.  Defaults to "localhost"."""
+
+    mqtt_port: int = Field(default=1883, ge=1, le=65535)
+    """The port of the MQTT broker.  Defaults to 1883."""
+
+    mqtt_hmac_key: SecretStr = Field(default="mqtt-message-signing-key")
+    """The HMAC key used to verify MQTT messages.  Must match the key used by the sensors."""
+
+    mqtt_username: str | None = Field(default=None)
+    """An optional username for MQTT authentication."""
+
+    mqtt_password: str | None = Field(default=None)
+    """An optional password for MQTT authentication."""
+
+    mqtt_topic: str = Field(default="sensors/#")
+    """The MQTT topic filter of the sensor topics to handle.  Defaults to all sensor topics."""
+
+    mqtt_client_id_prefix: str = Field(default="mqtt2influx")
+    """The prefix of the MQTT client ID.  The full client ID is `<prefix>-<partition>` (see
+    `partitions`), so that a restarted worker takes over the session of its predecessor, even on
+    another node."""
+
+    partitions: int | None = Field(default=None, ge=1)
+    """The total number of worker processes sharing the registered topics, over all nodes.  Each
+    topic is assigned to exactly one worker by a stable hash (see `worker.topic_partition()`), so
+    that every reading of a signal is handled by the same worker, in order.  Defaults to the
+    number of worker processes on this node."""
+
+    partition_offset: int = Field(default=0, ge=0)
+    """The partition of the first worker process on this node: worker `<index>` handles the
+    topics of partition `<offset> + <index>`.  When running on several nodes, give each node its
+    own range of partitions, e.g. offsets 0 and 4 for two nodes of 4 processes each, with
+    `partitions` set to 8 on both."""
+
+    influxdb3_host: str = Field(default="http://localhost:8181")
+    """The URL of the InfluxDB 3 server."""
+
+    influxdb3_auth_token: SecretStr = Field(default="")
+    """The InfluxDB 3 authentication token."""
+
+    influxdb3_database: str = Field(default="dtp")
+    """The InfluxDB 3 database to write to."""
+
+    alarm_topic_prefix: str = Field(default="alarms")
+    """Alarms for a sensor are published (with QoS 1) to `<prefix>/<sensor topic>`.  Use an empty
+    value to disable alarm evaluation."""
+
+    postgres_host: str = Field(default="localhost")
+    """The hostname of the PostgreSQL database holding the `event_log` table."""
+
+    postgres_port: int = Field(default=5432, ge=1, le=65535)
+    """The port of the PostgreSQL database."""
+
+    postgres_user: str = Field(default="dtp")
+    """The PostgreSQL user."""
+
+    postgres_password: SecretStr | None = Field(default=None)
+    """The PostgreSQL password.  If not set, alarms are not written to `event_log`."""
+
+    postgres_db: str = Field(default="dtp")
+    """The PostgreSQL database name."""
+
+    signal_map: pathlib.Path | None = Field(default=None)
+    """The signal map file exported by `sync_signals.py`.  If set, signal IDs (e.g. of alarms
+    written to `event_log`) are resolved from the map, and registered metrics missing from it
+    (i.e. not yet synced to the `signal` table) are reported on startup and on first use."""
+
+    batch_size: int = Field(default=5000, ge=1)
+    """The maximum number of lines buffered before writing to InfluxDB."""
+
+    flush_interval: float = Field(default=1.0, gt=0)
+    """The maximum time (in seconds) a line is buffered before writing to InfluxDB."""
+
+    @property
+    def postgres_conninfo(self) -> str | None:
+        """The PostgreSQL connection string, or None if no password is set.
+
+        Since this includes the password, do not print this property.
+        """
+        if self.postgres_password is None:
+            return None
+        return psycopg.conninfo.make_conninfo(
+            host=self.postgres_host,
+            port=self.postgres_port,
+            user=self.postgres_user,
+            password=self.postgres_password.get_secret_value(),
+            dbname=self.postgres_db,
+        )
+
+    model_config = SettingsConfigDict(
+        extra="ignore",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+    )
+
+
+def load_registry(
+    config_dir: pathlib.Path, cache_dir: pathlib.Path | None = None
+) -> dict[str, SensorConfig]:
+    """Load all sensor configurations in a directory, keyed by MQTT topic.
+
+    This is the IoT registry: only messages on registered topics are ingested.
+
+    Args:
+        config_dir (pathlib.Path): A directory containing sensor YAML files (`*.sensor.yaml` or
+            `sensor.yaml`), searched recursively.
+        cache_dir (pathlib.Path | None, optional): A directory in which to cache validated
+            configs (see `mock_sensor.loader`).  Defaults to no caching.
+
+    Returns:
+        dict[str, SensorConfig]: The validated sensor configurations, keyed by MQTT topic.
+
+    Raises:
+        ValueError: If a sensor configuration is invalid, if two sensor configurations share
+            the same MQTT topic, or if two aggregation policies write the same metric to the same
+            measurement.
+    """
+    paths = sorted({*config_dir.rglob("sensor.yaml"), *config_dir.rglob("*.sensor.yaml")})
+    registry: dict[str, SensorConfig] = {}
+    for path, sensor_config in zip(paths, load_configs(paths, cache_dir)):
+        if sensor_config.mqtt_topic in registry:
+            raise ValueError(f"Duplicate MQTT topic {sensor_config.mqtt_topic!r} in {path}")
+        registry[sensor_config.mqtt_topic] = sensor_config
+    check_measurements(registry)
+    return registry
@@ -0,0 +1,118 @@
+"""Batched writes to InfluxDB 3 using the line protocol.
+
+See: https://docs.influxdata.com/influxdb3/core/reference/line-protocol/
+"""
+
+import logging
+from time import monotonic
+from typing import Any
+
+import influxdb_client_3 as influx
+from mock_sensor.config import AggregateFunction, AggregationPolicy
+
+from .aggregate import WindowResult
+
+logger = logging.getLogger(__name__)
+
+_MEASUREMENT_ESCAPES = str.maketrans({",": r"\,", " ": r"\ "})
+_KEY_ESCAPES = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ "})
+
+
+def _field_value(value: Any) -> str:
+    """Format a field value for the line protocol."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_line(measurement: str, tags: dict[str, str], fields: dict[str, Any], ts_ns: int) -> str:
+    """Format a single point in the InfluxDB line protocol.
+
+    Args:
+        measurement (str): The measurement (table) name.
+        tags (dict[str, str]): The tag set.
+        fields (dict[str, Any]): The field set.  Must not be empty.
+        ts_ns (int): The timestamp, in nanoseconds since the Unix epoch.
+
+    Returns:
+        str: The formatted line, without a trailing newline.
+    """
+    key = measurement.translate(_MEASUREMENT_ESCAPES)
+    for k, v in tags.items():
+        key += f",{k.translate(_KEY_ESCAPES)}={v.translate(_KEY_ESCAPES)}"
+    field_set = ",".join(
+        f"{k.translate(_KEY_ESCAPES)}={_field_value(v)}" for k, v in fields.items()
+    )
+    return f"{key} {field_set} {ts_ns}"
+
+
+def aggregate_to_line(
+    measurement: str, metric: str, policy: AggregationPolicy, result: WindowResult
+) -> str:
+    """Format a closed aggregation window in the InfluxDB line protocol.
+
+    The point is timestamped with the start of the window and tagged with the metric name.  Only
+    the aggregate functions listed in the policy are written.
+    """
+    fields = {}
+    for func in policy.functions:
+        match func:
+            case AggregateFunction.MEAN:
+                fields["mean"] = result.mean
+            case AggregateFunction.MIN:
+                fields["min"] = result.min
+            case AggregateFunction.MAX:
+                fields["max"] = result.max
+            case AggregateFunction.SUM:
+                fields["sum"] = result.sum
+            case AggregateFunction.COUNT:
+                fields["count"] = result.count
+    return to_line(measurement, {"metric": metric}, fields, result.start_ns)
+
+
+class BatchWriter:
+    """Buffers line protocol records and writes them to InfluxDB in batches."""
+
+    def __init__(self, client: influx.InfluxDBClient3, batch_size: int, flush_interval: float):
+        self.client = client
+        """The InfluxDB client."""
+
+        self.batch_size = batch_size
+        """The maximum number of lines buffered before writing."""
+
+        self.flush_interval = flush_interval
+        """The maximum time (in seconds) a line is buffered before writing."""
+
+        self._buffer: list[str] = []
+        """The buffered lines."""
+
+        self._first_buffered: float | None = None
+        """The monotonic time at which the oldest buffered line was added."""
+
+    def add(self, line: str) -> None:
+        """Buffer a line, writing the batch if it is full."""
+        if not self._buffer:
+            self._first_buffered = monotonic()
+        self._buffer.append(line)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush_if_due(self) -> None:
+        """Write the batch if its oldest line has been buffered for at least `flush_interval`."""
+        if self._buffer and monotonic() - self._first_buffered >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered lines to InfluxDB."""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            self.client.write(record=lines, write_precision="ns")
+        except Exception as exc:
+            # Sensor data is non-critical (QoS 0), so drop the batch rather than block ingestion
+            logger.error("Failed to write %d lines to InfluxDB: %s", len(lines), exc)
@@ -0,0 +1,91 @@
+"""Verification and decoding of signed sensor messages.
+
+See `dev-docs/docs/arch/iot.md` for the message format.
+"""
+
+import hmac
+import json
+from binascii import a2b_base64, b2a_base64
+from typing import Any
+
+# Must match the settings used by the sender to compute the HMAC digest
+CANONICAL_JSON = {
+    "indent": None,
+    "separators": (",", ":"),
+    "sort_keys": True,
+}
+
+
+class InvalidMessageError(ValueError):
+    """Raised when an MQTT message is malformed or fails HMAC verification."""
+
+
+def sign(payload: dict[str, Any], hmac_key: bytes) -> str:
+    """Sign a payload and return the full message, i.e. `{"hmac": ..., "payload": {...}}`.
+
+    Args:
+        payload (dict[str, Any]): The payload, including `ts` and `ts_ns` keys.
+        hmac_key (bytes): The HMAC key shared with the receiver.
+
+    Returns:
+        str: The signed message, JSON-encoded in canonical form.
+    """
+    payload_str = json.dumps(payload, **CANONICAL_JSON)
+    digest = b2a_base64(
+        hmac.digest(hmac_key, payload_str.encode("utf-8"), "sha256"), newline=False
+    ).decode("utf-8")
+    # Since the payload encoding is canonical (1-to-1), embed the payload instead of payload_str
+    return json.dumps({"payload": payload, "hmac": digest}, **CANONICAL_JSON)
+
+
+def verify(msg: bytes, hmac_key: bytes) -> dict[str, Any]:
+    """Verify a signed sensor message and return its payload.
+
+    Args:
+        msg (bytes): The raw MQTT message, i.e. `{"hmac": ..., "payload": {...}}`.
+        hmac_key (bytes): The HMAC key shared with the sender.
+
+    Returns:
+        dict[str, Any]: The verified payload.
+
+    Raises:
+        InvalidMessageError: If the message is malformed or its digest does not match.
+    """
+    try:
+        obj = json.loads(msg)
+        payload = obj["payload"]
+        digest = a2b_base64(obj["hmac"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidMessageError(f"Malformed message: {exc}") from exc
+    if not isinstance(payload, dict):
+        raise InvalidMessageError("Malformed message: payload is not an object")
+
+    payload_str = json.dumps(payload, **CANONICAL_JSON)
+    expected = hmac.digest(hmac_key, payload_str.encode("utf-8"), "sha256")
+    if not hmac.compare_digest(digest, expected):
+        raise InvalidMessageError("HMAC verification failed")
+    return payload
+
+
+def decode(payload: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+    """Split a verified payload into its timestamp and metric values.
+
+    Args:
+        payload (dict[str, Any]): A verified payload containing `ts` and `ts_ns` keys.
+
+    Returns:
+        tuple[int, dict[str, Any]]: The timestamp in nanoseconds since the Unix epoch, and the
+            metric values keyed by metric name.
+
+    Raises:
+        InvalidMessageError: If the timestamp is missing or invalid.
+    """
+    values = dict(payload)
+    try:
+        ts = values.pop("ts")
+        ts_ns = values.pop("ts_ns")
+    except KeyError as exc:
+        raise InvalidMessageError(f"Missing timestamp field {exc}") from exc
+    if not (isinstance(ts, int) and isinstance(ts_ns, int) and 0 <= ts_ns < 1_000_000_000):
+        raise InvalidMessageError("Invalid timestamp")
+    return ts * 1_000_000_000 + ts_ns, values
@@ -0,0 +1,233 @@
+"""Signal metadata: stable signal IDs, bulk sync to Postgres, and a memory-mapped signal map.
+
+Each metric of each registered sensor is a signal, identified by its (MQTT topic, metric name)
+pair (see `cache.SignalKey`).  Its `signal_id` in the Postgres `signal` table is a UUIDv5 of that
+pair (see `signal_id()`), so any service can compute it locally, without a database lookup, and
+the same sensor config always maps to the same signal.  The signal is named after its InfluxDB
+measurement and field, i.e. `<sensor name>.<metric name>`, so that the two stores can be joined.
+
+- `sync_signals()` reconciles the `signal` table with the registry in a single set-based upsert.
+- `write_signal_map()` exports the synced signals to a compact binary file, which `SignalMap`
+  memory-maps.  Worker processes on the same node therefore share one copy of the map in the
+  page cache, and start without querying the database.
+
+To sync the signals of all sensors in a registry, and export the signal map:
+
+    uv run sync_signals.py --registry ../../twins --output signals.map
+"""
+
+import mmap
+import os
+import pathlib
+import struct
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple
+from uuid import UUID, uuid5
+
+import psycopg
+from mock_sensor.config import SensorConfig
+
+from .cache import SignalKey
+
+SIGNAL_NAMESPACE = UUID("124b2f74-7171-56c0-8ec1-3082c9c62d01")
+"""The UUIDv5 namespace of signal IDs: `uuid5(NAMESPACE_URL,
+"https://github.com/yinchi/polyglot-dtp/signal")`.  Never change this."""
+
+MAP_MAGIC = b"DTPSIGM1"
+"""The first bytes of a signal map file, identifying its format version."""
+
+_HEADER = struct.Struct("<8sI")
+"""The header of a signal map file: the magic bytes and the number of signals."""
+
+_RECORD = struct.Struct("<16sIHHH")
+"""A signal in a signal map file: its ID, and the offset and lengths of its key
+(`<topic>#<metric>`), name and unit in the string table.  Records are sorted by ID."""
+
+
+@lru_cache(maxsize=1 << 16)
+def signal_id(topic: str, metric: str) -> UUID:
+    """Get the ID of the signal of a metric, i.e. `uuid5(SIGNAL_NAMESPACE, "<topic>#<metric>")`.
+
+    `#` cannot appear in a topic that messages are published to, so the name is unambiguous.
+    """
+    return uuid5(SIGNAL_NAMESPACE, f"{topic}#{metric}")
+
+
+class Signal(NamedTuple):
+    """A row of the `signal` table, for a metric of a registered sensor."""
+
+    signal_id: UUID
+    """The signal ID (see `signal_id()`)."""
+
+    topic: str
+    """The MQTT topic of the sensor."""
+
+    metric: str
+    """The metric name, i.e. the InfluxDB field."""
+
+    name: str
+    """The signal name, `<sensor name>.<metric name>`, i.e. the InfluxDB measurement and field."""
+
+    unit: str | None
+    """The unit of the metric, or None if unitless."""
+
+    @property
+    def key(self) -> SignalKey:
+        """The (MQTT topic, metric name) pair identifying the signal."""
+        return (self.topic, self.metric)
+
+
+def signals_of(registry: dict[str, SensorConfig]) -> list[Signal]:
+    """Get the signals of all metrics of all registered sensors, sorted by ID."""
+    return sorted(
+        (
+            Signal(
+                signal_id(topic, metric.name),
+                topic,
+                metric.name,
+                f"{sensor.name}.{metric.name}",
+                metric.unit or None,
+            )
+            for topic, sensor in registry.items()
+            for metric in sensor.metrics
+        ),
+        key=lambda s: s.signal_id.bytes,
+    )
+
+
+def sync_signals(conn: psycopg.Connection, signals: list[Signal]) -> tuple[int, int]:
+    """Insert or update the given signals in the `signal` table, in a single statement.
+
+    Rows whose name and unit are already up to date are not touched.  Other rows of the table
+    (e.g. signals not backed by a sensor config) are left as they are.
+
+    Returns:
+        tuple[int, int]: The number of inserted and updated rows.
+    """
+    rows = conn.execute(
+        "INSERT INTO signal (signal_id, name, unit) "
+        "SELECT * FROM unnest(%s::uuid[], %s::text[], %s::text[]) "
+        "ON CONFLICT (signal_id) DO UPDATE SET name = EXCLUDED.name, unit = EXCLUDED.unit "
+        "WHERE (signal.name, signal.unit) IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.unit) "
+        "RETURNING xmax = 0",  # True for inserted rows, False for updated rows
+        (
+            [s.signal_id for s in signals],
+            [s.name for s in signals],
+            [s.unit for s in signals],
+        ),
+    ).fetchall()
+    inserted = sum(1 for (is_insert,) in rows if is_insert)
+    return inserted, len(rows) - inserted
+
+
+def write_signal_map(path: pathlib.Path, signals: Iterable[Signal]) -> int:
+    """Write a signal map file, atomically replacing any existing file.
+
+    Returns:
+        int: The number of signals written.
+    """
+    signals = sorted(signals, key=lambda s: s.signal_id.bytes)
+    records = bytearray()
+    strings = bytearray()
+    for s in signals:
+        key = f"{s.topic}#{s.metric}".encode("utf-8")
+        name = s.name.encode("utf-8")
+        unit = (s.unit or "").encode("utf-8")
+        records += _RECORD.pack(s.signal_id.bytes, len(strings), len(key), len(name), len(unit))
+        strings += key + name + unit
+
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAP_MAGIC, len(signals)))
+        f.write(records)
+        f.write(strings)
+    os.replace(tmp_path, path)
+    return len(signals)
+
+
+class SignalMap:
+    """A read-only, memory-mapped signal map file (see `write_signal_map()`).
+
+    Lookups binary-search the memory-mapped records, and are cached per key, so repeated lookups
+    are dictionary lookups.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        """Memory-map a signal map file.
+
+        Raises:
+            ValueError: If the file is not a signal map file.
+        """
+        self.path = path
+        """The signal map file."""
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"Not a signal map file: {path}")
+        magic, self._count = _HEADER.unpack_from(self._mmap)
+        self._strings = _HEADER.size + self._count * _RECORD.size
+        if magic != MAP_MAGIC or len(self._mmap) < self._strings:
+            raise ValueError(f"Not a signal map file: {path}")
+
+        self._cache: dict[SignalKey, Signal | None] = {}
+
+    def __len__(self) -> int:
+        """The number of signals."""
+        return self._count
+
+    def __iter__(self) -> Iterator[Signal]:
+        """Iterate over the signals, sorted by ID."""
+        return (self._signal(i) for i in range(self._count))
+
+    def __contains__(self, key: SignalKey) -> bool:
+        """Whether the signal of a (MQTT topic, metric name) pair is in the map."""
+        return self.get(*key) is not None
+
+    def get(self, topic: str, metric: str) -> Signal | None:
+        """Get the signal of a metric, or None if it is not in the map."""
+        key = (topic, metric)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        signal = None
+        sid = signal_id(topic, metric)
+        if (i := self._find(sid.bytes)) is not None:
+            signal = self._signal(i)
+            if signal.key != key:  # Only possible if the file is corrupt
+                signal = None
+        self._cache[key] = signal
+        return signal
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._cache.clear()
+        self._mmap.close()
+
+    def _find(self, sid: bytes) -> int | None:
+        """Binary-search the records for a signal ID."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = _HEADER.size + mid * _RECORD.size
+            found = self._mmap[offset : offset + 16]
+            if found == sid:
+                return mid
+            if found < sid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _signal(self, i: int) -> Signal:
+        """Decode the i-th record."""
+        sid, offset, key_len, name_len, unit_len = _RECORD.unpack_from(
+            self._mmap, _HEADER.size + i * _RECORD.size
+        )
+        start = self._strings + offset
+        data = self._mmap[start : start + key_len + name_len + unit_len]
+        topic, metric = data[:key_len].decode("utf-8").split("#", 1)
+        name = data[key_len : key_len + name_len].decode("utf-8")
+        unit = data[key_len + name_len :].decode("utf-8")
+        return Signal(UUID(bytes=sid), topic, metric, name, unit or None)
@@ -0,0 +1,106 @@
+"""Run multiple ingestion worker processes on a single node.
+
+The registered topics are partitioned between the worker processes (see
+`worker.topic_partition()`), and each process subscribes only to the topics of its partition.  Each
+process performs its own verification, decoding, aggregation and batching; nothing is shared
+between processes.
+"""
+
+import logging
+import multiprocessing as mp
+import os
+from time import monotonic, sleep
+
+from mock_sensor.config import SensorConfig
+
+from .config import WorkerSettings
+from .worker import Worker
+
+logger = logging.getLogger(__name__)
+
+RESTART_BACKOFF = 5.0
+"""Minimum time (in seconds) between restarts of the same worker process."""
+
+
+def _run_worker(settings: WorkerSettings, registry: dict[str, SensorConfig], index: int) -> None:
+    """Entry point of a worker process."""
+    logging.basicConfig(level=logging.INFO, format=f"[{index}] %(message)s", force=True)
+    Worker(settings, registry, index=index).run()
+
+
+def default_process_count() -> int:
+    """The number of CPU cores available to this process."""
+    return os.process_cpu_count() or 1
+
+
+class Supervisor:
+    """Starts a fixed number of worker processes and restarts any that exit."""
+
+    def __init__(
+        self,
+        settings: WorkerSettings,
+        registry: dict[str, SensorConfig],
+        processes: int | None = None,
+    ):
+        self.processes = processes or default_process_count()
+        """The number of worker processes.  Defaults to the number of available CPU cores."""
+
+        partitions = settings.partitions or self.processes
+        if settings.partition_offset + self.processes > partitions:
+            raise ValueError(
+                f"Partitions {settings.partition_offset}-"
+                f"{settings.partition_offset + self.processes - 1} are out of range "
+                f"(there are {partitions} partitions)"
+            )
+
+        self.settings = settings.model_copy(update={"partitions": partitions})
+        """Connection and batching settings, shared by all workers."""
+
+        self.registry = registry
+        """The IoT registry, shared by all workers."""
+
+        self._ctx = mp.get_context("spawn")
+        """Use fresh interpreters for the workers, so no MQTT/InfluxDB state is inherited."""
+
+        self._workers: list[mp.Process | None] = [None] * self.processes
+        """The worker processes, indexed by worker index."""
+
+        self._started: list[float] = [0.0] * self.processes
+        """The monotonic start time of each worker process."""
+
+    def _start(self, index: int) -> None:
+        """Start (or restart) the worker process with the given index."""
+        proc = self._ctx.Process(
+            target=_run_worker,
+            args=(self.settings, self.registry, index),
+            name=f"mqtt2influx-{index}",
+        )
+        proc.start()
+        self._workers[index] = proc
+        self._started[index] = monotonic()
+
+    def run(self) -> None:
+        """Run the worker processes until interrupted."""
+        logger.info("Starting %d worker processes...", self.processes)
+        for index in range(self.processes):
+            self._start(index)
+        try:
+            while True:
+                sleep(1.0)
+                for index, proc in enumerate(self._workers):
+                    if proc.is_alive() or monotonic() - self._started[index] < RESTART_BACKOFF:
+                        continue
+                    logger.warning(
+                        "Worker %d exited with code %s, restarting...", index, proc.exitcode
+                    )
+                    self._start(index)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.info("Stopping worker processes...")
+            for proc in self._workers:
+                if proc.is_alive():
+                    proc.terminate()  # SIGTERM: workers flush their buffers before exiting
+            for proc in self._workers:
+                proc.join()
+            logger.info("All workers stopped.")
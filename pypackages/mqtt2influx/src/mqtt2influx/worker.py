@@ -0,0 +1,272 @@
+"""The MQTT-to-InfluxDB ingestion worker."""
+
+import logging
+import signal
+import sys
+import zlib
+from time import monotonic
+from uuid import UUID
+
+import influxdb_client_3 as influx
+import paho.mqtt.client as mqtt
+from mock_sensor.config import SensorConfig
+
+from .aggregate import StreamAggregator
+from .alarms import AlarmEngine, AlarmEvent, EventLogWriter
+from .config import WorkerSettings
+from .influx import BatchWriter, aggregate_to_line, to_line
+from .message import InvalidMessageError, decode, sign, verify
+from .signals import SignalKey, SignalMap, signal_id
+
+# Ensure we exit cleanly on SIGTERM (e.g. from `docker stop`)
+signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
+
+logger = logging.getLogger(__name__)
+
+TICK_INTERVAL = 1.0
+"""The interval (in seconds) between checks for aggregation windows closed by the passage of time,
+e.g. for sensors that have stopped sending readings."""
+
+SUBSCRIBE_BATCH = 1000
+"""The maximum number of topic filters per SUBSCRIBE packet."""
+
+
+def topic_partition(topic: str, partitions: int) -> int:
+    """The partition (i.e. worker) a sensor topic is assigned to.
+
+    Uses a stable hash (CRC-32) of the topic, so that all workers on all nodes agree.
+    """
+    return zlib.crc32(topic.encode("utf-8")) % partitions
+
+
+class Worker:
+    """Subscribes to sensor topics, verifies and decodes messages, and writes them to InfluxDB.
+
+    Raw readings are written to the measurement named after the sensor.  If any metric has
+    aggregation policies, the readings are also fed through a streaming aggregation stage and
+    the closed windows are written to their own measurements.
+
+    When several workers share the load, the registered topics are partitioned between them
+    (see `topic_partition()`), and each worker subscribes only to the topics of its partition.
+    Every reading of a signal is therefore handled by the same worker, in order, and its
+    aggregates are complete.
+
+    Readings are also evaluated against the alarm rules of their metrics.  Alarm state changes
+    are published immediately (with QoS 1) and logged to the `event_log` table in the background.
+    """
+
+    def __init__(
+        self,
+        settings: WorkerSettings,
+        registry: dict[str, SensorConfig],
+        index: int = 0,
+        writer: BatchWriter | None = None,
+    ):
+        self.settings = settings
+        """Connection and batching settings."""
+
+        self.partitions = settings.partitions or 1
+        """The total number of workers (partitions) sharing the registered topics."""
+
+        self.partition = settings.partition_offset + index
+        """The partition of this worker."""
+
+        if self.partition >= self.partitions:
+            raise ValueError(
+                f"Worker partition {self.partition} is out of range "
+                f"(there are {self.partitions} partitions)"
+            )
+
+        self.registry = {
+            topic: sensor
+            for topic, sensor in registry.items()
+            if mqtt.topic_matches_sub(settings.mqtt_topic, topic)
+            and topic_partition(topic, self.partitions) == self.partition
+        }
+        """The sensor configurations handled by this worker (i.e. in its partition), keyed by MQTT
+        topic."""
+
+        self.client_id = f"{settings.mqtt_client_id_prefix}-{self.partition}"
+        """The MQTT client ID.  Stable across restarts of the worker with the same partition."""
+
+        self.subscriptions = (
+            [settings.mqtt_topic] if self.partitions == 1 else sorted(self.registry)
+        )
+        """The MQTT topic filters subscribed to: all sensor topics if there is a single partition,
+        otherwise the registered topics of this partition."""
+
+        self.hmac_key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+        """The HMAC key used to verify MQTT messages."""
+
+        self.aggregator = StreamAggregator(self.registry)
+        """The streaming aggregation stage."""
+
+        self.alarms = AlarmEngine(self.registry) if settings.alarm_topic_prefix else None
+        """The alarm rule engine.  None if alarms are disabled."""
+
+        self.event_log: EventLogWriter | None = None
+        """Writes alarm state changes to the `event_log` table.  None if not configured."""
+
+        if self.alarms and settings.postgres_conninfo:
+            self.event_log = EventLogWriter(
+                settings.postgres_conninfo, source=f"mqtt2influx/{self.client_id}"
+            )
+
+        self.signals = SignalMap(settings.signal_map) if settings.signal_map else None
+        """The synced signals (see `signals.py`), used to resolve signal IDs.  None if no signal
+        map is configured."""
+
+        self._unsynced: set[SignalKey] = set()
+        """Signals looked up but missing from the signal map, each reported once."""
+
+        if self.signals is not None:
+            unsynced = [
+                (topic, metric.name)
+                for topic, sensor in self.registry.items()
+                for metric in sensor.metrics
+                if (topic, metric.name) not in self.signals
+            ]
+            if unsynced:
+                logger.warning(
+                    "%d registered metrics are missing from %s (e.g. %s); run sync_signals.py",
+                    len(unsynced),
+                    settings.signal_map,
+                    "#".join(unsynced[0]),
+                )
+
+        self.writer = writer or BatchWriter(
+            influx.InfluxDBClient3(
+                host=settings.influxdb3_host,
+                token=settings.influxdb3_auth_token.get_secret_value(),
+                database=settings.influxdb3_database,
+            ),
+            batch_size=settings.batch_size,
+            flush_interval=settings.flush_interval,
+        )
+        """Batches line protocol records for writing to InfluxDB."""
+
+        self.mqtt_client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=self.client_id,
+            protocol=mqtt.MQTTv5,
+        )
+        """The MQTT client used to receive sensor messages."""
+
+        if settings.mqtt_username and settings.mqtt_password:
+            self.mqtt_client.username_pw_set(settings.mqtt_username, settings.mqtt_password)
+        self.mqtt_client.on_connect = self._on_connect
+        self.mqtt_client.on_message = self._on_message
+
+    def _on_connect(self, client: mqtt.Client, _userdata, _flags, reason_code, _properties):
+        """(Re-)subscribe whenever a connection is established."""
+        if reason_code.is_failure:
+            logger.error("Failed to connect to MQTT broker: %s", reason_code)
+            return
+        logger.info(
+            "%s connected to MQTT broker, subscribing to %d topic(s) of partition %d/%d",
+            self.client_id,
+            len(self.subscriptions),
+            self.partition,
+            self.partitions,
+        )
+        for i in range(0, len(self.subscriptions), SUBSCRIBE_BATCH):
+            client.subscribe([(topic, 0) for topic in self.subscriptions[i : i + SUBSCRIBE_BATCH]])
+
+    def _on_message(self, _client, _userdata, message: mqtt.MQTTMessage):
+        """Handle a single incoming MQTT message."""
+        self.handle(message.topic, message.payload)
+
+    def handle(self, topic: str, msg: bytes) -> None:
+        """Verify, decode and store a single sensor message.
+
+        Invalid messages, and messages on topics that are unregistered or not in the partition of
+        this worker, are logged and dropped.
+
+        Args:
+            topic (str): The MQTT topic the message was received on.
+            msg (bytes): The raw MQTT message.
+        """
+        sensor = self.registry.get(topic)
+        if sensor is None:
+            logger.debug("Ignoring message on topic %s: not registered in this partition", topic)
+            return
+        try:
+            ts_ns, values = decode(verify(msg, self.hmac_key))
+        except InvalidMessageError as exc:
+            logger.warning("Dropping message on topic %s: %s", topic, exc)
+            return
+        if not values:
+            return
+
+        if self.alarms:
+            for event in self.alarms.evaluate(topic, ts_ns, values):
+                self._publish_alarm(event)
+
+        self.writer.add(to_line(sensor.name, {"topic": topic}, values, ts_ns))
+        for measurement, metric, policy, result in self.aggregator.add(topic, ts_ns, values):
+            self.writer.add(aggregate_to_line(measurement, metric, policy, result))
+
+    def _publish_alarm(self, event: AlarmEvent) -> None:
+        """Publish an alarm state change and queue it for the event log."""
+        logger.warning(
+            "Alarm %s: %s/%s %s: %s",
+            "raised" if event.raised else "cleared",
+            event.sensor,
+            event.metric,
+            event.rule,
+            event.detail,
+        )
+        self.mqtt_client.publish(
+            f"{self.settings.alarm_topic_prefix}/{event.topic}",
+            sign(event.to_payload(), self.hmac_key),
+            qos=1,
+        )
+        if self.event_log:
+            self.event_log.put(event, self.signal_id(event.topic, event.metric))
+
+    def signal_id(self, topic: str, metric: str) -> UUID | None:
+        """Resolve the ID of a signal in the `signal` table.
+
+        With a signal map, the ID is looked up in the map, so that only synced signals are
+        referenced; unsynced signals resolve to None, with a warning the first time.  Without a
+        signal map, the ID is computed (see `signals.signal_id()`), assuming it was synced.
+        """
+        if self.signals is None:
+            return signal_id(topic, metric)
+        if (signal := self.signals.get(topic, metric)) is not None:
+            return signal.signal_id
+        if (topic, metric) not in self._unsynced:
+            self._unsynced.add((topic, metric))
+            logger.warning(
+                "Signal %s#%s is missing from %s; run sync_signals.py",
+                topic,
+                metric,
+                self.settings.signal_map,
+            )
+        return None
+
+    def run(self) -> None:
+        """Run the worker until interrupted."""
+        self.mqtt_client.connect(self.settings.mqtt_hostname, self.settings.mqtt_port)
+        next_tick = monotonic() + TICK_INTERVAL
+        try:
+            while True:
+                # Service the network loop and time-based flushes from a single thread,
+                # so that no locking is needed around the aggregator and write buffer
+                self.mqtt_client.loop(timeout=min(0.1, self.settings.flush_interval))
+                if monotonic() >= next_tick:
+                    next_tick = monotonic() + TICK_INTERVAL
+                    for measurement, metric, policy, result in self.aggregator.tick():
+                        self.writer.add(aggregate_to_line(measurement, metric, policy, result))
+                self.writer.flush_if_due()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.info("Flushing remaining data...")
+            for measurement, metric, policy, result in self.aggregator.flush():
+                self.writer.add(aggregate_to_line(measurement, metric, policy, result))
+            self.writer.flush()
+            if self.event_log:
+                self.event_log.close()
+            self.mqtt_client.disconnect()
+            logger.info("Disconnected.")
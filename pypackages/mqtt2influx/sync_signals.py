@@ -0,0 +1,82 @@
+"""Sync the signals of all registered sensors to the Postgres `signal` table.
+
+Every metric of every sensor in the registry (a directory of sensor YAML files) is upserted into
+the `signal` table in a single statement, with a stable ID derived from its MQTT topic and metric
+name (see `mqtt2influx.signals`).  The synced signals are then exported to a signal map file,
+which ingestion workers memory-map on startup (see `SIGNAL_MAP` in `config.py`).
+
+Run this whenever sensor configs are added or changed; re-running it with unchanged configs
+does not modify the table.
+"""
+
+import logging
+import pathlib
+
+import click
+import psycopg
+from mqtt2influx.config import WorkerSettings, load_registry
+from mqtt2influx.signals import signals_of, sync_signals, write_signal_map
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(message)s",
+)
+
+CONTEXT_SETTINGS = {"help_option_names": ["--help", "-h"]}
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.option(
+    "--registry",
+    "-r",
+    type=click.Path(exists=True, file_okay=False, readable=True, path_type=pathlib.Path),
+    required=True,
+    help="Directory containing the sensor config files (YAML format), searched recursively.",
+)
+@click.option(
+    "--env",
+    "-e",
+    type=click.Path(exists=True, dir_okay=False, readable=True, path_type=pathlib.Path),
+    required=False,
+    help="Path to the worker config file (dotenv format), for the Postgres settings.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default="signals.map",
+    show_default=True,
+    help="The signal map file to write.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True, path_type=pathlib.Path),
+    envvar="SENSOR_CONFIG_CACHE",
+    required=False,
+    help="Directory in which to cache the validated sensor configs, to speed up restarts.",
+)
+def run(
+    registry: pathlib.Path, env: pathlib.Path, output: pathlib.Path, cache_dir: pathlib.Path
+) -> None:
+    """Sync the signals of all registered sensors, and export the signal map."""
+    settings = WorkerSettings(_env_file=env.resolve()) if env else WorkerSettings()
+    if settings.postgres_conninfo is None:
+        raise click.UsageError("POSTGRES_PASSWORD must be set to sync signals.")
+
+    signals = signals_of(load_registry(registry.resolve(), cache_dir))
+    logging.info(f"Found {len(signals)} signals in registry {registry.resolve()}")
+
+    with psycopg.connect(settings.postgres_conninfo) as conn:
+        inserted, updated = sync_signals(conn, signals)
+    logging.info(
+        f"Inserted {inserted}, updated {updated}, "
+        f"unchanged {len(signals) - inserted - updated} signals."
+    )
+
+    # Only export the map once the signals are committed, so every mapped signal exists
+    write_signal_map(output, signals)
+    logging.info(f"Wrote signal map: {output.resolve()}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,346 @@
+"""Polyglot DTP: opt-in sampling profiler for API requests and sensor ticks.
+
+A `Profiler` is disabled by default, and costs one attribute check per request or tick while
+disabled.  Once enabled (e.g. via an admin endpoint, or a signal; see
+`install_signal_handler()`), it profiles a random fraction of requests or ticks:
+
+- While at least one profiled request or tick is running, a wall-clock interval timer
+  (`ITIMER_REAL`) fires every `interval` seconds.  The `SIGALRM` handler records the stack of
+  the interrupted frame, and attributes it to the profiled request or tick in the current
+  context (via a context variable).  Context variables are inherited by child tasks, so
+  asynchronous code is attributed correctly even when requests are interleaved on one event
+  loop.
+- When a profiled request or tick finishes, its trace is kept if it is among the slowest
+  `capacity` traces seen so far.
+
+Signals are delivered to the main thread only, so only requests and ticks running in the main
+thread (e.g. on the event loop, but not in a thread pool) are profiled.  Traces can be exported
+in the "folded stacks" format, one line per unique stack with a sample count, accepted by
+`flamegraph.pl`, `inferno-flamegraph` and https://www.speedscope.app/.
+
+Example:
+    profiler = Profiler(sample_rate=0.1)
+    profiler.enable()
+    with profiler.profile("tick"):
+        ...
+    print(profiler.folded())
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import pathlib
+import random
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from types import CodeType, FrameType
+from typing import Any, Awaitable, Callable, Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = 0.001
+"""The shortest sampling interval, in seconds.  Shorter intervals are clamped to this, since each
+sample interrupts the profiled code, and a timer firing faster than the signal handler can run
+would stall it."""
+
+
+class Trace(NamedTuple):
+    """The samples collected during a single profiled request or tick."""
+
+    name: str
+    """The name of the request or tick, e.g. "GET /foo"."""
+
+    started: float
+    """The start time, in seconds since the Unix epoch."""
+
+    duration: float
+    """The wall-clock duration, in seconds."""
+
+    stacks: dict[str, int]
+    """The number of samples of each stack, as semicolon-separated frames from the root."""
+
+    @property
+    def samples(self) -> int:
+        """The total number of samples."""
+        return sum(self.stacks.values())
+
+
+class _Session:
+    """A profiled request or tick in progress."""
+
+    __slots__ = ("name", "started", "t0", "stacks", "token")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.stacks: dict[str, int] = {}
+        self.token: Token | None = None
+
+
+_current: ContextVar[_Session | None] = ContextVar("profiling_session", default=None)
+"""The profiled request or tick in the current context, if any."""
+
+
+class Profiler:
+    """Samples the stacks of a random fraction of requests or ticks, keeping the slowest."""
+
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        interval: float = 0.001,
+        capacity: int = 20,
+        max_depth: int = 128,
+    ):
+        """Create a (disabled) profiler.
+
+        Args:
+            sample_rate (float, optional): The fraction of requests or ticks to profile.
+                Defaults to 0.01.
+            interval (float, optional): The sampling interval, in seconds.  Clamped to at least
+                `MIN_INTERVAL`.  Defaults to 0.001.
+            capacity (int, optional): The number of (slowest) traces to keep.  Defaults to 20.
+            max_depth (int, optional): The maximum number of frames recorded per sample, from
+                the innermost frame.  Defaults to 128.
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if interval <= 0 or capacity < 1:
+            raise ValueError("interval and capacity must be positive")
+        if interval < MIN_INTERVAL:
+            logger.warning(
+                "Profiler interval %g s is too short; using %g s", interval, MIN_INTERVAL
+            )
+            interval = MIN_INTERVAL
+
+        self.enabled = False
+        """Whether the profiler is enabled.  Checked before profiling each request or tick."""
+
+        self.sample_rate = sample_rate
+        """The fraction of requests or ticks to profile."""
+
+        self.interval = interval
+        """The sampling interval, in seconds."""
+
+        self.capacity = capacity
+        """The number of (slowest) traces to keep."""
+
+        self.max_depth = max_depth
+        """The maximum number of frames recorded per sample."""
+
+        self._active = 0
+        """The number of profiled requests or ticks in progress."""
+
+        self._heap: list[tuple[float, int, Trace]] = []
+        """The slowest traces, as a min-heap on duration."""
+
+        self._seq = itertools.count()
+        self._labels: dict[CodeType, str] = {}
+        self._lock = threading.Lock()  # Guards `_heap`, which may be read from other threads
+        self._previous_handler: Any = None
+
+    ### Control ###
+
+    def enable(self, sample_rate: float | None = None) -> None:
+        """Start profiling.  Must be called from the main thread.
+
+        Args:
+            sample_rate (float | None, optional): A new sampling rate.  Defaults to keeping the
+                current rate.
+        """
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError("sample_rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+        if not self.enabled:
+            self._previous_handler = signal.signal(signal.SIGALRM, self._on_signal)
+            self.enabled = True
+            if self._active:
+                signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+            logger.info("Profiler enabled (sample rate %g)", self.sample_rate)
+
+    def disable(self) -> None:
+        """Stop profiling.  Must be called from the main thread.  Kept traces are not cleared."""
+        if self.enabled:
+            self.enabled = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler or signal.SIG_DFL)
+            logger.info("Profiler disabled")
+
+    def clear(self) -> None:
+        """Discard all kept traces."""
+        with self._lock:
+            self._heap.clear()
+
+    ### Profiling ###
+
+    def start(self, name: str) -> _Session | None:
+        """Start profiling a request or tick, if it is selected for sampling.
+
+        Returns:
+            _Session | None: The profiling session, to be passed to `stop()`, or None if the
+                request or tick is not profiled.
+        """
+        if (
+            not self.enabled
+            or random.random() >= self.sample_rate
+            or threading.current_thread() is not threading.main_thread()
+        ):
+            return None
+        session = _Session(name)
+        session.token = _current.set(session)
+        self._active += 1
+        if self._active == 1:
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        return session
+
+    def stop(self, session: _Session) -> None:
+        """Stop profiling a request or tick, keeping its trace if it is among the slowest."""
+        duration = time.perf_counter() - session.t0
+        _current.reset(session.token)
+        self._active -= 1
+        if self._active == 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+        trace = Trace(session.name, session.started, duration, session.stacks)
+        item = (duration, next(self._seq), trace)
+        with self._lock:
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profile the enclosed block, if it is selected for sampling.
+
+        To avoid any overhead while the profiler is disabled, check `enabled` first:
+
+            if profiler.enabled:
+                with profiler.profile("tick"):
+                    tick()
+            else:
+                tick()
+        """
+        session = self.start(name)
+        try:
+            yield
+        finally:
+            if session is not None:
+                self.stop(session)
+
+    def _label(self, code: CodeType) -> str:
+        """A frame label for the folded stacks format, e.g. "MockSensor.run (sensor.py:142)"."""
+        label = self._labels.get(code)
+        if label is None:
+            name = (
+                f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            label = self._labels[code] = name.replace(";", ",")
+        return label
+
+    def _on_signal(self, _signum: int, frame: FrameType | None) -> None:
+        """Record the stack of the interrupted frame in the current session, if any."""
+        session = _current.get()
+        if session is None or frame is None:
+            return
+        labels = []
+        f = frame
+        while f is not None and len(labels) < self.max_depth:
+            labels.append(self._label(f.f_code))
+            f = f.f_back
+        stack = ";".join(reversed(labels))
+        session.stacks[stack] = session.stacks.get(stack, 0) + 1
+
+    ### Results ###
+
+    def traces(self) -> list[Trace]:
+        """Get the kept traces, slowest first."""
+        with self._lock:
+            return [trace for _, _, trace in sorted(self._heap, reverse=True)]
+
+    def folded(self) -> str:
+        """Export the kept traces in the folded stacks format.
+
+        Each trace is a separate root frame, named after the request or tick and its duration,
+        e.g. "GET /foo (12.3 ms)".
+        """
+        lines = []
+        for trace in self.traces():
+            root = f"{trace.name} ({trace.duration * 1000:.1f} ms)".replace(";", ",")
+            lines.extend(f"{root};{stack} {count}" for stack, count in trace.stacks.items())
+        return "".join(f"{line}\n" for line in lines)
+
+    def status(self) -> dict[str, Any]:
+        """Summarize the profiler settings and kept traces, e.g. for an admin endpoint."""
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval": self.interval,
+            "capacity": self.capacity,
+            "traces": [
+                {
+                    "name": trace.name,
+                    "started": trace.started,
+                    "duration": trace.duration,
+                    "samples": trace.samples,
+                }
+                for trace in self.traces()
+            ],
+        }
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling HTTP requests.
+
+    Add it last, so that it wraps all other middleware, e.g.
+    `app.add_middleware(ProfilerMiddleware, profiler=profiler)`.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Handle an ASGI request, profiling it if it is selected for sampling."""
+        if not self.profiler.enabled or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        session = self.profiler.start(f"{scope['method']} {scope['path']}")
+        if session is None:
+            return await self.app(scope, receive, send)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            self.profiler.stop(session)
+
+
+def install_signal_handler(
+    profiler: Profiler,
+    signum: int = signal.SIGUSR2,
+    output: pathlib.Path | None = None,
+) -> None:
+    """Toggle the profiler on receiving a signal (`kill -USR2 <pid>` by default).
+
+    Must be called from the main thread.
+
+    Args:
+        profiler (Profiler): The profiler to toggle.
+        signum (int, optional): The signal.  Defaults to SIGUSR2.
+        output (pathlib.Path | None, optional): A file to which the kept traces are written, in
+            the folded stacks format, each time the profiler is disabled.  Defaults to none.
+    """
+
+    def toggle(_signum: int, _frame: FrameType | None) -> None:
+        if not profiler.enabled:
+            profiler.enable()
+            return
+        profiler.disable()
+        if output is not None:
+            output.write_text(profiler.folded())
+            logger.info("Wrote %d profiler traces to %s", len(profiler.traces()), output)
+
+    signal.signal(signum, toggle)
@@ -1,14 +1,18 @@
 """Polyglot DTP: Test module."""
 
 import logging
-import sys
+import threading
 import tomllib
 from base64 import b64decode
-from typing import Awaitable, Callable
+from typing import Annotated, Awaitable, Callable
 
 import dotenv
-from fastapi import FastAPI, Request, Response, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.responses import PlainTextResponse
+from polyglot_dtp.compression import CompressionMiddleware
+from polyglot_dtp.logutil import setup_logging
+from polyglot_dtp.profiling import Profiler, ProfilerMiddleware, install_signal_handler
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Endpoints that should not produce access log entries
@@ -39,6 +43,25 @@ class Settings(BaseSettings):
 
     foo: str = "default_value"
 
+    log_json: bool = True
+    """Whether to write logs as JSON (one object per line).  Defaults to True."""
+
+    access_log_sample: int = Field(default=1, ge=1)
+    """Write only one in every N access log entries.  Defaults to 1 (all entries)."""
+
+    admin_api: bool = False
+    """Whether to serve the `/admin` endpoints.  Defaults to False, since `authorize_user` does
+    not verify passwords: enable only behind a reverse proxy that does (e.g. Traefik BasicAuth)."""
+
+    admin_users: set[str] = {"admin"}
+    """Users allowed to access the `/admin` endpoints.  Defaults to "admin" only."""
+
+    profile_sample_rate: float = Field(default=0.01, ge=0, le=1)
+    """The fraction of requests profiled while profiling is enabled.  Defaults to 0.01."""
+
+    compress_min_size: int = Field(default=1024, ge=0)
+    """Response bodies smaller than this (in bytes) are not compressed.  Defaults to 1024."""
+
     model_config = SettingsConfigDict(
         extra="ignore",
         env_prefix="TEST_API_",
@@ -57,19 +80,15 @@ toml_path = dotenv.find_dotenv(filename="pyproject.toml", raise_error_if_not_fou
 with open(toml_path, "rb") as fp:
     pyproject = tomllib.load(fp)
 
-logger = logging.getLogger("twins.test")
-logger.handlers = [
-    logging.StreamHandler(sys.stdout),
-]
-logger.handlers[0].setFormatter(
-    logging.Formatter(
-        "%(levelname)10s   %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+# Log via a background thread, so that writing to stdout never delays request handling.
+# Uvicorn configures its loggers before importing the app, so we can replace their handlers here.
+setup_logging(
+    json_format=settings.log_json,
+    text_format="%(levelname)10s   %(message)s",
+    sampling={"uvicorn.access": settings.access_log_sample},
+    loggers=["twins.test", "uvicorn", "uvicorn.access"],
 )
-logger.propagate = False
-
-logger.setLevel(logging.INFO)
+logger = logging.getLogger("twins.test")
 
 logger.info("---------------------------PYPROJECT----------------------------------")
 logger.info("name: %s", pyproject["project"]["name"])
@@ -153,6 +172,32 @@ async def authorize_user(
     return await call_next(request)
 
 
+# Compress (gzip or zstd, as accepted by the client) all but small responses, chunk by chunk
+# for streaming responses.
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compress_min_size)
+
+# Profiling is disabled until enabled via `kill -USR2 <pid>`, or `PUT /admin/profiler` if the
+# admin endpoints are enabled (`TEST_API_ADMIN_API`).
+# Added last, so that it wraps (and profiles) the authorization and compression middleware.
+profiler = Profiler(sample_rate=settings.profile_sample_rate)
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+if threading.current_thread() is threading.main_thread():
+    install_signal_handler(profiler)
+
+
+def require_admin(request: Request) -> str:
+    """Dependency: require the admin endpoints to be enabled, and the user to be an admin user.
+
+    The admin endpoints are hidden (404) unless enabled via `settings.admin_api`.
+    """
+    if not settings.admin_api:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    username = getattr(request.state, "username", None)
+    if username not in settings.admin_users:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return username
+
+
 @app.get(
     "/",
     response_class=PlainTextResponse,
@@ -194,3 +239,62 @@ async def get_foo():
 async def health():
     """Health check endpoint."""
     return PlainTextResponse("OK")
+
+
+@app.get(
+    "/admin/profiler",
+    summary="Get the profiler status",
+    dependencies=[Depends(require_admin)],
+)
+async def get_profiler() -> dict:
+    """Get the profiler settings and a summary of the kept (slowest) traces."""
+    return profiler.status()
+
+
+@app.put(
+    "/admin/profiler",
+    summary="Enable or disable the profiler",
+    dependencies=[Depends(require_admin)],
+)
+async def set_profiler(
+    enabled: bool, sample_rate: Annotated[float | None, Query(ge=0, le=1)] = None
+) -> dict:
+    """Enable or disable profiling of a fraction of requests.
+
+    While enabled, the slowest profiled requests are kept, and can be downloaded from
+    `/admin/profiler/traces`.
+    """
+    if enabled:
+        profiler.enable(sample_rate)
+    else:
+        profiler.disable()
+    return profiler.status()
+
+
+@app.get(
+    "/admin/profiler/traces",
+    response_class=PlainTextResponse,
+    summary="Download the slowest traces",
+    dependencies=[Depends(require_admin)],
+)
+async def get_profiler_traces():
+    """Download the kept (slowest) traces in the folded stacks format.
+
+    The output can be rendered as a flame graph by e.g. `flamegraph.pl`, `inferno-flamegraph` or
+    https://www.speedscope.app/.
+    """
+    return PlainTextResponse(
+        profiler.folded(),
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+    )
+
+
+@app.delete(
+    "/admin/profiler/traces",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Discard the kept traces",
+    dependencies=[Depends(require_admin)],
+)
+async def clear_profiler_traces():
+    """Discard the kept traces."""
+    profiler.clear()
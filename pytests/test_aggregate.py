@@ -0,0 +1,169 @@
+"""Tests for the streaming windowed aggregation stage of the ingestion worker.
+
+To run this test suite individually:
+    just pytest aggregate
+
+To run all tests:
+    just pytests
+"""
+
+import time
+
+import pytest
+from mock_sensor.config import AggregationPolicy, MetricConfig, SensorConfig
+from mqtt2influx.aggregate import (
+    NS_PER_S,
+    WindowAggregator,
+    check_measurements,
+    measurement_name,
+)
+from pydantic import ValidationError
+
+TOPIC = "sensors/test/sensor-1"
+
+
+def make_registry(policies: list[AggregationPolicy]) -> dict[str, SensorConfig]:
+    """Create a registry of a single sensor with a single metric, aggregated by `policies`."""
+    metric = MetricConfig(
+        name="level",
+        description="A test metric",
+        unit="%",
+        initial_value=50.0,
+        max_step=1.0,
+        min_value=0.0,
+        max_value=100.0,
+        aggregations=policies,
+    )
+    sensor = SensorConfig(name="sensor-1", description="", mqtt_topic=TOPIC, metrics=[metric])
+    return {TOPIC: sensor}
+
+
+def test_tumbling_window():
+    """Windows are emitted once the watermark passes their end."""
+    agg = WindowAggregator(AggregationPolicy(window=10))
+    results = []
+    for t in range(25):
+        results += agg.add(t * NS_PER_S, float(t))
+
+    assert [(r.start_ns // NS_PER_S, r.end_ns // NS_PER_S) for r in results] == [(0, 10), (10, 20)]
+    first = results[0]
+    assert (first.count, first.sum, first.min, first.max, first.mean) == (10, 45.0, 0.0, 9.0, 4.5)
+
+    (last,) = agg.flush()
+    assert (last.start_ns // NS_PER_S, last.count) == (20, 5)
+
+
+def test_sliding_window():
+    """Sliding windows overlap and each covers `window / slide` panes."""
+    agg = WindowAggregator(AggregationPolicy(window=10, slide=5))
+    results = []
+    for t in range(20):
+        results += agg.add(t * NS_PER_S, 1.0)
+
+    assert [(r.start_ns // NS_PER_S, r.count) for r in results] == [(-5, 5), (0, 10), (5, 10)]
+    # Memory use is bounded by the number of panes per window
+    assert len(agg._panes) <= 3
+
+
+def test_late_data():
+    """Readings within the allowed lateness are aggregated; older readings are dropped."""
+    agg = WindowAggregator(AggregationPolicy(window=10, allowed_lateness=5))
+    assert agg.add(8 * NS_PER_S, 1.0) == []
+    assert agg.add(12 * NS_PER_S, 1.0) == []
+    assert agg.add(9 * NS_PER_S, 1.0) == []  # late, but within the allowed lateness
+
+    (result,) = agg.add(15 * NS_PER_S, 1.0)
+    assert (result.start_ns, result.count) == (0, 2)
+
+    assert agg.add(7 * NS_PER_S, 1.0) == []  # window [0, 10) already emitted
+    assert agg.dropped == 1
+
+
+def test_gap_in_data():
+    """Long gaps in the data do not produce empty windows."""
+    agg = WindowAggregator(AggregationPolicy(window=10))
+    agg.add(0, 1.0)
+    results = agg.add(86_400 * NS_PER_S, 2.0)
+    assert [r.start_ns for r in results] == [0]
+    assert agg.flush()[0].start_ns == 86_400 * NS_PER_S
+
+
+def test_late_first_readings():
+    """The allowed lateness applies from the first reading onwards."""
+    agg = WindowAggregator(AggregationPolicy(window=10, allowed_lateness=5))
+    assert agg.add(12 * NS_PER_S, 1.0) == []
+    assert agg.add(9 * NS_PER_S, 1.0) == []  # the watermark is at 7 s
+    assert agg.dropped == 0
+
+    (result,) = agg.add(15 * NS_PER_S, 1.0)
+    assert (result.start_ns, result.count) == (0, 1)
+
+
+@pytest.mark.parametrize(("window", "slide"), [(10, None), (300, 10)])
+def test_gap_ended_by_reading(window, slide):
+    """A reading ending a long gap does not step through the empty windows in between."""
+    agg = WindowAggregator(AggregationPolicy(window=window, slide=slide))
+    agg.add(0, 1.0)
+    gap = 365 * 86_400 * NS_PER_S
+    start = time.perf_counter()
+    results = agg.add(gap, 2.0)
+    results += agg.add(gap + 600 * NS_PER_S, 3.0)
+    assert time.perf_counter() - start < 0.1
+
+    assert all(r.count == 1 for r in results)
+    assert sum(r.sum for r in results) == (1.0 + 2.0) * (window // (slide or window))
+    assert results[-1].end_ns <= gap + 600 * NS_PER_S
+
+
+def test_invalid_policy():
+    """The window length must be a multiple of the slide."""
+    with pytest.raises(ValidationError):
+        AggregationPolicy(window=10, slide=3)
+
+
+def test_stalled_sensor():
+    """Windows are closed by the passage of time if no further readings arrive."""
+    agg = WindowAggregator(AggregationPolicy(window=10, allowed_lateness=2))
+    for t in range(8):
+        assert agg.add(t * NS_PER_S, 1.0, now_ns=t * NS_PER_S) == []
+
+    # The watermark advances from the latest timestamp (7 s) with the time since it was received
+    assert agg.tick(now_ns=11 * NS_PER_S) == []  # 7 + 4 - 2 < 10
+    (result,) = agg.tick(now_ns=12 * NS_PER_S)
+    assert (result.start_ns, result.count) == (0, 8)
+    assert agg.tick(now_ns=100 * NS_PER_S) == []
+
+    # Readings for windows already emitted are dropped
+    assert agg.add(9 * NS_PER_S, 1.0, now_ns=100 * NS_PER_S) == []
+    assert agg.dropped == 1
+
+
+def test_measurement_names():
+    """Sliding windows get their own default measurement, and duplicates are rejected."""
+    registry = make_registry(
+        [AggregationPolicy(window=60), AggregationPolicy(window=60, slide=10)],
+    )
+    sensor = registry[TOPIC]
+    assert [measurement_name(sensor, p) for p in sensor.metrics[0].aggregations] == [
+        "sensor-1_60s",
+        "sensor-1_60s_10s",
+    ]
+    check_measurements(registry)
+
+    with pytest.raises(ValueError, match="sensor-1_60s_10s"):
+        check_measurements(
+            make_registry(
+                [
+                    AggregationPolicy(window=60, slide=10, functions=["mean"]),
+                    AggregationPolicy(window=60, slide=10, functions=["max"]),
+                ]
+            )
+        )
+    check_measurements(
+        make_registry(
+            [
+                AggregationPolicy(window=60, slide=10, functions=["mean"]),
+                AggregationPolicy(window=60, slide=10, functions=["max"], measurement="max_60s"),
+            ]
+        )
+    )
@@ -0,0 +1,148 @@
+"""Tests for the incremental alarm rule engine of the ingestion worker.
+
+To run this test suite individually:
+    just pytest alarms
+
+To run all tests:
+    just pytests
+"""
+
+import statistics
+from time import perf_counter_ns
+
+from mock_sensor.config import AlarmConfig, MetricConfig, SensorConfig
+from mqtt2influx.aggregate import NS_PER_S
+from mqtt2influx.alarms import AlarmEngine, AlarmRule
+from mqtt2influx.config import WorkerSettings
+from mqtt2influx.message import sign
+from mqtt2influx.worker import Worker
+
+TOPIC = "sensors/test/sensor-1"
+
+
+def make_registry(**alarm_config) -> dict[str, SensorConfig]:
+    """Create a registry of a single sensor with a single metric in [0, 100]."""
+    metric = MetricConfig(
+        name="level",
+        description="A test metric",
+        unit="%",
+        initial_value=50.0,
+        max_step=1.0,
+        min_value=0.0,
+        max_value=100.0,
+        alarms=AlarmConfig(**alarm_config),
+    )
+    sensor = SensorConfig(name="sensor-1", description="", mqtt_topic=TOPIC, metrics=[metric])
+    return {TOPIC: sensor}
+
+
+def make_engine(**alarm_config) -> AlarmEngine:
+    """Create an alarm engine for a single sensor with a single metric in [0, 100]."""
+    return AlarmEngine(make_registry(**alarm_config))
+
+
+class ListWriter:
+    """Collects the lines written by a worker."""
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, line: str) -> None:
+        """Collect a line."""
+        self.lines.append(line)
+
+
+def feed(engine: AlarmEngine, values: list[float]) -> list[tuple[AlarmRule, bool]]:
+    """Feed one reading per second and return the (rule, raised) state changes."""
+    return [
+        (event.rule, event.raised)
+        for t, value in enumerate(values)
+        for event in engine.evaluate(TOPIC, t * NS_PER_S, {"level": value})
+    ]
+
+
+def test_threshold_hysteresis():
+    """Threshold alarms are raised once and only cleared once back inside the margin."""
+    engine = make_engine(hysteresis=0.05)
+    changes = feed(engine, [50, 101, 102, 99, 101, 96, 94, -1])
+    assert changes == [
+        (AlarmRule.HIGH, True),
+        (AlarmRule.HIGH, False),  # 96 is below 100 - 5% of the range
+        (AlarmRule.LOW, True),
+    ]
+
+
+def test_rate_of_change():
+    """Rate alarms compare consecutive readings."""
+    engine = make_engine(thresholds=False, max_rate=5.0, hysteresis=0.0)
+    assert feed(engine, [50, 52, 60, 61, 62]) == [(AlarmRule.RATE, True), (AlarmRule.RATE, False)]
+
+
+def test_zscore():
+    """Z-score alarms fire on outliers after the warmup period."""
+    engine = make_engine(thresholds=False, max_zscore=4.0, warmup=20)
+    noise = [50 + (i % 5 - 2) * 0.5 for i in range(40)]
+    assert feed(engine, noise) == []
+    assert feed(engine, [80]) == [(AlarmRule.ZSCORE, True)]
+
+
+def test_engine_truthiness():
+    """An engine is only truthy if some metric has alarm rules."""
+    engine = make_engine()
+    assert engine
+    assert not AlarmEngine({})
+
+
+def test_partitioned_workers():
+    """With two worker partitions, each alarm is raised and cleared once, by the topic's owner."""
+    registry = make_registry(max_rate=5.0, hysteresis=0.05)
+    settings = WorkerSettings(partitions=2)
+    published = []
+
+    workers = [Worker(settings, registry, index=i, writer=ListWriter()) for i in range(2)]
+    for worker in workers:
+        worker.mqtt_client.publish = lambda topic, payload, qos, i=worker.partition: (
+            published.append((i, topic))
+        )
+
+    hmac_key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+    values = [50, 101, 102, 99, 101, 96, 94, 95, 96, 97]
+    for t, value in enumerate(values):
+        msg = sign({"ts": t, "ts_ns": 0, "level": value}, hmac_key).encode("utf-8")
+        for worker in workers:
+            worker.handle(TOPIC, msg)  # only the worker owning the topic handles it
+
+    (owner,) = [w for w in workers if TOPIC in w.registry]
+    assert len(owner.writer.lines) == 10
+    # HIGH raised at 101 and cleared at 94; RATE raised at 50 -> 101 and cleared at 102
+    assert published == [(owner.partition, f"alarms/{TOPIC}")] * 4
+    assert owner.alarms._monitors[TOPIC][1][0].active == set()
+
+
+def test_alarm_latency():
+    """Alarms are published within a few milliseconds of receiving the reading."""
+    registry = make_registry(hysteresis=0.0)
+    settings = WorkerSettings()
+    worker = Worker(settings, registry, writer=ListWriter())
+    published = []
+    worker.mqtt_client.publish = lambda topic, payload, qos: published.append(perf_counter_ns())
+
+    # Alternate between an out-of-range and a normal reading, so every reading changes state
+    hmac_key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+    msgs = [
+        sign({"ts": t, "ts_ns": 0, "level": 101 if t % 2 else 50}, hmac_key).encode("utf-8")
+        for t in range(1, 1001)
+    ]
+    latencies = []
+    for msg in msgs:
+        received = perf_counter_ns()
+        worker.handle(TOPIC, msg)
+        latencies.append(published[-1] - received)
+
+    assert len(published) == len(msgs)
+    latencies.sort()
+    median_ms = statistics.median(latencies) / 1e6
+    p99_ms = latencies[int(len(latencies) * 0.99)] / 1e6
+    print(f"Reading-to-alarm latency: median {median_ms:.3f} ms, p99 {p99_ms:.3f} ms")
+    assert median_ms < 1.0
+    assert p99_ms < 5.0
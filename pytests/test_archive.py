@@ -0,0 +1,102 @@
+"""Tests for the Parquet cold-storage archive of observations.
+
+To run this test suite individually:
+    just pytest archive
+
+To run all tests:
+    just pytests
+"""
+
+import random
+import statistics
+import uuid
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+
+import pyarrow as pa
+from polyglot_dtp.datastore.archive import ARCHIVE_SCHEMA, read_entries, write_partition
+
+T0 = datetime(2025, 1, 1, tzinfo=UTC)
+SIGNALS = sorted(uuid.uuid4() for _ in range(3))
+
+
+def _rows(n: int) -> list[tuple]:
+    """Generate `n` observations per signal at a 10-second interval, sorted by signal and time."""
+    return [
+        (sig, T0 + timedelta(seconds=10 * i), 20.0 + 0.01 * (i % 100), None, "{}", "test")
+        for sig in SIGNALS
+        for i in range(n)
+    ]
+
+
+def test_round_trip(tmp_path):
+    """Each signal gets its own row group(s), and reads return only the requested range."""
+    entries = write_partition(tmp_path, "observation/chunk.parquet", _rows(100))
+    assert [e.signal_id for e in entries] == SIGNALS
+    assert [e.row_groups for e in entries] == [[0], [1], [2]]
+    assert entries[1].ts_min == T0 and entries[1].ts_max == T0 + timedelta(seconds=990)
+    assert not list(tmp_path.glob("observation/*.tmp"))
+
+    start, end = T0 + timedelta(seconds=100), T0 + timedelta(seconds=200)
+    table = read_entries(tmp_path, [entries[1]], start, end)
+    assert table.num_rows == 10
+    assert set(table["signal_id"].to_pylist()) == {str(SIGNALS[1])}
+    assert table["ts"][0].as_py() == start
+
+    table = read_entries(tmp_path, [], start, end, columns=["ts", "value_double"])
+    assert table.num_rows == 0 and table.schema.names == ["ts", "value_double"]
+
+
+def test_compression(tmp_path):
+    """The archive is at least 10x smaller than a compact Arrow table of the same data."""
+    # A random walk rounded to 2 decimal places, like the values of a mock sensor
+    rng = random.Random(0)
+    rows = []
+    for sig in SIGNALS:
+        value = 20.0
+        for i in range(10_000):
+            value += rng.gauss(0, 0.05)
+            rows.append((sig, T0 + timedelta(seconds=10 * i), round(value, 2), None, "{}", "test"))
+    write_partition(tmp_path, "chunk.parquet", rows)
+
+    # Binary UUIDs and dictionary-encoded strings, so the baseline is not inflated by
+    # repeated strings
+    columns = list(zip(*rows))
+    arrays = [pa.array([sig.bytes for sig in columns[0]], pa.binary(16))] + [
+        pa.array(col, type_) for col, type_ in zip(columns[1:], ARCHIVE_SCHEMA.types[1:])
+    ]
+    raw = sum(
+        (array.dictionary_encode() if pa.types.is_string(array.type) else array).nbytes
+        for array in arrays
+    )
+    assert (tmp_path / "chunk.parquet").stat().st_size < raw / 10
+
+
+def test_empty_partition(tmp_path):
+    """No file is written for a partition without rows, and a stale file is removed."""
+    (tmp_path / "observation").mkdir()
+    (tmp_path / "observation/chunk.parquet").write_bytes(b"stale")
+    assert write_partition(tmp_path, "observation/chunk.parquet", []) == []
+    assert not list(tmp_path.glob("observation/*"))
+
+
+def test_read_signal_month(tmp_path):
+    """One month of one signal (at a 10-second interval) is read in well under a second."""
+    n = 30 * 24 * 360
+    rng = random.Random(0)
+    rows = [
+        (sig, T0 + timedelta(seconds=10 * i), round(20.0 + rng.gauss(0, 1), 2), None, "{}", "test")
+        for sig in SIGNALS
+        for i in range(n)
+    ]
+    entries = write_partition(tmp_path, "chunk.parquet", rows)
+
+    end = T0 + timedelta(days=30)
+    times = []
+    for _ in range(5):
+        started = perf_counter()
+        table = read_entries(tmp_path, [entries[1]], T0, end, columns=["ts", "value_double"])
+        times.append(perf_counter() - started)
+        assert table.num_rows == n
+    print(f"Read {n} rows of one signal: median {statistics.median(times) * 1000:.1f} ms")
+    assert statistics.median(times) < 1.0
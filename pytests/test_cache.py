@@ -0,0 +1,218 @@
+"""Tests for the in-memory hot cache of recent readings.
+
+To run this test suite individually:
+    just pytest cache
+
+To run all tests:
+    just pytests
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import paho.mqtt.client as mqtt
+import pyarrow as pa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mock_sensor.config import MetricConfig, SensorConfig
+from mqtt2influx.api import influx_fallback, make_router
+from mqtt2influx.cache import CacheSubscriber, HotCache
+from mqtt2influx.config import WorkerSettings
+from mqtt2influx.message import sign
+
+KEY = ("sensors/test/sensor-1", "temperature")
+
+SCHEMA = pa.schema(
+    [
+        ("time", pa.timestamp("ns")),
+        ("topic", pa.dictionary(pa.int32(), pa.string())),
+        ("temperature", pa.float64()),
+    ]
+)
+
+
+class FakeClient:
+    """Stands in for `InfluxDBClient3`, returning a fixed table of raw readings."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self.queries = []
+
+    def query(self, sql: str, mode: str, **_kwargs) -> pa.RecordBatchReader:
+        """Record the query and return the table as a record batch reader."""
+        assert mode == "reader"
+        self.queries.append(sql)
+        return pa.RecordBatchReader.from_batches(SCHEMA, self.table.to_batches())
+
+
+def make_registry() -> dict[str, SensorConfig]:
+    """Create a registry containing a single sensor with a temperature metric."""
+    metric = MetricConfig(
+        name="temperature",
+        description="A test metric",
+        unit="°C",
+        initial_value=20.0,
+        max_step=1.0,
+        min_value=-10.0,
+        max_value=40.0,
+    )
+    sensor = SensorConfig(name="sensor-1", description="", mqtt_topic=KEY[0], metrics=[metric])
+    return {KEY[0]: sensor}
+
+
+def make_message(topic: str, ts: int, payload: dict, hmac_key: str) -> mqtt.MQTTMessage:
+    """Create a signed sensor message, as received from the broker."""
+    message = mqtt.MQTTMessage(topic=topic.encode("utf-8"))
+    message.payload = sign({"ts": ts, "ts_ns": 0, **payload}, hmac_key.encode("utf-8")).encode()
+    return message
+
+
+def test_ring_buffer():
+    """The cache keeps the most recent `capacity` readings in time order."""
+    cache = HotCache([KEY], capacity=4)
+    assert cache.latest(KEY) is None
+    assert cache.nbytes == 4 * 16 + 24
+
+    for t in range(10):
+        cache.add(KEY, t, float(t))
+
+    assert cache.latest(KEY) == (9, 9.0)
+    assert cache.covered_since(KEY) == 6
+    ts, values = cache.window(KEY, 7)
+    assert ts.tolist() == [7, 8, 9]
+    assert values.tolist() == [7.0, 8.0, 9.0]
+    ts, _ = cache.window(KEY, 6, 8)
+    assert ts.tolist() == [6, 7]
+
+
+def test_fallback():
+    """Windows not covered by the cache are loaded from storage."""
+    cache = HotCache([KEY], capacity=4)
+    for t in range(10, 13):
+        cache.add(KEY, t, float(t))
+
+    calls = []
+
+    def fallback(key, start_ns, end_ns):
+        calls.append((key, start_ns, end_ns))
+        return np.arange(start_ns, end_ns), np.zeros(end_ns - start_ns)
+
+    ts, _ = cache.query(KEY, 11, 20, fallback)
+    assert ts.tolist() == [11, 12] and not calls
+    ts, _ = cache.query(KEY, 5, 20, fallback)
+    assert len(ts) == 15 and calls == [(KEY, 5, 20)]
+
+
+def test_unknown_signal():
+    """Readings of signals not in the cache are ignored."""
+    cache = HotCache([KEY])
+    cache.add_payload(KEY[0], 1, {"temperature": 1.0, "humidity": 2.0})
+    assert cache.latest(KEY) == (1, 1.0)
+    assert (KEY[0], "humidity") not in cache
+    assert cache.window((KEY[0], "humidity"), 0) is None
+
+
+def test_coverage():
+    """Windows are only answered from the cache if it holds every reading in them."""
+    cache = HotCache([KEY], capacity=100)
+    for t in range(10, 20):
+        cache.add(KEY, t, float(t))
+    assert cache.covered_since(KEY) == 10
+
+    cache.add(KEY, 15, -1.0)  # out of order: not cached, so [10, 16) is incomplete
+    assert cache.latest(KEY) == (19, 19.0)
+    assert cache.covered_since(KEY) == 16
+    assert cache.window(KEY, 12) is None
+    assert cache.window(KEY, 16)[0].tolist() == [16, 17, 18, 19]
+
+    cache.invalidate()  # e.g. disconnected: readings from 20 on may be missing
+    assert cache.latest(KEY) == (19, 19.0)
+    assert cache.covered_since(KEY) is None
+    assert cache.window(KEY, 16) is None
+    cache.add(KEY, 30, 30.0)
+    assert cache.covered_since(KEY) == 30
+    assert cache.window(KEY, 19) is None
+    assert cache.window(KEY, 30)[0].tolist() == [30]
+
+
+def test_subscriber():
+    """The subscriber caches verified readings and invalidates the cache on disconnection."""
+    settings = WorkerSettings()
+    key = settings.mqtt_hmac_key.get_secret_value()
+    cache = HotCache([KEY])
+    subscriber = CacheSubscriber(cache, settings)
+
+    subscriber._on_message(None, None, make_message(KEY[0], 1, {"temperature": 20.5}, key))
+    subscriber._on_message(None, None, make_message(KEY[0], 2, {"temperature": 99.0}, "wrong"))
+    subscriber._on_message(None, None, make_message(KEY[0], 3, {"temperature": 21.5}, key))
+    ts, values = cache.window(KEY, 1_000_000_000)
+    assert ts.tolist() == [1_000_000_000, 3_000_000_000]
+    assert values.tolist() == [20.5, 21.5]
+
+    subscriber._on_disconnect(None, None, None, mqtt.ReasonCode(mqtt.PacketTypes.DISCONNECT), None)
+    assert cache.window(KEY, 1_000_000_000) is None
+    assert cache.latest(KEY) == (3_000_000_000, 21.5)
+
+
+def test_influx_fallback():
+    """The InfluxDB fallback returns the readings of one signal in the exact window."""
+    ts = [1_000_000_000, 1_000_000_500, 1_000_001_000, 2_000_000_000]
+    table = pa.table(
+        {
+            "time": pa.array(ts, pa.timestamp("ns")),
+            "topic": pa.array([KEY[0], KEY[0], "sensors/other", KEY[0]]).dictionary_encode(),
+            "temperature": [1.0, 2.0, 3.0, None],
+        },
+        schema=SCHEMA,
+    )
+    client = FakeClient(table)
+    fallback = influx_fallback(client, make_registry())
+
+    ts, values = fallback(KEY, 1_000_000_001, 3_000_000_000)
+    assert ts.tolist() == [1_000_000_500]  # other topics and missing values are skipped
+    assert values.tolist() == [2.0]
+    assert client.queries == [
+        'SELECT "time", "topic", "temperature" FROM "sensor-1" '
+        "WHERE time >= '1970-01-01T00:00:01Z' AND time < '1970-01-01T00:00:03Z' ORDER BY time"
+    ]
+    assert fallback(("sensors/unknown", "temperature"), 0, 10)[0].size == 0
+
+
+def test_read_api():
+    """The read API serves covered windows from the cache, and other windows from storage."""
+    cache = HotCache([KEY])
+    for t in range(10, 20):
+        cache.add(KEY, t * 1_000_000_000, float(t))
+    calls = []
+
+    def fallback(key, start_ns, end_ns):
+        calls.append((key, start_ns, end_ns))
+        return np.array([start_ns]), np.array([0.0])
+
+    app = FastAPI()
+    app.include_router(make_router(cache, fallback), prefix="/readings")
+    client = TestClient(app)
+
+    response = client.get("/readings/latest", params={"topic": KEY[0], "metric": KEY[1]})
+    assert response.json() == {"ts_ns": 19_000_000_000, "value": 19.0}
+
+    def window(start: int, end: int) -> dict:
+        params = {
+            "topic": KEY[0],
+            "metric": KEY[1],
+            "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            "end": datetime.fromtimestamp(end, timezone.utc).isoformat(),
+        }
+        response = client.get("/readings/window", params=params)
+        assert response.status_code == 200
+        return response.json()
+
+    result = window(17, 19)
+    assert result["ts_ns"] == [17_000_000_000, 18_000_000_000] and result["cached"]
+    assert result["values"] == [17.0, 18.0] and not calls
+    result = window(5, 19)
+    assert result == {"ts_ns": [5_000_000_000], "values": [0.0], "cached": False}
+    assert calls == [(KEY, 5_000_000_000, 19_000_000_000)]
+
+    response = client.get("/readings/latest", params={"topic": KEY[0], "metric": "humidity"})
+    assert response.status_code == 404
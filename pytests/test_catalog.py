@@ -0,0 +1,117 @@
+"""Tests for the indexed component catalog.
+
+To run this test suite individually:
+    just pytest catalog
+
+To run all tests:
+    just pytests
+"""
+
+import os
+import pathlib
+import threading
+
+import yaml
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from polyglot_dtp.catalog.api import make_router
+from polyglot_dtp.catalog.index import FILENAME, Catalog
+
+
+def _write(root: pathlib.Path, subdir: str, name: str, category: str, image: str) -> pathlib.Path:
+    """Write a component file with a single service."""
+    path = root / subdir / FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    component = {
+        "name": name,
+        "category": category,
+        "services": [
+            {"name": name, "image": image, "urls": [{"address": f"http://{name}.localhost"}]}
+        ],
+    }
+    path.write_text(yaml.safe_dump(component))
+    return path
+
+
+def test_lookups(tmp_path):
+    """Components, services, images and URLs are indexed."""
+    _write(tmp_path, "data-store/influx", "influx", "data-store", "influxdb:3-core")
+    _write(tmp_path, "infra/mqtt", "mqtt", "infra", "eclipse-mosquitto:2.0")
+    _write(tmp_path, "node_modules/pkg", "ignored", "infra", "ignored:1")
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / FILENAME).write_text("name: [")
+
+    catalog = Catalog(tmp_path)
+    assert [c.name for c in catalog] == ["influx", "mqtt"]
+    assert catalog.component("influx").path == "data-store/influx"
+    assert catalog.categories() == ("data-store", "infra")
+    assert [c.name for c in catalog.components("infra")] == ["mqtt"]
+    assert catalog.component_of("mqtt").name == "mqtt"
+    component, service = catalog.service_entry("mqtt")
+    assert (component.name, service.image) == ("mqtt", "eclipse-mosquitto:2.0")
+    assert catalog.service_entry("missing") is None
+    assert catalog.by_image("influxdb") == catalog.by_image("influxdb:3-core")
+    assert len(catalog.by_image("influxdb")) == 1
+    assert catalog.urls("mqtt")[0].address == "http://mqtt.localhost"
+    assert catalog.urls("missing") == []
+
+
+def test_incremental_refresh(tmp_path):
+    """Only changed files are re-parsed, and deleted files are removed."""
+    influx = _write(tmp_path, "influx", "influx", "data-store", "influxdb:3-core")
+    mqtt = _write(tmp_path, "mqtt", "mqtt", "infra", "eclipse-mosquitto:2.0")
+    catalog = Catalog(tmp_path)
+    assert not catalog.refresh()
+
+    before = catalog.component("mqtt")
+    _write(tmp_path, "influx", "influx", "data-store", "influxdb:3-enterprise")
+    os.utime(influx, ns=(0, 0))  # Ensure the modification time changes
+    assert catalog.refresh([influx])
+    assert catalog.service("influx").image == "influxdb:3-enterprise"
+    assert catalog.component("mqtt") is before  # Not re-parsed
+
+    mqtt.unlink()
+    _write(tmp_path, "neo4j", "neo4j", "data-store", "neo4j:5-community")
+    assert catalog.refresh()
+    assert [c.name for c in catalog] == ["influx", "neo4j"]
+
+
+def test_watch_errors(tmp_path, caplog):
+    """Errors while refreshing are logged, and the index keeps being watched."""
+    _write(tmp_path, "influx", "influx", "data-store", "influxdb:3-core")
+    catalog = Catalog(tmp_path)
+    refreshed = threading.Event()
+    calls = []
+
+    def refresh(paths=None):
+        calls.append(paths)
+        if len(calls) == 1:
+            raise PermissionError("unreadable directory")
+        refreshed.set()
+        return False
+
+    catalog.refresh = refresh
+    catalog.start(poll_interval=0.01)
+    try:
+        assert refreshed.wait(5), "watch() stopped after a failed refresh"
+    finally:
+        catalog.stop()
+    assert "Failed to refresh the catalog index" in caplog.text
+    assert catalog.component("influx") is not None
+
+
+def test_api(tmp_path):
+    """The API serves lookups from the index."""
+    _write(tmp_path, "influx", "influx", "data-store", "influxdb:3-core")
+    app = FastAPI()
+    app.include_router(make_router(Catalog(tmp_path)), prefix="/catalog")
+    client = TestClient(app)
+
+    components = client.get("/catalog/components", params={"category": "data-store"}).json()
+    assert [c["name"] for c in components] == ["influx"]
+    assert client.get("/catalog/services/influx").json()["component"] == "influx"
+    assert client.get("/catalog/images/influxdb").json()[0]["service"]["name"] == "influx"
+    assert client.get("/catalog/urls/influx").json() == [
+        {"address": "http://influx.localhost", "description": ""}
+    ]
+    assert client.get("/catalog/components/missing").status_code == 404
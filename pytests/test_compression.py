@@ -0,0 +1,193 @@
+"""Tests for the streaming response compression middleware.
+
+To run this test suite individually:
+    just pytest compression
+
+To run all tests:
+    just pytests
+"""
+
+import asyncio
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+from polyglot_dtp.compression import CompressionMiddleware, negotiate
+from pydantic_core import to_json
+
+ROWS = [{"ts": i, "temperature": 20 + (i % 10) / 10, "unit": "°C"} for i in range(2000)]
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/small")
+    async def small() -> dict:
+        return {"status": "ok"}
+
+    @app.get("/large")
+    async def large() -> list[dict]:
+        return ROWS
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(0, len(ROWS), 100):
+                yield b"".join(to_json(row) + b"\n" for row in ROWS[i : i + 100])
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" + bytes(4096), media_type="image/png")
+
+    @app.get("/unchanged")
+    async def unchanged():
+        return Response(status_code=304, headers={"etag": '"v1"'}, media_type="application/json")
+
+    @app.delete("/small", status_code=204)
+    async def delete():
+        return Response(status_code=204, media_type="application/json")
+
+    return app
+
+
+def test_negotiate():
+    """The encoding with the highest quality wins; ties go to the server's preference."""
+    assert negotiate("gzip, deflate, br, zstd", ("zstd", "gzip")) == "zstd"
+    assert negotiate("zstd;q=0.5, gzip", ("zstd", "gzip")) == "gzip"
+    assert negotiate("gzip;q=0, identity", ("zstd", "gzip")) is None
+    assert negotiate("*", ("zstd", "gzip")) == "zstd"
+    assert negotiate("br", ("zstd", "gzip")) is None
+
+
+def test_small_and_passthrough():
+    """Small bodies and incompressible media types are not compressed."""
+    client = TestClient(_app())
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.json() == {"status": "ok"}
+
+    r = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert len(r.content) == 4100
+
+
+def test_bodiless():
+    """Responses without a body are passed through, without a Content-Length of 0 added."""
+    client = TestClient(_app())
+    for method, path, status in [("GET", "/unchanged", 304), ("DELETE", "/small", 204)]:
+        r = client.request(method, path, headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == status
+        assert r.headers.keys() & {"content-length", "content-encoding", "vary"} == set()
+        assert r.content == b""
+
+    # A HEAD response keeps the Content-Length of the (uncompressed) GET body
+    start = {
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", b"5000")],
+    }
+    sent = []
+
+    async def app(_scope, _receive, send):
+        await send(start)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "HEAD", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, None, send))
+    assert sent[0] == start
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed(encoding):
+    """Large and streaming bodies are compressed with the negotiated encoding."""
+    zstandard = pytest.importorskip("zstandard")
+    decompress = {
+        "gzip": lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS),
+        "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+    }[encoding]
+    client = TestClient(_app())
+    for path in ("/large", "/stream"):
+        with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as r:
+            raw = b"".join(r.iter_raw())
+            assert r.headers["content-encoding"] == encoding
+            assert r.headers["vary"] == "Accept-Encoding"
+            assert ("content-length" in r.headers) == (path == "/large")
+        decoded = decompress(raw)
+        assert len(raw) < len(decoded) / 5
+        if path == "/large":
+            assert json.loads(decoded) == ROWS
+        else:
+            assert [json.loads(line) for line in decoded.splitlines()] == ROWS
+
+
+def _stream(headers: list, **kwargs) -> list[dict]:
+    """Send a streamed response of 10 chunks of 2000 bytes through the middleware."""
+    sent = []
+
+    async def app(_scope, _receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i in range(10):
+            await send({"type": "http.response.body", "body": bytes([i]) * 2000, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024, **kwargs)(scope, None, send))
+    return sent
+
+
+@pytest.mark.parametrize("thresholds", [{"flush_size": 2000}, {"flush_interval": 0}])
+def test_incremental(thresholds):
+    """Once a threshold is reached, the stream is flushed, so it can be decompressed on arrival."""
+    sent = _stream([(b"content-type", b"application/x-ndjson")], **thresholds)
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for i, message in enumerate(sent[1:11]):
+        assert decoder.decompress(message["body"]) == bytes([i]) * 2000
+    assert sent[-1]["more_body"] is False
+    decoder.decompress(sent[-1]["body"])
+    assert decoder.eof
+
+
+def test_batched():
+    """Below the thresholds, chunks are not flushed one by one."""
+    sent = _stream([(b"content-type", b"application/x-ndjson")], flush_interval=60)
+
+    assert len(sent) < 11 and sent[-1]["more_body"] is False
+    body = b"".join(message["body"] for message in sent[1:])
+    assert zlib.decompress(body, 16 + zlib.MAX_WBITS) == b"".join(
+        bytes([i]) * 2000 for i in range(10)
+    )
+
+
+@pytest.mark.parametrize(
+    ("vary", "expected"),
+    [
+        (None, b"Accept-Encoding"),
+        (b"Origin", b"Origin, Accept-Encoding"),
+        (b"accept-encoding", b"accept-encoding"),
+        (b"*", b"*"),
+    ],
+)
+def test_headers(vary, expected):
+    """`Vary` is merged into one header, and a strong ETag is made weak when compressing."""
+    headers = [(b"content-type", b"application/x-ndjson"), (b"etag", b'"v1"')]
+    if vary is not None:
+        headers.append((b"vary", vary))
+    sent = _stream(headers)
+
+    assert [value for key, value in sent[0]["headers"] if key == b"vary"] == [expected]
+    assert dict(sent[0]["headers"])[b"etag"] == b'W/"v1"'
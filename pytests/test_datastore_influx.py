@@ -0,0 +1,116 @@
+"""Tests for the Arrow-native InfluxDB query layer (no InfluxDB server required).
+
+To run this test suite individually:
+    just pytest datastore_influx
+
+To run all tests:
+    just pytests
+"""
+
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from polyglot_dtp.datastore.influx import query_batches, to_ipc_stream, to_ndjson
+
+SCHEMA = pa.schema(
+    [
+        ("time", pa.timestamp("ns", tz="UTC")),
+        ("sensor", pa.dictionary(pa.int32(), pa.string())),
+        ("temperature", pa.float64()),
+    ]
+)
+
+
+class FakeClient:
+    """Stands in for `InfluxDBClient3`, returning fixed record batches."""
+
+    def __init__(self, batches: list[pa.RecordBatch]):
+        self.batches = batches
+
+    def query(self, _sql: str, mode: str, **_kwargs) -> pa.RecordBatchReader:
+        """Return the batches as a record batch reader."""
+        assert mode == "reader"
+        return pa.RecordBatchReader.from_batches(SCHEMA, self.batches)
+
+
+def make_batch(start: int, temperatures: list[float]) -> pa.RecordBatch:
+    """Create a batch of readings, one per second from `start`."""
+    n = len(temperatures)
+    return pa.record_batch(
+        [
+            pa.array(range(start * 10**9, (start + n) * 10**9, 10**9), SCHEMA.field(0).type),
+            pa.array(["s1"] * n).dictionary_encode(),
+            pa.array(temperatures),
+        ],
+        schema=SCHEMA,
+    )
+
+
+def test_filter_and_projection():
+    """Filters and projections are applied batch by batch."""
+    client = FakeClient([make_batch(0, [20.0, 31.0]), make_batch(2, [25.0, 35.0])])
+    reader = query_batches(
+        client, "SELECT ...", columns=["temperature"], where=pc.field("temperature") > 30
+    )
+    batches = list(reader)
+    assert len(batches) == 2
+    assert pa.Table.from_batches(batches).column("temperature").to_pylist() == [31.0, 35.0]
+
+
+def test_ipc_stream():
+    """The IPC stream round-trips, with one chunk per batch."""
+    client = FakeClient([make_batch(0, [20.0]), make_batch(1, [21.0])])
+    chunks = list(to_ipc_stream(query_batches(client, "SELECT ...")))
+    assert len(chunks) == 3
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.schema == SCHEMA
+    assert table.column("temperature").to_pylist() == [20.0, 21.0]
+
+    # An empty result is still a valid stream
+    empty = b"".join(to_ipc_stream(query_batches(FakeClient([]), "SELECT ...")))
+    assert pa.ipc.open_stream(empty).read_all().num_rows == 0
+
+
+def test_ndjson():
+    """Rows are serialized as JSON objects with RFC 3339 timestamps."""
+    client = FakeClient([make_batch(0, [20.0, 21.5])])
+    lines = b"".join(to_ndjson(query_batches(client, "SELECT ..."))).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"time": "1970-01-01T00:00:00.000000000Z", "sensor": "s1", "temperature": 20.0},
+        {"time": "1970-01-01T00:00:01.000000000Z", "sensor": "s1", "temperature": 21.5},
+    ]
+
+
+def test_ndjson_values():
+    """Values are escaped, timestamps keep their precision, and non-finite floats become null."""
+    schema = pa.schema(
+        [
+            ("time", pa.timestamp("ms", tz="UTC")),
+            ("name", pa.string()),
+            ("count", pa.int64()),
+            ("value", pa.float64()),
+        ]
+    )
+    batch = pa.record_batch(
+        [
+            pa.array([1_500, None, 1_700_000_000_123], schema.field(0).type),
+            pa.array(['a "quoted"\n\\name', None, "é"]),
+            pa.array([1, None, -(2**63)]),
+            pa.array([-0.0, float("nan"), 1e22]),
+        ],
+        schema=schema,
+    )
+    reader = pa.RecordBatchReader.from_batches(schema, [batch.slice(1), batch.slice(0, 1)])
+    lines = b"".join(to_ndjson(reader)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"time": None, "name": None, "count": None, "value": None},
+        {"time": "2023-11-14T22:13:20.123Z", "name": "é", "count": -(2**63), "value": 1e22},
+        {
+            "time": "1970-01-01T00:00:01.500Z",
+            "name": 'a "quoted"\n\\name',
+            "count": 1,
+            "value": -0.0,
+        },
+    ]
+    assert isinstance(json.loads(lines[2])["value"], float)
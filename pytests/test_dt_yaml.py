@@ -1,19 +1,13 @@
 """Test reading data from a dt.component.yaml file, with injected password from .env."""
 
-from typing import Callable, TypeVar
+import pathlib
 
 import git
-import yaml
+import pytest
 from dotenv import dotenv_values
+from polyglot_dtp.catalog.index import Catalog
 from pydantic import PostgresDsn, ValidationError
 
-T = TypeVar("T")
-
-
-def find(fn: Callable[[T], bool], lst: list[T]):
-    """Find the first element in lst that satisfies the predicate fn."""
-    return next(filter(fn, lst), None)
-
 
 def test_read_postgres_yaml():
     """Test reading data from a dt.component.yaml file, with injected password from .env."""
@@ -21,19 +15,21 @@ def test_read_postgres_yaml():
     assert not repo.bare and repo.working_tree_dir, "Repository is bare"
     repo_dir = repo.working_tree_dir
 
-    with open(f"{repo_dir}/data-store/postgres/dt.component.yaml", "rb") as f:
-        config = yaml.safe_load(f)
+    catalog = Catalog(pathlib.Path(repo_dir))
 
     password = dotenv_values().get("POSTGRES_PASSWORD", None)
     assert password is not None, "POSTGRES_PASSWORD not found in .env file"
 
+    entry = catalog.service_entry("postgres")
+    if entry is None:
+        pytest.fail(f"No postgres service found in the dt.component.yaml files under {repo_dir}")
+    _, service = entry
+    if not service.urls:
+        pytest.fail("The postgres service has no URLs")
+
     try:
-        dsn = PostgresDsn(
-            find(lambda s: s["name"] == "postgres", config["services"])["urls"][0]["address"]
-        )
-        dsn = PostgresDsn.build(scheme=dsn.scheme, **(dsn.hosts()[0] | {"password": password}))
-        print("Postgres DSN with injected password: %s", dsn)
-    except KeyError as e:
-        raise KeyError("Cannot find Postgres service configuration") from e
+        dsn = PostgresDsn(service.urls[0].address)
     except ValidationError as e:
-        raise ValueError(f"Invalid Postgres DSN: {e}") from e
+        pytest.fail(f"Invalid Postgres DSN: {e}")
+    dsn = PostgresDsn.build(scheme=dsn.scheme, **(dsn.hosts()[0] | {"password": password}))
+    print("Postgres DSN with injected password: %s", dsn)
@@ -0,0 +1,102 @@
+"""Tests for the sharded mock sensor fleet.
+
+To run this test suite individually:
+    just pytest fleet
+
+To run all tests:
+    just pytests
+"""
+
+import math
+import pathlib
+
+import pytest
+import yaml
+from mock_sensor import fleet
+from mock_sensor.config import AuthSettings, SensorConfig
+from mock_sensor.fleet import LATENESS_BUCKETS, FleetStats, ShardStats, assign_shards, run_fleet
+from mock_sensor.sensor import client_id
+
+EXAMPLE = pathlib.Path(__file__).parents[1] / "pypackages" / "mock_sensor" / "example.sensor.yaml"
+
+
+def _configs(n: int, interval: float = 30.0) -> list[SensorConfig]:
+    """Create `n` copies of the example config with distinct names and topics."""
+    obj = yaml.safe_load(EXAMPLE.read_text())
+    return [
+        SensorConfig.model_validate(
+            obj
+            | {"name": f"sensor-{i}", "mqtt_topic": f"sensors/test/sensor-{i}"}
+            | {"interval": interval}
+        )
+        for i in range(n)
+    ]
+
+
+def test_assignment():
+    """Shard assignment is balanced, and independent of the order of the configs."""
+    configs = _configs(1000)
+    shards = assign_shards(configs, 4)
+    assert sum(len(s) for s in shards) == len(configs)
+    assert all(200 <= len(s) <= 300 for s in shards)
+
+    reversed_shards = assign_shards(configs[::-1], 4)
+    assert [{c.name for c in s} for s in shards] == [{c.name for c in s} for s in reversed_shards]
+
+    # Client IDs do not depend on the shard at all
+    assert client_id(configs[0]) == "mock-sensor/sensors/test/sensor-0"
+
+
+def test_duplicate_topic():
+    """Sensors sharing a topic (and therefore a client ID) are rejected."""
+    configs = _configs(2)
+    configs[1] = configs[1].model_copy(update={"mqtt_topic": configs[0].mqtt_topic})
+    with pytest.raises(ValueError, match="Duplicate MQTT topic"):
+        assign_shards(configs, 2)
+
+
+def test_stats():
+    """Shard reports are combined into fleet-wide throughput and lateness statistics."""
+    stats = FleetStats()
+    lateness = [0] * len(LATENESS_BUCKETS)
+    lateness[0] = 98
+    lateness[LATENESS_BUCKETS.index(0.1)] = 2
+    stats.add(ShardStats(0, 10, 10, 100, 100, tuple(lateness), 0.08))
+    stats.add(ShardStats(1, 5, 4, 0, 0, (0,) * len(LATENESS_BUCKETS), 0.0))
+
+    summary = stats.summary(elapsed=2.0)
+    assert summary["sensors"] == 15
+    assert summary["connected"] == 14
+    assert summary["ticks_per_s"] == 50
+    assert math.isclose(summary["lateness_p50_ms"], 1)
+    assert math.isclose(summary["lateness_p99_ms"], 100)
+    assert math.isclose(summary["lateness_max_ms"], 80)
+
+
+def test_run_fleet(monkeypatch):
+    """A fleet with MQTT disabled ticks every sensor in every shard.
+
+    The duration is counted from when all shards are ready, so slow process startup (e.g. on a
+    single core) does not eat into it.
+    """
+    monkeypatch.setenv("MQTT_HOSTNAME", "")
+    configs = _configs(40, interval=0.1)
+    stats = run_fleet(configs, AuthSettings(), shards=2, report_interval=0.5, duration=2.0)
+    assert stats.sensors == {
+        0: len(assign_shards(configs, 2)[0]),
+        1: len(assign_shards(configs, 2)[1]),
+    }
+    assert stats.ticks >= len(configs) * 10  # At least half the expected ticks
+    assert stats.published == 0
+
+
+def test_fd_limit(monkeypatch):
+    """Shards raise their soft limit on open files, and fail fast if the hard limit is too low."""
+    limits = [(1024, 4096)]
+    monkeypatch.setattr(fleet.resource, "getrlimit", lambda _resource: limits[-1])
+    monkeypatch.setattr(fleet.resource, "setrlimit", lambda _resource, lim: limits.append(lim))
+
+    assert fleet._raise_fd_limit(2000) == 4096
+    assert limits[-1] == (4096, 4096)
+    with pytest.raises(RuntimeError, match="too low"):
+        fleet._raise_fd_limit(5000)
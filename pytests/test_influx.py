@@ -8,11 +8,14 @@ To run all tests:
 """
 
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import influxdb_client_3 as influx
+import pyarrow as pa
+import pyarrow.compute as pc
 import tabulate
 from dotenv import dotenv_values
+from polyglot_dtp.datastore.influx import select_range, to_ipc_stream
 
 
 def test_influxdb():
@@ -48,3 +51,31 @@ def test_influxdb():
         logging.info("%s", line)
 
     assert not df.empty
+
+
+def test_influxdb_arrow_stream():
+    """Test streaming query results from InfluxDB as Arrow IPC, without pandas."""
+    token = dotenv_values()["INFLUXDB3_AUTH_TOKEN"]
+
+    client = influx.InfluxDBClient3(
+        host="http://localhost:8181",
+        token=token,
+        database="dtp",
+    )
+
+    now = datetime.now(timezone.utc)
+    client.write(record=f"test val=2 {int(now.timestamp() * 1_000_000_000)}", write_precision="ns")
+
+    reader = select_range(
+        client,
+        "test",
+        now - timedelta(minutes=1),
+        now + timedelta(seconds=1),
+        columns=["time", "val"],
+        where=pc.field("val") >= 2,
+    )
+    table = pa.ipc.open_stream(b"".join(to_ipc_stream(reader))).read_all()
+    logging.info("Received %d rows: %s", table.num_rows, table.schema)
+
+    assert table.column_names == ["time", "val"]
+    assert table.num_rows > 0
@@ -0,0 +1,63 @@
+"""Tests for the cached, parallel sensor config loader.
+
+To run this test suite individually:
+    just pytest loader
+
+To run all tests:
+    just pytests
+"""
+
+import pathlib
+
+import pytest
+import yaml
+from mock_sensor import loader
+from mock_sensor.loader import ConfigCache, content_key, load_config, load_configs
+
+EXAMPLE = pathlib.Path(__file__).parents[1] / "pypackages" / "mock_sensor" / "example.sensor.yaml"
+
+
+def _fleet(tmp_path: pathlib.Path, n: int) -> list[pathlib.Path]:
+    """Write `n` copies of the example config with distinct names and topics."""
+    obj = yaml.safe_load(EXAMPLE.read_text())
+    paths = []
+    for i in range(n):
+        obj |= {"name": f"sensor-{i}", "mqtt_topic": f"sensors/test/sensor-{i}"}
+        path = tmp_path / "configs" / f"{i}.sensor.yaml"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(yaml.safe_dump(obj, sort_keys=False))
+        paths.append(path)
+    return paths
+
+
+def test_parallel(tmp_path):
+    """Configs validated in worker processes are returned in order."""
+    paths = _fleet(tmp_path, loader.PARALLEL_THRESHOLD)
+    configs = load_configs(paths, processes=2)
+    assert [c.name for c in configs] == [f"sensor-{i}" for i in range(len(paths))]
+
+
+def test_cache(tmp_path, monkeypatch):
+    """Unchanged configs are loaded from the cache; changed configs are re-validated."""
+    cache_dir = tmp_path / "cache"
+    (path,) = _fleet(tmp_path, 1)
+    config = load_config(path, cache_dir)
+    assert ConfigCache(cache_dir).get(content_key(path.read_bytes())) == config
+
+    def fail(*_args):
+        raise AssertionError("config was parsed")
+
+    monkeypatch.setattr(loader, "_parse_many", fail)
+    assert load_config(path, cache_dir) == config
+    monkeypatch.undo()
+
+    path.write_text(path.read_text().replace("interval:", "interval: 5 #"))
+    assert load_config(path, cache_dir).interval == 5
+
+
+def test_invalid(tmp_path):
+    """Errors name the offending file."""
+    path = tmp_path / "bad.sensor.yaml"
+    path.write_text("name: bad\n")
+    with pytest.raises(ValueError, match="bad.sensor.yaml"):
+        load_config(path)
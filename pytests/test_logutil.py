@@ -0,0 +1,88 @@
+"""Tests for the non-blocking, structured logging setup.
+
+To run this test suite individually:
+    just pytest logutil
+
+To run all tests:
+    just pytests
+"""
+
+import io
+import json
+import logging
+
+from polyglot_dtp.logutil import BoundedQueueHandler, SamplingFilter, setup_logging
+
+
+def test_json_output():
+    """Records are written as JSON by the background thread, including extra fields."""
+    stream = io.StringIO()
+    listener = setup_logging(loggers=["logutil.test.json"], stream=stream)
+    logger = logging.getLogger("logutil.test.json")
+    logger.info("hello %s", "world", extra={"sensor": "sensor-1"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    listener.stop()
+
+    first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert first["msg"] == "hello world" and first["sensor"] == "sensor-1"
+    assert first["level"] == "INFO" and first["logger"] == "logutil.test.json"
+    assert second["msg"] == "failed" and "ValueError: boom" in second["exc"]
+
+
+def test_reconfigure():
+    """A new setup stops the previous listener and removes its handler."""
+    first_stream, second_stream = io.StringIO(), io.StringIO()
+    first = setup_logging(loggers=["logutil.test.first"], stream=first_stream)
+    first_handler = logging.getLogger("logutil.test.first").handlers[0]
+    logging.getLogger("logutil.test.first").info("before")
+
+    second = setup_logging(loggers=["logutil.test.second"], stream=second_stream)
+    assert first._thread is None  # stopped, after flushing its queue
+    assert json.loads(first_stream.getvalue())["msg"] == "before"
+    assert first_handler not in logging.getLogger("logutil.test.first").handlers
+
+    logging.getLogger("logutil.test.second").info("after")
+    second.stop()
+    assert json.loads(second_stream.getvalue())["msg"] == "after"
+
+
+def test_sampling():
+    """Sampled loggers (and their children) pass one in every N records up to INFO."""
+    sampler = SamplingFilter({"a": 3, "a.c": 1})
+
+    def passed(name: str, level: int = logging.INFO) -> int:
+        records = (logging.makeLogRecord({"name": name, "levelno": level}) for _ in range(9))
+        return sum(map(sampler.filter, records))
+
+    assert passed("a") == 3
+    assert passed("a.b") == 3
+    assert passed("a.c") == 9
+    assert passed("a", logging.WARNING) == 9
+    assert passed("other") == 9
+
+
+def test_overflow():
+    """Above the high-water mark, DEBUG and INFO records are dropped before warnings."""
+    handler = BoundedQueueHandler(capacity=10, high_water=0.5)
+    logger = logging.getLogger("logutil.test.overflow")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+
+    for i in range(8):
+        logger.info("info %d", i)
+    for i in range(8):
+        logger.warning("warning %d", i)
+    assert handler.queue.qsize() == 10
+    assert handler.dropped == 6
+
+    messages = [handler.queue.get_nowait().msg for _ in range(10)]
+    assert messages[:5] == [f"info {i}" for i in range(5)]
+    assert messages[5:] == [f"warning {i}" for i in range(5)]
+
+    logger.error("after")
+    assert "Dropped 6 log records" in handler.queue.get_nowait().msg
+    assert handler.queue.get_nowait().msg == "after"
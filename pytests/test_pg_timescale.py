@@ -17,6 +17,8 @@ import pandas as pd
 import psycopg
 import tabulate
 from dotenv import find_dotenv
+from mock_sensor.config import MetricConfig, SensorConfig
+from mqtt2influx.signals import signals_of, sync_signals
 from pydantic import BaseModel
 from pydantic import Field as PydanticField
 from pydantic.networks import PostgresDsn
@@ -197,3 +199,59 @@ def test_timescale():
                 )
                 assert cur.rowcount == 1, "Failed to delete the signal"
                 logging.info("Deleted signal with ID: %s", signal.signal_id)
+
+
+def test_sync_signals():
+    """Test upserting the signals of a sensor registry into the `signal` table."""
+    env_path = find_dotenv(
+        filename=".env",
+        raise_error_if_not_found=True,
+    )
+    settings = Settings(
+        _env_file=env_path,
+    )
+
+    # A unique topic prefix, so that the test never touches real signals
+    prefix = f"test/sync-signals/{uuid4()}"
+    metrics = [
+        MetricConfig(
+            name=name,
+            description="A test metric",
+            unit=unit,
+            initial_value=0.0,
+            max_step=1.0,
+            min_value=0.0,
+            max_value=100.0,
+        )
+        for name, unit in (("temperature", "°C"), ("humidity", "%"))
+    ]
+    registry = {
+        f"{prefix}/sensor-{i}": SensorConfig(
+            name=f"sensor-{i}", description="", mqtt_topic=f"{prefix}/sensor-{i}", metrics=metrics
+        )
+        for i in range(3)
+    }
+    signals = signals_of(registry)
+    ids = [s.signal_id for s in signals]
+
+    with psycopg.connect(str(settings.dsn)) as conn:
+        try:
+            assert sync_signals(conn, signals) == (6, 0), "Expected all signals to be inserted"
+            assert sync_signals(conn, signals) == (0, 0), "Expected unchanged rows untouched"
+
+            # Change the unit of the temperature signals: only their rows are updated
+            changed = [s._replace(unit="K") if s.metric == "temperature" else s for s in signals]
+            assert sync_signals(conn, changed) == (0, 3), "Expected changed rows updated"
+
+            rows = conn.execute(
+                "SELECT signal_id, name, unit FROM signal WHERE signal_id = ANY(%s) "
+                "ORDER BY signal_id;",
+                (ids,),
+            ).fetchall()
+            logging.info("Synced signals:")
+            for row in rows:
+                logging.info("   %s", row)
+            assert set(rows) == {(s.signal_id, s.name, s.unit) for s in changed}
+        finally:
+            conn.execute("DELETE FROM signal WHERE signal_id = ANY(%s);", (ids,))
+            conn.commit()
@@ -0,0 +1,86 @@
+"""Tests for the opt-in sampling profiler.
+
+To run this test suite individually:
+    just pytest profiling
+
+To run all tests:
+    just pytests
+"""
+
+import asyncio
+import time
+
+from polyglot_dtp.profiling import MIN_INTERVAL, Profiler, ProfilerMiddleware
+
+
+def _busy(seconds: float) -> None:
+    """Spin for a while, so that the profiler has something to sample."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_disabled():
+    """A disabled profiler records nothing."""
+    profiler = Profiler(sample_rate=1.0)
+    with profiler.profile("tick"):
+        _busy(0.01)
+    assert profiler.traces() == [] and profiler.folded() == ""
+
+
+def test_min_interval():
+    """Sampling intervals shorter than the minimum are clamped."""
+    assert Profiler(interval=1e-6).interval == MIN_INTERVAL
+    assert Profiler(interval=0.01).interval == 0.01
+
+
+def test_slowest_traces():
+    """Only the slowest traces are kept, with samples attributed to the profiled block."""
+    profiler = Profiler(sample_rate=1.0, interval=0.001, capacity=2)
+    profiler.enable()
+    try:
+        for seconds in (0.02, 0.005, 0.04, 0.01):
+            with profiler.profile(f"tick {seconds}"):
+                _busy(seconds)
+        _busy(0.01)  # Not profiled: no sampling outside profiled blocks
+    finally:
+        profiler.disable()
+
+    traces = profiler.traces()
+    assert [t.name for t in traces] == ["tick 0.04", "tick 0.02"]
+    assert traces[0].samples > 10
+    assert all("_busy" in stack for stack in traces[0].stacks)
+
+    lines = profiler.folded().splitlines()
+    assert lines and all(line.startswith("tick 0.0") for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+    profiler.clear()
+    assert profiler.traces() == []
+
+
+def test_middleware():
+    """Interleaved asynchronous requests are attributed to the right trace."""
+    profiler = Profiler(sample_rate=1.0, interval=0.001)
+
+    async def app(scope, _receive, _send):
+        for _ in range(5):
+            _busy(0.004 if scope["path"] == "/slow" else 0.001)
+            await asyncio.sleep(0)
+
+    middleware = ProfilerMiddleware(app, profiler)
+
+    async def main():
+        scopes = [{"type": "http", "method": "GET", "path": p} for p in ("/slow", "/fast")]
+        await asyncio.gather(*(middleware(scope, None, None) for scope in scopes))
+
+    profiler.enable()
+    try:
+        asyncio.run(main())
+    finally:
+        profiler.disable()
+
+    slow, fast = profiler.traces()
+    assert (slow.name, fast.name) == ("GET /slow", "GET /fast")
+    assert slow.samples > fast.samples > 0
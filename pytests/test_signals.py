@@ -0,0 +1,108 @@
+"""Tests for signal IDs and the memory-mapped signal map.
+
+To run this test suite individually:
+    just pytest signals
+
+To run all tests:
+    just pytests
+"""
+
+import logging
+import pathlib
+from uuid import UUID
+
+import pytest
+import yaml
+from mock_sensor.config import SensorConfig
+from mqtt2influx.alarms import AlarmEvent, AlarmRule
+from mqtt2influx.config import WorkerSettings
+from mqtt2influx.signals import SignalMap, signal_id, signals_of, write_signal_map
+from mqtt2influx.worker import Worker
+
+EXAMPLE = pathlib.Path(__file__).parents[1] / "pypackages" / "mock_sensor" / "example.sensor.yaml"
+
+
+def _registry(n: int) -> dict[str, SensorConfig]:
+    """Create a registry of `n` copies of the example config with distinct names and topics."""
+    obj = yaml.safe_load(EXAMPLE.read_text())
+    configs = [
+        SensorConfig.model_validate(
+            obj | {"name": f"sensor-{i}", "mqtt_topic": f"sensors/test/sensor-{i}"}
+        )
+        for i in range(n)
+    ]
+    return {c.mqtt_topic: c for c in configs}
+
+
+def test_signal_id():
+    """Signal IDs are stable UUIDv5s of the topic and metric name."""
+    sid = signal_id("sensors/test/sensor-0", "temperature")
+    assert sid.version == 5
+    assert sid == UUID("c0e2f0a1-134b-54ab-92a7-e8ea3ef55708")  # Must never change
+    assert sid != signal_id("sensors/test/sensor-0", "humidity")
+
+
+def test_signal_map(tmp_path):
+    """Signals round-trip through the signal map file, and unknown signals are not found."""
+    registry = _registry(100)
+    signals = signals_of(registry)
+    assert len(signals) == 100 * len(registry["sensors/test/sensor-0"].metrics)
+    signals[0] = signals[0]._replace(unit="°C")  # Multi-byte characters
+
+    path = tmp_path / "signals.map"
+    assert write_signal_map(path, signals) == len(signals)
+    signal_map = SignalMap(path)
+    assert len(signal_map) == len(signals)
+    assert list(signal_map) == signals
+    for signal in signals:
+        assert signal_map.get(signal.topic, signal.metric) == signal
+    assert signal_map.get(*signals[0].key).unit == "°C"
+    assert ("sensors/test/sensor-0", "missing") not in signal_map
+    assert ("sensors/test/missing", signals[0].metric) not in signal_map
+    signal_map.close()
+
+    path.write_bytes(b"not a signal map")
+    with pytest.raises(ValueError, match="Not a signal map"):
+        SignalMap(path)
+
+
+class ListEventLog:
+    """Collects the alarms queued for the event log by a worker."""
+
+    def __init__(self):
+        self.events = []
+
+    def put(self, event: AlarmEvent, signal_id: UUID | None) -> None:
+        """Collect an alarm and its signal ID."""
+        self.events.append((event.topic, event.metric, signal_id))
+
+
+def test_worker_signal_ids(tmp_path, caplog):
+    """Workers resolve signal IDs from the signal map, and report unsynced signals once."""
+    registry = _registry(2)
+    signals = signals_of(registry)
+    synced = [s for s in signals if s.topic == "sensors/test/sensor-0"]
+    path = tmp_path / "signals.map"
+    write_signal_map(path, synced)
+
+    with caplog.at_level(logging.WARNING):
+        worker = Worker(WorkerSettings(signal_map=path), registry, writer=object())
+    assert "registered metrics are missing" in caplog.text
+    worker.mqtt_client.publish = lambda *_args, **_kwargs: None
+    worker.event_log = ListEventLog()
+
+    metric = synced[0].metric
+    for topic in ("sensors/test/sensor-0", "sensors/test/sensor-1", "sensors/test/sensor-1"):
+        event = AlarmEvent(topic, "sensor", metric, AlarmRule.HIGH, True, 1.0, 0, 1, "")
+        worker._publish_alarm(event)
+    assert worker.event_log.events == [
+        ("sensors/test/sensor-0", metric, signal_id("sensors/test/sensor-0", metric)),
+        ("sensors/test/sensor-1", metric, None),
+        ("sensors/test/sensor-1", metric, None),
+    ]
+    assert caplog.text.count(f"Signal sensors/test/sensor-1#{metric} is missing") == 1
+
+    worker.signals = None  # Without a signal map, IDs are computed
+    assert worker.signal_id("sensors/test/sensor-1", metric) == signal_id(
+        "sensors/test/sensor-1", metric
+    )
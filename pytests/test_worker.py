@@ -0,0 +1,96 @@
+"""Tests for the partitioning of sensor topics between ingestion workers.
+
+To run this test suite individually:
+    just pytest worker
+
+To run all tests:
+    just pytests
+"""
+
+import pytest
+from mock_sensor.config import AggregationPolicy, MetricConfig, SensorConfig
+from mqtt2influx.config import WorkerSettings
+from mqtt2influx.message import sign
+from mqtt2influx.supervisor import Supervisor
+from mqtt2influx.worker import Worker, topic_partition
+
+
+class ListWriter:
+    """Collects the lines written by a worker."""
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, line: str) -> None:
+        """Collect a line."""
+        self.lines.append(line)
+
+
+def make_registry(sensors: int) -> dict[str, SensorConfig]:
+    """Create a registry of sensors with a single metric, aggregated in 10 s windows."""
+    metric = MetricConfig(
+        name="level",
+        description="A test metric",
+        unit="%",
+        initial_value=50.0,
+        max_step=1.0,
+        min_value=0.0,
+        max_value=100.0,
+        aggregations=[AggregationPolicy(window=10)],
+    )
+    return {
+        f"sensors/test/sensor-{i}": SensorConfig(
+            name=f"sensor-{i}",
+            description="",
+            mqtt_topic=f"sensors/test/sensor-{i}",
+            metrics=[metric],
+        )
+        for i in range(sensors)
+    }
+
+
+def test_partitions():
+    """Each registered topic is handled by exactly one worker, which subscribes to it."""
+    registry = make_registry(100)
+    settings = WorkerSettings(partitions=3)
+    workers = [Worker(settings, registry, index=i, writer=ListWriter()) for i in range(3)]
+
+    assert [w.client_id for w in workers] == ["mqtt2influx-0", "mqtt2influx-1", "mqtt2influx-2"]
+    assert sum(len(w.registry) for w in workers) == len(registry)
+    assert set().union(*(w.registry for w in workers)) == set(registry)
+    assert all(len(w.registry) > 20 for w in workers)
+    for i, worker in enumerate(workers):
+        assert worker.subscriptions == sorted(worker.registry)
+        assert all(topic_partition(topic, 3) == i for topic in worker.registry)
+
+    # A single worker subscribes to all sensor topics at once
+    worker = Worker(WorkerSettings(), registry, writer=ListWriter())
+    assert worker.subscriptions == ["sensors/#"] and worker.registry == registry
+
+
+def test_complete_aggregates():
+    """Aggregates are computed by the worker owning the topic only, over all of its readings."""
+    registry = make_registry(1)
+    settings = WorkerSettings(partitions=2)
+    workers = [Worker(settings, registry, index=i, writer=ListWriter()) for i in range(2)]
+    hmac_key = settings.mqtt_hmac_key.get_secret_value().encode("utf-8")
+    for t in range(20):
+        msg = sign({"ts": t, "ts_ns": 0, "level": float(t)}, hmac_key).encode("utf-8")
+        for worker in workers:
+            worker.handle("sensors/test/sensor-0", msg)
+
+    owner, other = sorted(workers, key=lambda w: len(w.registry), reverse=True)
+    assert other.writer.lines == []
+    aggregates = [line for line in owner.writer.lines if line.startswith("sensor-0_10s,")]
+    assert aggregates == ["sensor-0_10s,metric=level mean=4.5,min=0.0,max=9.0,sum=45.0,count=10i 0"]
+
+
+def test_partition_range():
+    """Workers and supervisors reject partitions beyond the configured number of partitions."""
+    registry = make_registry(1)
+    with pytest.raises(ValueError, match="out of range"):
+        Worker(WorkerSettings(partitions=2, partition_offset=2), registry, writer=ListWriter())
+    with pytest.raises(ValueError, match="out of range"):
+        Supervisor(WorkerSettings(partitions=4, partition_offset=2), registry, processes=3)
+    supervisor = Supervisor(WorkerSettings(partition_offset=0), registry, processes=3)
+    assert supervisor.settings.partitions == 3